@@ -0,0 +1,79 @@
+"""
+Wallets per second of /keys/generate/bulk (core.keygen: derivation in the
+wallet process pool, one INSERT per chunk) against creating the wallets
+one by one like /keys/generate (derive, add, commit, refresh).
+
+    python benchmarks/bulk_wallet_bench.py --count 200
+
+Runs against the node, keys and database of cardanoapi/config.ini:
+cardano-address and cardano-cli must be installed. The wallets created are
+named bench-<run id>-<n> and deleted at the end.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cardanoapi")
+sys.path.insert(0, APP_DIR)
+# config.ini is read from the working directory
+os.chdir(APP_DIR)
+
+from sqlalchemy import delete  # noqa: E402
+
+from core.config import settings  # noqa: E402
+from core.context import context  # noqa: E402
+from core.executor import shutdown_executors  # noqa: E402
+from core.keygen import WALLET_FIELDS, generate_wallets  # noqa: E402
+from core.workspace import node_workspace  # noqa: E402
+from db.dblib import SessionLocal, dispose_engine  # noqa: E402
+from db.models import dbmodels  # noqa: E402
+
+
+async def one_by_one(names: list, size: int) -> int:
+    async with SessionLocal() as db:
+        for name in names:
+            with node_workspace(context.keys) as ws:
+                keys = await asyncio.to_thread(ws.node.deriveAllKeys, name, size=size, save_flag=False)
+            wallet = dbmodels.Wallet(name=name, **{field: keys.get(field) for field in WALLET_FIELDS})
+            db.add(wallet)
+            await db.commit()
+            await db.refresh(wallet)
+    return len(names)
+
+
+async def bulk(names: list, size: int) -> int:
+    async for line in generate_wallets(names, size):
+        if "created" in line:
+            return line["created"]
+    return 0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--size", type=int, default=24, help="mnemonic size")
+    args = parser.parse_args()
+
+    prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+    print(f"{args.count} wallets, BULK_WALLET_WORKERS={settings.BULK_WALLET_WORKERS}"
+        f" BULK_WALLET_CHUNK_SIZE={settings.BULK_WALLET_CHUNK_SIZE}")
+    try:
+        for name, run in (("one by one", one_by_one), ("bulk", bulk)):
+            names = [f"{prefix}{name.replace(' ', '')}-{index}" for index in range(args.count)]
+            start = time.perf_counter()
+            created = await run(names, args.size)
+            seconds = time.perf_counter() - start
+            print(f"{name:<12} {created} created in {seconds:8.2f} s   {created / seconds:8.2f} wallets/s")
+    finally:
+        async with SessionLocal() as db:
+            await db.execute(delete(dbmodels.Wallet).where(dbmodels.Wallet.name.startswith(prefix)))
+            await db.commit()
+        shutdown_executors()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
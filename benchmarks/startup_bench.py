@@ -0,0 +1,98 @@
+"""
+Worker boot time: seconds to import the app (server.py) in a fresh
+interpreter, what gunicorn pays for every worker it starts, and with
+--startup the startup event too (node, keys and database connection).
+
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --rev fc28606 HEAD~5 --config cardanoapi/config.ini
+
+--rev checks out other revisions in temporary git worktrees to compare
+with (e.g. the one before the app context). Older revisions read
+config.ini and connect to postgres on import, so --config must point to a
+working config.ini, which is copied next to its server.py. The working
+tree uses its own cardanoapi/config.ini.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import time
+start = time.perf_counter()
+import server
+print("boot", time.perf_counter() - start)
+"""
+
+STARTUP = """
+import asyncio, time
+start = time.perf_counter()
+import server
+imported = time.perf_counter()
+async def boot():
+    await server.cardanodatos.router.startup()
+    ready = time.perf_counter()
+    await server.cardanodatos.router.shutdown()
+    return ready
+print("boot", imported - start, asyncio.run(boot()) - start)
+"""
+
+
+def boot_times(app_dir: str, code: str, repeat: int) -> list:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=app_dir, capture_output=True, text=True)
+        process = time.perf_counter() - start
+        if result.returncode:
+            sys.exit(f"Boot failed in {app_dir}:\n{result.stderr[-2000:]}")
+        # Older revisions print while importing
+        boot = [line for line in result.stdout.splitlines() if line.startswith("boot ")][-1]
+        times.append([float(value) for value in boot.split()[1:]] + [process])
+    return times
+
+
+def report(name: str, times: list, startup: bool) -> None:
+    columns = list(zip(*times))
+    line = f"{name:<20} import {statistics.median(columns[0]) * 1000:8.1f} ms"
+    if startup:
+        line += f"   ready {statistics.median(columns[1]) * 1000:8.1f} ms"
+    line += f"   process {statistics.median(columns[-1]) * 1000:8.1f} ms   ({len(times)} runs)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--startup", action="store_true", help="run the startup event too (needs config.ini)")
+    parser.add_argument("--rev", nargs="+", default=[], help="git revisions to compare with")
+    parser.add_argument("--config", help="config.ini to copy into the app folders")
+    args = parser.parse_args()
+    code = STARTUP if args.startup else IMPORT
+
+    targets = [("working tree", os.path.join(ROOT, "cardanoapi"))]
+    worktrees = []
+    try:
+        for rev in args.rev:
+            worktree = tempfile.mkdtemp(prefix="cardanoapi-bench-")
+            subprocess.run(["git", "worktree", "add", "--detach", worktree, rev], cwd=ROOT, check=True,
+                capture_output=True)
+            worktrees.append(worktree)
+            if args.config:
+                shutil.copy(args.config, os.path.join(worktree, "cardanoapi", "config.ini"))
+            targets.append((rev, os.path.join(worktree, "cardanoapi")))
+        for name, app_dir in targets:
+            report(name, boot_times(app_dir, code, args.repeat), args.startup)
+    finally:
+        for worktree in worktrees:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=ROOT, capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Fee quotes of core.txplanner on synthetic UTxO sets against the cardano-cli
+path (node.build_tx_components, what /simplesend and /buildtx used before).
+
+    python benchmarks/txplanner_bench.py --sizes 10000 50000 100000
+    python benchmarks/txplanner_bench.py --config cardanoapi/config.ini --address addr_test1...
+
+The cardano-cli path needs a synced node and a funded address: it builds
+against the address' UTxOs on chain, a synthetic set can't be passed to it.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cardanoapi"))
+
+from core import txplanner  # noqa: E402
+
+PROTOCOL_PARAMS = {
+    "txFeePerByte": 44,
+    "txFeeFixed": 155381,
+    "utxoCostPerByte": 4310,
+    "maxTxSize": 16384,
+}
+ADDRESS = "addr_test1qz2fxv2umyhttkxyxp8x0dlpdt3k6cwng5pxj3jhsydzer3n0d3vllmyqwsx5wktcd8cc3sq835lu7drv2xwl2wywfgs68faae"
+CHANGE = "addr_test1vrcvs7eq2rp9wk3ad0mxsq8xj6kr55nyg7pk3w7xzfnxkqs6h4cwd"
+
+
+def synthetic_utxos(count: int, rng: random.Random) -> list:
+    return [{"hash": f"{rng.getrandbits(256):064x}", "id": rng.randrange(4),
+        "amounts": [{"token": "lovelace", "amount": str(rng.randrange(1000000, 50000000))}]}
+        for _ in range(count)]
+
+
+def timed(fn, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def report(name: str, durations: list) -> None:
+    print(f"{name:<40} median {statistics.median(durations) * 1000:9.3f} ms"
+        f"   max {max(durations) * 1000:9.3f} ms   ({len(durations)} runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--config", help="config.ini of a node, to time the cardano-cli path")
+    parser.add_argument("--address", help="funded address of that node's network")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    outputs = [{"address": ADDRESS, "amount": 25000000}]
+    # Needs about a hundred random inputs, not a single pick
+    large = [{"address": ADDRESS, "amount": 2000000000}]
+    batch_outputs = [{"address": ADDRESS, "amount": 2000000} for _ in range(1000)]
+    for size in args.sizes:
+        utxos = synthetic_utxos(size, rng)
+        for strategy in txplanner.SELECTION_STRATEGIES:
+            report(f"{size} utxos, {strategy}", timed(lambda: txplanner.plan_transaction(
+                utxos, outputs, CHANGE, PROTOCOL_PARAMS, strategy=strategy), args.repeat))
+            report(f"{size} utxos, {strategy}, many inputs", timed(lambda: txplanner.plan_transaction(
+                utxos, large, CHANGE, PROTOCOL_PARAMS, strategy=strategy), args.repeat))
+        report(f"{size} utxos, pack 1000 outputs", timed(lambda: txplanner.pack_outputs(
+            utxos, batch_outputs, CHANGE, PROTOCOL_PARAMS), max(args.repeat // 4, 1)))
+
+    if args.config and args.address:
+        from cardanopythonlib import base
+
+        node = base.Node(args.config)
+        params = {
+            "address_origin": args.address,
+            "address_destin": [{"address": args.address, "amount": 2000000}],
+            "change_address": args.address,
+            "metadata": None,
+            "mint": None,
+            "script_path": None,
+            "witness": 1,
+        }
+        utxo_count = len(node.get_transactions(args.address) or [])
+        report(f"cardano-cli build, {utxo_count} utxos", timed(lambda: node.build_tx_components(params),
+            max(args.repeat // 4, 1)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""initial tables
+
+Revision ID: 0c2e4a6b8d01
+Revises: 
+Create Date: 2022-10-20 16:02:11.734529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0c2e4a6b8d01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Tables as the API created them on startup before migrations were used.
+    # Databases created that way already have them: alembic stamp 0c2e4a6b8d01
+    # before the first alembic upgrade head
+    op.create_table('wallet',
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('base_addr', sa.Text(), nullable=False),
+        sa.Column('payment_addr', sa.Text(), nullable=False),
+        sa.Column('payment_skey', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('payment_vkey', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('stake_addr', sa.Text(), nullable=False),
+        sa.Column('stake_skey', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('stake_vkey', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('hash_verification_key', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_wallet_id'), 'wallet', ['id'], unique=False)
+    op.create_table('scripts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.Text(), nullable=True),
+        sa.Column('type', sa.Text(), nullable=True),
+        sa.Column('required', sa.Integer(), nullable=True),
+        sa.Column('hashes', sa.Text(), nullable=True),
+        sa.Column('type_time', sa.Text(), nullable=True),
+        sa.Column('slot', sa.Integer(), nullable=True),
+        sa.Column('purpose', sa.Enum('mint', 'multisig', name='scriptpurpose'), nullable=True),
+        sa.Column('content', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('policyID', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scripts_id'), 'scripts', ['id'], unique=False)
+    op.create_table('users',
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('id_wallet', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('username', sa.String(length=100), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('is_verified', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['id_wallet'], ['wallet.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('transactions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tx_id', sa.Text(), nullable=False),
+        sa.Column('id_wallet', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('submission', sa.DateTime(), nullable=True),
+        sa.Column('address_origin', sa.Text(), nullable=True),
+        sa.Column('address_destin', sa.Text(), nullable=True),
+        sa.Column('tx_cborhex', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('metadata_info', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('fees', sa.BigInteger(), nullable=True),
+        sa.Column('network', sa.Text(), nullable=True),
+        sa.Column('processed', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['id_wallet'], ['wallet.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transactions_id'), 'transactions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transactions_id'), table_name='transactions')
+    op.drop_table('transactions')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_scripts_id'), table_name='scripts')
+    op.drop_table('scripts')
+    op.drop_index(op.f('ix_wallet_id'), table_name='wallet')
+    op.drop_table('wallet')
+    sa.Enum(name='scriptpurpose').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""add transactions batch_id
+
+Revision ID: 3f1c2a9d8b10
+Revises: 0c2e4a6b8d01
+Create Date: 2022-10-24 10:12:31.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b10'
+down_revision = '0c2e4a6b8d01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('batch_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_index(op.f('ix_transactions_batch_id'), 'transactions', ['batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transactions_batch_id'), table_name='transactions')
+    op.drop_column('transactions', 'batch_id')
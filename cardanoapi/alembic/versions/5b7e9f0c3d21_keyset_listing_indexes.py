@@ -0,0 +1,41 @@
+"""keyset listing indexes
+
+Revision ID: 5b7e9f0c3d21
+Revises: 8c41e7d2a5f3
+Create Date: 2022-11-03 16:12:44.508731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e9f0c3d21'
+down_revision = '8c41e7d2a5f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing scripts get the migration time as creation time
+    op.add_column('scripts', sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    op.add_column('scripts', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+    # Row value comparisons skip NULLs, so every transaction needs a submission time
+    op.execute("UPDATE transactions SET submission = now() AT TIME ZONE 'utc' WHERE submission IS NULL")
+    op.alter_column('transactions', 'submission', existing_type=sa.DateTime(), nullable=False)
+    op.drop_index(op.f('ix_transactions_submission'), table_name='transactions')
+    op.create_index('ix_transactions_submission_id', 'transactions', ['submission', 'id'], unique=False)
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index('ix_wallet_created_at_id', 'wallet', ['created_at', 'id'], unique=False)
+    op.create_index('ix_scripts_created_at_id', 'scripts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scripts_created_at_id', table_name='scripts')
+    op.drop_index('ix_wallet_created_at_id', table_name='wallet')
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_transactions_submission_id', table_name='transactions')
+    op.create_index(op.f('ix_transactions_submission'), 'transactions', ['submission'], unique=False)
+    op.alter_column('transactions', 'submission', existing_type=sa.DateTime(), nullable=True)
+    op.drop_column('scripts', 'updated_at')
+    op.drop_column('scripts', 'created_at')
@@ -0,0 +1,35 @@
+"""index lookup columns
+
+Revision ID: 8c41e7d2a5f3
+Revises: 3f1c2a9d8b10
+Create Date: 2022-10-31 09:41:17.215504
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e7d2a5f3'
+down_revision = '3f1c2a9d8b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fails if the tables already hold duplicates; remove them before upgrading
+    op.create_unique_constraint(op.f('transactions_tx_id_key'), 'transactions', ['tx_id'])
+    op.create_unique_constraint(op.f('users_username_key'), 'users', ['username'])
+    op.create_unique_constraint(op.f('scripts_policyID_key'), 'scripts', ['policyID'])
+    op.create_index(op.f('ix_transactions_id_wallet'), 'transactions', ['id_wallet'], unique=False)
+    op.create_index(op.f('ix_transactions_submission'), 'transactions', ['submission'], unique=False)
+    op.create_index(op.f('ix_users_id_wallet'), 'users', ['id_wallet'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_id_wallet'), table_name='users')
+    op.drop_index(op.f('ix_transactions_submission'), table_name='transactions')
+    op.drop_index(op.f('ix_transactions_id_wallet'), table_name='transactions')
+    op.drop_constraint(op.f('scripts_policyID_key'), 'scripts', type_='unique')
+    op.drop_constraint(op.f('users_username_key'), 'users', type_='unique')
+    op.drop_constraint(op.f('transactions_tx_id_key'), 'transactions', type_='unique')
@@ -0,0 +1,42 @@
+"""wallet history
+
+Revision ID: a2d4c6e8f019
+Revises: 5b7e9f0c3d21
+Create Date: 2022-11-07 11:05:32.947215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2d4c6e8f019'
+down_revision = '5b7e9f0c3d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The composite index also serves lookups on id_wallet alone
+    op.drop_index(op.f('ix_transactions_id_wallet'), table_name='transactions')
+    op.create_index('ix_transactions_id_wallet_submission', 'transactions', ['id_wallet', 'submission', 'id'], unique=False)
+    op.create_table('wallet_daily_totals',
+        sa.Column('id_wallet', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tx_count', sa.Integer(), nullable=False),
+        sa.Column('total_fees', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['id_wallet'], ['wallet.id'], ),
+        sa.PrimaryKeyConstraint('id_wallet', 'day')
+    )
+    op.execute(
+        "INSERT INTO wallet_daily_totals (id_wallet, day, tx_count, total_fees) "
+        "SELECT id_wallet, submission::date, count(*), coalesce(sum(fees), 0) FROM transactions "
+        "WHERE id_wallet IS NOT NULL GROUP BY id_wallet, submission::date"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('wallet_daily_totals')
+    op.drop_index('ix_transactions_id_wallet_submission', table_name='transactions')
+    op.create_index(op.f('ix_transactions_id_wallet'), 'transactions', ['id_wallet'], unique=False)
@@ -0,0 +1,46 @@
+"""multisig witnesses
+
+Revision ID: b5d7f9a1c238
+Revises: f1a3c5e7b926
+Create Date: 2022-11-18 11:42:07.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d7f9a1c238'
+down_revision = 'f1a3c5e7b926'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('multisig_transactions',
+        sa.Column('tx_id', sa.Text(), nullable=False),
+        sa.Column('id_script', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tx_draft', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('auto_submit', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.Text(), nullable=False),
+        sa.Column('tx_signed', postgresql.JSON(astext_type=sa.Text()), nullable=True),
+        sa.Column('submit', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['id_script'], ['scripts.id'], ),
+        sa.PrimaryKeyConstraint('tx_id')
+    )
+    op.create_table('multisig_witnesses',
+        sa.Column('tx_id', sa.Text(), nullable=False),
+        sa.Column('key_hash', sa.Text(), nullable=False),
+        sa.Column('witness', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['tx_id'], ['multisig_transactions.tx_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('tx_id', 'key_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('multisig_witnesses')
+    op.drop_table('multisig_transactions')
@@ -0,0 +1,64 @@
+"""transactions binary cbor
+
+Revision ID: c7e1f3a5b902
+Revises: a2d4c6e8f019
+Create Date: 2022-11-10 15:27:08.331940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1f3a5b902'
+down_revision = 'a2d4c6e8f019'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('tx_cbor', sa.LargeBinary(), nullable=True))
+    op.add_column('transactions', sa.Column('tx_type', sa.Text(), nullable=True))
+    op.add_column('transactions', sa.Column('tx_description', sa.Text(), nullable=True))
+    # Move the envelopes to raw CBOR in batches, each committed on its own so
+    # the table is never locked as a whole. Rows are stored uncompressed, the
+    # zstd setting only applies to new transactions
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            result = connection.execute(sa.text(
+                "UPDATE transactions SET "
+                "tx_cbor = decode(tx_cborhex->>'cborHex', 'hex'), "
+                "tx_type = tx_cborhex->>'type', "
+                "tx_description = tx_cborhex->>'description', "
+                "tx_cborhex = NULL "
+                "WHERE id IN (SELECT id FROM transactions "
+                "WHERE tx_cborhex->>'cborHex' IS NOT NULL LIMIT :batch_size)"
+            ), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            # Compressed rows can't be decoded in SQL and are left out
+            result = connection.execute(sa.text(
+                "UPDATE transactions SET "
+                "tx_cborhex = json_build_object('type', tx_type, 'description', tx_description, "
+                "'cborHex', encode(tx_cbor, 'hex')), tx_cbor = NULL "
+                "WHERE id IN (SELECT id FROM transactions "
+                "WHERE tx_cbor IS NOT NULL AND substring(tx_cbor from 1 for 4) <> '\\x28b52ffd'::bytea "
+                "LIMIT :batch_size)"
+            ), {"batch_size": BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+    remaining = op.get_bind().execute(sa.text("SELECT count(*) FROM transactions WHERE tx_cbor IS NOT NULL")).scalar()
+    if remaining:
+        raise RuntimeError(f"{remaining} transactions are stored zstd compressed, decompress them before downgrading")
+    op.drop_column('transactions', 'tx_description')
+    op.drop_column('transactions', 'tx_type')
+    op.drop_column('transactions', 'tx_cbor')
@@ -0,0 +1,26 @@
+"""wallet pool without secrets
+
+Revision ID: d2e4f6a8b013
+Revises: b5d7f9a1c238
+Create Date: 2022-11-21 10:05:13.604127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e4f6a8b013'
+down_revision = 'b5d7f9a1c238'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Pooled wallets used to keep their mnemonic and private keys. Nobody
+    # has received them yet: drop them, the refill derives new ones
+    op.execute("DELETE FROM wallet_pool")
+
+
+def downgrade() -> None:
+    pass
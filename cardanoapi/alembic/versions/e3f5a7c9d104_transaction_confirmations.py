@@ -0,0 +1,38 @@
+"""transaction confirmations
+
+Revision ID: e3f5a7c9d104
+Revises: c7e1f3a5b902
+Create Date: 2022-11-14 10:42:51.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f5a7c9d104'
+down_revision = 'c7e1f3a5b902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Transactions stored before the tracker are not followed: their status
+    # is unknown and processed keeps its old meaning (submitted without error)
+    op.add_column('transactions', sa.Column('status', sa.Text(), nullable=False, server_default='unknown'))
+    op.alter_column('transactions', 'status', server_default='submitted')
+    op.add_column('transactions', sa.Column('ttl', sa.BigInteger(), nullable=True))
+    op.add_column('transactions', sa.Column('confirmed_slot', sa.BigInteger(), nullable=True))
+    op.add_column('transactions', sa.Column('confirmed_block', sa.BigInteger(), nullable=True))
+    op.add_column('transactions', sa.Column('depth', sa.Integer(), nullable=True))
+    op.create_index('ix_transactions_tracked', 'transactions', ['id'], unique=False,
+        postgresql_where=sa.text("status IN ('submitted', 'confirmed')"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_tracked', table_name='transactions')
+    op.drop_column('transactions', 'depth')
+    op.drop_column('transactions', 'confirmed_block')
+    op.drop_column('transactions', 'confirmed_slot')
+    op.drop_column('transactions', 'ttl')
+    op.drop_column('transactions', 'status')
@@ -0,0 +1,31 @@
+"""wallet pool
+
+Revision ID: f1a3c5e7b926
+Revises: e3f5a7c9d104
+Create Date: 2022-11-16 09:18:40.502733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a3c5e7b926'
+down_revision = 'e3f5a7c9d104'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('wallet_pool',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('keys', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('wallet_pool')
@@ -0,0 +1,60 @@
+"""Text forms of ledger addresses: bech32 (CIP-19) for Shelley addresses and
+base58 for Byron ones."""
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+BYRON = 8
+STAKE_KEY = 14
+STAKE_SCRIPT = 15
+MAINNET = 1
+
+
+def _polymod(values: list) -> int:
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            checksum ^= generator[i] if (top >> i) & 1 else 0
+    return checksum
+
+def _to_words(data: bytes) -> list:
+    # 8 bit bytes to 5 bit words, zero padded
+    words, accumulator, bits = [], 0, 0
+    for byte in data:
+        accumulator = accumulator << 8 | byte
+        bits += 8
+        while bits >= 5:
+            bits -= 5
+            words.append(accumulator >> bits & 31)
+    if bits:
+        words.append(accumulator << (5 - bits) & 31)
+    return words
+
+def bech32_encode(hrp: str, data: bytes) -> str:
+    """bech32 without the 90 characters limit of BIP-173, as Cardano uses it"""
+    words = _to_words(data)
+    expanded = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    polymod = _polymod(expanded + words + [0] * 6) ^ 1
+    checksum = [polymod >> 5 * (5 - i) & 31 for i in range(6)]
+    return hrp + "1" + "".join(BECH32_CHARSET[word] for word in words + checksum)
+
+def base58_encode(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return BASE58_ALPHABET[0] * (len(data) - len(data.lstrip(b"\x00"))) + encoded
+
+def encode_address(raw: bytes) -> str:
+    """Text form of an address from its bytes, e.g. from a transaction output"""
+    if not raw:
+        raise ValueError("Empty address")
+    kind, network = raw[0] >> 4, raw[0] & 0x0f
+    if kind == BYRON:
+        return base58_encode(raw)
+    hrp = "stake" if kind in (STAKE_KEY, STAKE_SCRIPT) else "addr"
+    return bech32_encode(hrp if network == MAINNET else hrp + "_test", raw)
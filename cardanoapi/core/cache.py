@@ -0,0 +1,104 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """In-process cache with per-entry expiry and an optional LRU bound.
+
+    get_or_load coalesces concurrent misses for the same key: only the first
+    caller runs the loader, the rest await its result.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        if self.maxsize:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate) -> None:
+        """Drop the entries whose value matches `predicate`"""
+        for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(self, key, loader, ttl: float = None):
+        """Return (value, cached). `loader` is an async callable without
+        arguments used on a miss. Concurrent callers get the loader's
+        exception too, and load again if the caller running it is cancelled."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value, True
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending), False
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+            # The caller running the loader was cancelled, not this one: load again
+            return await self.get_or_load(key, loader, ttl)
+
+        self.misses += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters get it; don't log it as unretrieved
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        self.set(key, value, ttl)
+        future.set_result(value)
+        return value, False
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
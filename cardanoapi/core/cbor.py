@@ -0,0 +1,187 @@
+"""Minimal CBOR (RFC 8949) for the ledger structures hashed and read here.
+
+Encoding uses definite lengths and the shortest integer form, which is how
+cardano-cli serializes native scripts. Decoding accepts any well formed
+item, definite or not.
+"""
+import struct
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+# Major types
+UNSIGNED = 0
+NEGATIVE = 1
+BYTES = 2
+TEXT = 3
+ARRAY = 4
+MAP = 5
+TAG = 6
+SIMPLE = 7
+
+BREAK = 0xff
+# Tag 258 marks a set (Conway era inputs, signers...), decoded as its list
+SET_TAG = 258
+
+
+def _head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([major << 5 | value])
+    if value < 1 << 8:
+        return bytes([major << 5 | 24]) + value.to_bytes(1, "big")
+    if value < 1 << 16:
+        return bytes([major << 5 | 25]) + value.to_bytes(2, "big")
+    if value < 1 << 32:
+        return bytes([major << 5 | 26]) + value.to_bytes(4, "big")
+    if value < 1 << 64:
+        return bytes([major << 5 | 27]) + value.to_bytes(8, "big")
+    raise ValueError(f"Integer out of CBOR range: {value}")
+
+def encode(value: Any) -> bytes:
+    """CBOR of ints, bytes, str, lists/tuples, dicts, bool and None"""
+    if isinstance(value, bool):
+        return bytes([SIMPLE << 5 | (21 if value else 20)])
+    if value is None:
+        return bytes([SIMPLE << 5 | 22])
+    if isinstance(value, int):
+        return _head(UNSIGNED, value) if value >= 0 else _head(NEGATIVE, -1 - value)
+    if isinstance(value, (bytes, bytearray)):
+        return _head(BYTES, len(value)) + bytes(value)
+    if isinstance(value, str):
+        data = value.encode()
+        return _head(TEXT, len(data)) + data
+    if isinstance(value, (list, tuple)):
+        return _head(ARRAY, len(value)) + b"".join(encode(item) for item in value)
+    if isinstance(value, dict):
+        return _head(MAP, len(value)) + b"".join(encode(k) + encode(v) for k, v in value.items())
+    raise TypeError(f"Can't encode {type(value).__name__} as CBOR")
+
+
+class Tag(NamedTuple):
+    tag: int
+    value: Any
+
+
+def _read_head(data: bytes, offset: int) -> Tuple[int, int, Optional[int], int]:
+    """(major type, additional info, argument, offset after the head).
+    The argument is None for indefinite lengths"""
+    initial = data[offset]
+    major, info = initial >> 5, initial & 0x1f
+    offset += 1
+    if info < 24:
+        return major, info, info, offset
+    if info <= 27:
+        size = 1 << (info - 24)
+        if offset + size > len(data):
+            raise ValueError("Truncated CBOR")
+        return major, info, int.from_bytes(data[offset:offset + size], "big"), offset + size
+    if info == 31 and major in (BYTES, TEXT, ARRAY, MAP, SIMPLE):
+        return major, info, None, offset
+    raise ValueError(f"Invalid CBOR head at byte {offset - 1}")
+
+def _is_break(data: bytes, offset: int) -> bool:
+    if offset >= len(data):
+        raise ValueError("Truncated CBOR")
+    return data[offset] == BREAK
+
+def _decode(data: bytes, offset: int) -> Tuple[Any, int]:
+    major, info, value, offset = _read_head(data, offset)
+    if major == UNSIGNED:
+        return value, offset
+    if major == NEGATIVE:
+        return -1 - value, offset
+    if major in (BYTES, TEXT):
+        if value is None:
+            chunks = []
+            while not _is_break(data, offset):
+                chunk, offset = _decode(data, offset)
+                chunks.append(chunk)
+            raw = (b"" if major == BYTES else "").join(chunks)
+            return raw, offset + 1
+        if offset + value > len(data):
+            raise ValueError("Truncated CBOR")
+        raw = data[offset:offset + value]
+        return (raw if major == BYTES else raw.decode()), offset + value
+    if major == ARRAY:
+        items = []
+        while (len(items) < value) if value is not None else not _is_break(data, offset):
+            item, offset = _decode(data, offset)
+            items.append(item)
+        return items, offset if value is not None else offset + 1
+    if major == MAP:
+        items = {}
+        count = 0
+        while (count < value) if value is not None else not _is_break(data, offset):
+            key, offset = _decode(data, offset)
+            items[tuple(key) if isinstance(key, list) else key], offset = _decode(data, offset)
+            count += 1
+        return items, offset if value is not None else offset + 1
+    if major == TAG:
+        item, offset = _decode(data, offset)
+        return (item if value == SET_TAG else Tag(value, item)), offset
+    # Simple values and floats
+    if info == 20:
+        return False, offset
+    if info == 21:
+        return True, offset
+    if info in (22, 23):
+        return None, offset
+    if info == 25:
+        return struct.unpack(">e", value.to_bytes(2, "big"))[0], offset
+    if info == 26:
+        return struct.unpack(">f", value.to_bytes(4, "big"))[0], offset
+    if info == 27:
+        return struct.unpack(">d", value.to_bytes(8, "big"))[0], offset
+    return value, offset
+
+def decode(data: bytes) -> Any:
+    """Python value of a CBOR item: maps are dicts (array keys become
+    tuples), sets are lists and other tags Tag. Raises ValueError if `data`
+    is not exactly one well formed item"""
+    try:
+        value, offset = _decode(data, 0)
+    except (IndexError, TypeError, UnicodeDecodeError, RecursionError) as e:
+        raise ValueError(f"Invalid CBOR: {e}")
+    _check_end(data, offset)
+    return value
+
+def _check_end(data: bytes, offset: int) -> None:
+    if offset != len(data):
+        raise ValueError("Trailing bytes after CBOR item")
+
+def array_items(data: bytes) -> List[bytes]:
+    """Encoded bytes of each item of a CBOR array, as they appear in `data`.
+    Hashes are over the original bytes, which re-encoding may not reproduce"""
+    try:
+        major, _, length, offset = _read_head(data, 0)
+        if major != ARRAY:
+            raise ValueError("CBOR item is not an array")
+        items = []
+        while (len(items) < length) if length is not None else not _is_break(data, offset):
+            _, end = _decode(data, offset)
+            items.append(data[offset:end])
+            offset = end
+    except (IndexError, TypeError, UnicodeDecodeError, RecursionError) as e:
+        raise ValueError(f"Invalid CBOR: {e}")
+    _check_end(data, offset if length is not None else offset + 1)
+    return items
+
+def map_items(data: bytes) -> List[Tuple[bytes, bytes]]:
+    """Encoded (key, value) bytes of each entry of a CBOR map, as they appear in `data`"""
+    try:
+        major, _, length, offset = _read_head(data, 0)
+        if major != MAP:
+            raise ValueError("CBOR item is not a map")
+        items = []
+        while (len(items) < length) if length is not None else not _is_break(data, offset):
+            _, middle = _decode(data, offset)
+            _, end = _decode(data, middle)
+            items.append((data[offset:middle], data[middle:end]))
+            offset = end
+    except (IndexError, TypeError, UnicodeDecodeError, RecursionError) as e:
+        raise ValueError(f"Invalid CBOR: {e}")
+    _check_end(data, offset if length is not None else offset + 1)
+    return items
+
+def head(major: int, value: int) -> bytes:
+    """Initial bytes of an item of `major` type with length or value `value`,
+    to assemble items from already encoded parts"""
+    return _head(major, value)
@@ -0,0 +1,70 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from celery import Celery
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+
+
+celery = Celery(
+    "cardanoapi",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+)
+celery.conf.update(
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_store_eager_result=True,
+    task_track_started=True,
+)
+
+
+class JobError(Exception):
+    """Raised inside a job when the wrapped endpoint rejects the request."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _run(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Eager mode: the task is executed from inside the API event loop
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+
+_job_sessions = None
+
+
+def _job_session():
+    # Each job runs its own event loop, so pooled asyncpg connections can't
+    # be shared between jobs: open a fresh connection per session instead.
+    global _job_sessions
+    if _job_sessions is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import NullPool
+        from db.dblib import config, config_path, database_url
+
+        engine = create_async_engine(database_url(config(config_path, section='postgresql')), poolclass=NullPool)
+        _job_sessions = sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _job_sessions()
+
+
+def run_job(endpoint, *args):
+    """Run an async endpoint function from a Celery worker with its own
+    database session and return a JSON serializable result."""
+    async def call():
+        async with _job_session() as db:
+            return jsonable_encoder(await endpoint(*args, db=db))
+
+    try:
+        return _run(call())
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
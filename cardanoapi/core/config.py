@@ -1,13 +1,23 @@
 import pathlib
+from configparser import ConfigParser
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, validator
-from typing import List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 
 # Project Directories
 ROOT = pathlib.Path(__file__).resolve().parent.parent
+CONFIG_INI = './config.ini'
 
 
+def users_ini_settings(settings: BaseSettings) -> Dict[str, Any]:
+    """[users] section of config.ini (secret_key, algorithm, token_expire)"""
+    parser = ConfigParser()
+    parser.read(CONFIG_INI)
+    if not parser.has_section('users'):
+        return {}
+    return {key.upper(): value for key, value in parser.items('users') if key.upper() in settings.__fields__}
+
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
@@ -27,8 +37,116 @@ class Settings(BaseSettings):
     # SQLALCHEMY_DATABASE_URI: Optional[str] = "sqlite:///example.db"
     FIRST_SUPERUSER: EmailStr = "admin@recipeapi.com"  # type: ignore
 
+    # Worker pools for blocking cardano-cli calls and CPU bound work
+    EXECUTOR_THREAD_WORKERS: int = 16
+    EXECUTOR_PROCESS_WORKERS: int = 2
+
+    # Celery job queue. Use memory:// and cache+memory:// with
+    # CELERY_TASK_ALWAYS_EAGER to run jobs in-process (e.g. in tests)
+    CELERY_BROKER_URL: str = "redis://127.0.0.1:6379/0"
+    CELERY_RESULT_BACKEND: str = "redis://127.0.0.1:6379/0"
+    CELERY_TASK_ALWAYS_EAGER: bool = False
+
+    # Chain data caches (seconds). Protocol parameters are also keyed by epoch
+    TIP_CACHE_TTL: float = 1.0
+    PROTOCOL_PARAMS_CACHE_TTL: float = 3600.0
+    UTXO_CACHE_TTL: float = 5.0
+    UTXO_CACHE_SIZE: int = 1024
+
+    # Bulk address queries: addresses per node query and size above which
+    # results are streamed as NDJSON
+    BULK_QUERY_BATCH_SIZE: int = 100
+    BULK_STREAM_THRESHOLD: int = 1000
+
+    # Seconds our submitted transactions keep their inputs reserved and their
+    # change available for chaining while waiting to reach a block
+    PENDING_UTXO_TTL: float = 300.0
+    # Transactions built in process (build-raw) are valid for TX_TTL_SLOTS
+    # slots after the tip, then the confirmation tracker can expire them
+    TX_TTL_SLOTS: int = 3600
+
+    # JWT signing, from the [users] section of config.ini unless set as env variables.
+    # SECRET_KEY is required. TOKEN_EXPIRE is in minutes
+    SECRET_KEY: str
+    ALGORITHM: str = "HS256"
+    TOKEN_EXPIRE: int = 30
+    # Verified token -> user cache (seconds), never beyond the token expiry
+    TOKEN_CACHE_TTL: float = 60.0
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # bcrypt cost factor; existing hashes with another cost are upgraded on login.
+    # Hashing runs in its own process pool with at most PASSWORD_HASH_CONCURRENCY
+    # calls submitted at a time
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_CONCURRENCY: int = 8
+
+    # Bulk wallet generation: processes deriving keys, wallets derived per
+    # process call and inserted per statement, and wallets per request
+    BULK_WALLET_WORKERS: int = 4
+    BULK_WALLET_CHUNK_SIZE: int = 50
+    BULK_WALLET_MAX: int = 100000
+
+    # Warm wallet pool for /keys/generate: up to WALLET_POOL_SIZE derived
+    # wallets with WALLET_POOL_MNEMONIC_SIZE words are kept ready, refilled
+    # BULK_WALLET_CHUNK_SIZE at a time once below WALLET_POOL_LOW_WATERMARK
+    # (checked every WALLET_POOL_INTERVAL seconds and after each claim).
+    # 0 disables the pool
+    WALLET_POOL_SIZE: int = 0
+    WALLET_POOL_LOW_WATERMARK: int = 0
+    WALLET_POOL_MNEMONIC_SIZE: int = 24
+    WALLET_POOL_INTERVAL: float = 30.0
+
+    # Confirmation tracker: every CONFIRMATION_INTERVAL seconds the submitted
+    # transactions are looked up on chain, CONFIRMATION_BATCH_SIZE per query.
+    # Depth is tracked up to CONFIRMATION_DEPTH blocks. Transactions without
+    # TTL expire CONFIRMATION_TIMEOUT seconds after submission
+    CONFIRMATION_TRACKER: bool = True
+    CONFIRMATION_INTERVAL: float = 20.0
+    CONFIRMATION_BATCH_SIZE: int = 100
+    CONFIRMATION_DEPTH: int = 15
+    CONFIRMATION_TIMEOUT: float = 3600.0
+
+    # Event streams (/stream): seconds between polls of the shared poller,
+    # events buffered per client before it is dropped, transactions plus
+    # addresses per subscription and seconds between SSE keepalives
+    STREAM_POLL_INTERVAL: float = 2.0
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_MAX_KEYS: int = 100
+    STREAM_KEEPALIVE: float = 15.0
+
+    # Multisig witness collection: wallets signing in one request are split
+    # in chunks of MULTISIG_SIGN_CHUNK keys signed in parallel processes
+    MULTISIG_SIGN_CHUNK: int = 16
+
+    # Policy ids of simple scripts, cached by script content
+    POLICY_ID_CACHE_SIZE: int = 4096
+
+    # Signed transactions are stored as raw CBOR ("bytea") or as the cardano-cli
+    # JSON envelope ("json"). TX_CBOR_ZSTD compresses the CBOR (needs zstandard)
+    TX_CBOR_STORAGE: str = "bytea"
+    TX_CBOR_ZSTD: bool = False
+    TX_CBOR_ZSTD_LEVEL: int = 3
+
+    @validator("SECRET_KEY")
+    def check_secret_key(cls, v: str) -> str:
+        # An empty HMAC key would let anyone sign valid tokens
+        if not v.strip():
+            raise ValueError("SECRET_KEY must be set in the [users] section of config.ini or the environment")
+        return v
+
+    @validator("TX_CBOR_STORAGE")
+    def check_tx_cbor_storage(cls, v: str) -> str:
+        if v not in ("bytea", "json"):
+            raise ValueError("TX_CBOR_STORAGE must be bytea or json")
+        return v
+
     class Config:
         case_sensitive = True
 
+        @classmethod
+        def customise_sources(cls, init_settings, env_settings, file_secret_settings):
+            return init_settings, env_settings, users_ini_settings, file_secret_settings
+
 
 settings = Settings()
\ No newline at end of file
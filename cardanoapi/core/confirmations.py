@@ -0,0 +1,303 @@
+"""Background tracking of our submitted transactions until they settle on chain.
+
+Each tick looks up the submitted transactions on chain in batches, one
+chain query per batch, and records the slot, block and depth of the ones
+found (status confirmed, processed true). Confirmed transactions have their
+depth refreshed until CONFIRMATION_DEPTH blocks (status final).
+
+A transaction not found once the tip is past its TTL, or CONFIRMATION_TIMEOUT
+seconds after submission when it has none, is expired only if one of its
+inputs is still unspent: a transaction on chain has spent them all. When
+they are all spent and none of its outputs was ever seen (they were spent
+before a tick saw them, or the inputs went to another transaction) its
+status becomes unknown instead.
+
+Only one API worker runs a tick at a time (postgres advisory lock).
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import BigInteger, bindparam, func, literal, select, update
+from sqlalchemy.orm import undefer
+
+from core import txstorage, txview
+from core.config import settings
+from core.context import context
+from core.executor import run_in_thread
+from db.dblib import SessionLocal
+from db.models import dbmodels
+
+logger = logging.getLogger(__name__)
+
+SUBMITTED = "submitted"
+CONFIRMED = "confirmed"
+FINAL = "final"
+EXPIRED = "expired"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+# pg_try_advisory_xact_lock key of the tracker
+TRACKER_LOCK = 0x7478636f6e66
+# --tx-in per cardano-cli query utxo call, keeps the command line short
+QUERY_TX_INS = 500
+
+
+class ChainSource:
+    """Where the tracker reads the chain from"""
+
+    async def tip(self) -> dict:
+        """{"slot": ..., "block": ...} of the chain tip"""
+        raise NotImplementedError
+
+    async def locate(self, tx_ids: List[str], tip: dict,
+            outputs: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[int, int]]:
+        """(slot, block) of the given transactions that are on chain, in one
+        query. `tip` is the tip read at the start of the tick. `outputs` is
+        the number of outputs of each transaction when known, sources that
+        look transactions up by their outputs check all of them"""
+        raise NotImplementedError
+
+    async def unspent(self, tx_ins: List[str]) -> Set[str]:
+        """The given "tx_id#index" that are still in the UTxO set"""
+        raise NotImplementedError
+
+
+class NodeChainSource(ChainSource):
+    """cardano-cli through the node of core.context.
+
+    The node can't look up a transaction, so a transaction is on chain when
+    any of its outputs (the change included) is in the UTxO set (cardano-cli
+    query utxo --tx-in). The node doesn't tell the block either: the slot
+    and block recorded are those of the tip of the tick it was first seen
+    in, at most one interval after it was included, so the depth is a lower
+    bound.
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+    async def tip(self) -> dict:
+        return await run_in_thread(self.context.node.query_tip_exec)
+
+    def _query(self, tx_ins: List[str]) -> dict:
+        node = self.context.node
+        utxos = {}
+        for i in range(0, len(tx_ins), QUERY_TX_INS):
+            command_string = [node.CARDANO_CLI_PATH, "query", "utxo"]
+            for tx_in in tx_ins[i:i + QUERY_TX_INS]:
+                command_string.extend(["--tx-in", tx_in])
+            if node.CARDANO_NETWORK == "testnet":
+                command_string.extend(["--testnet-magic", str(node.CARDANO_NETWORK_MAGIC)])
+            else:
+                command_string.append("--mainnet")
+            command_string.extend(["--out-file", "/dev/stdout"])
+            utxos.update(json.loads(node.execute_command(command_string, None)))
+        return utxos
+
+    async def locate(self, tx_ids: List[str], tip: dict,
+            outputs: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[int, int]]:
+        if not tx_ids:
+            return {}
+        outputs = outputs or {}
+        tx_ins = [f"{tx_id}#{index}" for tx_id in tx_ids for index in range(outputs.get(tx_id, 1))]
+        utxos = await run_in_thread(self._query, tx_ins)
+        found = {tx_in.split("#")[0] for tx_in in utxos}
+        return {tx_id: (tip["slot"], tip["block"]) for tx_id in tx_ids if tx_id in found}
+
+    async def unspent(self, tx_ins: List[str]) -> Set[str]:
+        if not tx_ins:
+            return set()
+        return set(await run_in_thread(self._query, tx_ins)) & set(tx_ins)
+
+
+class MemoryChainSource(ChainSource):
+    """Chain kept in memory, for tests and local runs without a node:
+    add_block() includes transactions, spending their inputs, and moves the
+    tip. spend() spends outputs, e.g. a recipient spending what it got"""
+
+    def __init__(self, slot: int = 0, block: int = 0):
+        self.slot = slot
+        self.block = block
+        self.transactions = {}
+        self.spent = set()
+        self.queries = 0
+
+    def add_block(self, tx_ids: Iterable[str] = (), slots: int = 20,
+            inputs: Optional[Dict[str, List[str]]] = None) -> None:
+        self.slot += slots
+        self.block += 1
+        for tx_id in tx_ids:
+            self.transactions[tx_id] = (self.slot, self.block)
+            self.spend((inputs or {}).get(tx_id, []))
+
+    def spend(self, tx_ins: Iterable[str]) -> None:
+        self.spent.update(tx_ins)
+
+    async def tip(self) -> dict:
+        return {"slot": self.slot, "block": self.block}
+
+    async def locate(self, tx_ids: List[str], tip: dict,
+            outputs: Optional[Dict[str, int]] = None) -> Dict[str, Tuple[int, int]]:
+        self.queries += 1
+        return {tx_id: self.transactions[tx_id] for tx_id in tx_ids if tx_id in self.transactions}
+
+    async def unspent(self, tx_ins: List[str]) -> Set[str]:
+        self.queries += 1
+        return set(tx_ins) - self.spent
+
+
+class ConfirmationTracker:
+    """Runs tick() every `interval` seconds as a task of the API event loop"""
+
+    def __init__(self, source: ChainSource, sessions, interval: float = settings.CONFIRMATION_INTERVAL,
+            batch_size: int = settings.CONFIRMATION_BATCH_SIZE, depth: int = settings.CONFIRMATION_DEPTH,
+            timeout: float = settings.CONFIRMATION_TIMEOUT):
+        self.source = source
+        self.sessions = sessions
+        self.interval = interval
+        self.batch_size = batch_size
+        self.depth = depth
+        self.timeout = timeout
+        self._task = None
+        self.ticks = 0
+        self.confirmed = 0
+        self.expired = 0
+        self.unknown = 0
+        self.last_tick = None
+        self.last_error = None
+
+    @staticmethod
+    def _spends(transaction: dbmodels.Transactions) -> Tuple[List[str], int]:
+        """Inputs and number of outputs of a stored transaction, ([], 0) if
+        its CBOR can't be read"""
+        try:
+            return txview.inputs_outputs(txstorage.envelope(transaction)["cborHex"])
+        except (KeyError, TypeError, ValueError):
+            return [], 0
+
+    async def tick(self) -> Optional[dict]:
+        """Check every submitted transaction once. Returns the counts of the
+        tick, or None if another worker holds the tracker lock"""
+        transactions = dbmodels.Transactions
+        counts = {"checked": 0, "confirmed": 0, "expired": 0, "unknown": 0, "final": 0}
+
+        async with self.sessions() as db:
+            if not await db.scalar(select(func.pg_try_advisory_xact_lock(literal(TRACKER_LOCK, BigInteger)))):
+                return None
+            tip = await self.source.tip()
+            timed_out = datetime.utcnow() - timedelta(seconds=self.timeout)
+            last_id = 0
+            while True:
+                batch = (await db.execute(
+                    select(transactions)
+                    .options(undefer(transactions.tx_cbor), undefer(transactions.tx_cborhex))
+                    .where(transactions.status == SUBMITTED, transactions.id > last_id)
+                    .order_by(transactions.id).limit(self.batch_size))).scalars().all()
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                counts["checked"] += len(batch)
+                spends = {row.tx_id: self._spends(row) for row in batch}
+                found = await self.source.locate([row.tx_id for row in batch], tip,
+                    {tx_id: outputs for tx_id, (_, outputs) in spends.items() if outputs})
+                confirmed = []
+                late = []
+                for row in batch:
+                    if row.tx_id in found:
+                        slot, block = found[row.tx_id]
+                        confirmed.append({"_id": row.id, "_slot": slot, "_block": block,
+                            "_depth": max(tip["block"] - block, 0)})
+                    elif (tip["slot"] > row.ttl) if row.ttl is not None else (row.submission < timed_out):
+                        late.append(row)
+                # Late transactions with an input still unspent never made it
+                # on chain. One query for the inputs of the whole batch
+                unspent = await self.source.unspent(
+                    [tx_in for row in late for tx_in in spends[row.tx_id][0]]) if late else set()
+                expired = []
+                unknown = []
+                for row in late:
+                    tx_ins = spends[row.tx_id][0]
+                    if not tx_ins or any(tx_in in unspent for tx_in in tx_ins):
+                        expired.append({"_id": row.id})
+                    else:
+                        unknown.append({"_id": row.id})
+                if confirmed:
+                    await db.execute(update(transactions.__table__)
+                        .where(transactions.id == bindparam("_id"))
+                        .values(status=CONFIRMED, processed=True, confirmed_slot=bindparam("_slot"),
+                            confirmed_block=bindparam("_block"), depth=bindparam("_depth")),
+                        confirmed)
+                if expired:
+                    await db.execute(update(transactions.__table__)
+                        .where(transactions.id == bindparam("_id"))
+                        .values(status=EXPIRED, processed=False), expired)
+                if unknown:
+                    await db.execute(update(transactions.__table__)
+                        .where(transactions.id == bindparam("_id"))
+                        .values(status=UNKNOWN), unknown)
+                counts["confirmed"] += len(confirmed)
+                counts["expired"] += len(expired)
+                counts["unknown"] += len(unknown)
+
+            # Depth of every confirmed transaction in one statement
+            await db.execute(update(transactions)
+                .where(transactions.status == CONFIRMED)
+                .values(depth=tip["block"] - transactions.confirmed_block)
+                .execution_options(synchronize_session=False))
+            result = await db.execute(update(transactions)
+                .where(transactions.status == CONFIRMED, transactions.depth >= self.depth)
+                .values(status=FINAL)
+                .execution_options(synchronize_session=False))
+            counts["final"] = result.rowcount
+            await db.commit()
+
+        self.ticks += 1
+        self.confirmed += counts["confirmed"]
+        self.expired += counts["expired"]
+        self.unknown += counts["unknown"]
+        self.last_tick = time.time()
+        return counts
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The node or the database may be briefly unavailable, retry next tick
+                self.last_error = repr(e)
+                logger.exception("Confirmation tracker tick failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "ticks": self.ticks,
+            "confirmed": self.confirmed,
+            "expired": self.expired,
+            "unknown": self.unknown,
+            "last_tick": self.last_tick,
+            "last_error": self.last_error,
+        }
+
+
+confirmation_tracker = ConfirmationTracker(NodeChainSource(context), SessionLocal)
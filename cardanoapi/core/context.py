@@ -0,0 +1,42 @@
+import threading
+
+from cardanopythonlib import base
+
+
+class AppContext:
+    """cardanopythonlib clients shared by every router.
+
+    base.Starter reads config.ini, creates its folders and sets up a logger
+    each time it is built, so one Node and one Keys are created on first use
+    (or by the startup event) and reused. Requests that write files work on
+    a core.workspace copy of them.
+    """
+
+    def __init__(self, config_path: str = './config.ini'):
+        self.config_path = config_path
+        self._node = None
+        self._keys = None
+        self._lock = threading.Lock()
+
+    @property
+    def node(self) -> base.Node:
+        if self._node is None:
+            with self._lock:
+                if self._node is None:
+                    self._node = base.Node(self.config_path)
+        return self._node
+
+    @property
+    def keys(self) -> base.Keys:
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self._keys = base.Keys(self.config_path)
+        return self._keys
+
+    def load(self) -> None:
+        self.node
+        self.keys
+
+
+context = AppContext()
@@ -0,0 +1,252 @@
+"""Push notifications of new blocks, transaction status and address UTxOs.
+
+One poller per API worker reads the tip and the state of everything
+subscribed to, whatever the number of connected clients, and fans the
+changes out to the subscribers' queues:
+
+- tip: every new block, to every subscriber
+- tx: status, slot, block and depth of a transaction when they change
+- address: UTxOs of an address when they change (checked once per block)
+
+The poller only runs while someone is subscribed, it stops as soon as the
+last subscriber leaves. A new subscriber gets
+the last known state right away, without querying the node.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Events for one client. get() returns None once the subscription is
+    closed, including when the client is dropped for not keeping up"""
+
+    def __init__(self, hub: "EventHub", queue_size: int):
+        self.hub = hub
+        self.tx_ids = set()
+        self.addresses = set()
+        self.queue = asyncio.Queue(queue_size)
+        self.closed = False
+        self.dropped = False
+
+    def push(self, event: dict) -> None:
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow for the stream: drop what is queued and end it
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.dropped = True
+            self.close()
+
+    async def get(self) -> Optional[dict]:
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+    def subscribe(self, tx_ids: Iterable[str] = (), addresses: Iterable[str] = ()) -> None:
+        """Raises ValueError above the hub's max_keys"""
+        self.hub.subscribe(self, tx_ids, addresses)
+
+    def unsubscribe(self, tx_ids: Iterable[str] = (), addresses: Iterable[str] = ()) -> None:
+        self.hub.unsubscribe(self, tx_ids, addresses)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.hub.remove(self)
+            # Wake up a pending get()
+            if self.queue.empty():
+                self.queue.put_nowait(None)
+
+
+class EventHub:
+    """Shared poller. The sources are async callables:
+
+    - tip() -> tip dict with at least "block"
+    - tx_states(tx_ids) -> {tx_id: state dict} of the stored transactions
+    - address_utxos(addresses) -> {address: utxos}, one node query per batch
+    - locate(tx_ids, tip) -> {tx_id: (slot, block)}, optional, for
+      transactions that are not ours
+    """
+
+    def __init__(self, tip: Callable[[], Awaitable[dict]],
+            tx_states: Callable[[List[str]], Awaitable[Dict[str, dict]]],
+            address_utxos: Callable[[List[str]], Awaitable[Dict[str, list]]],
+            locate: Optional[Callable[[List[str], dict], Awaitable[dict]]] = None,
+            interval: float = 2.0, queue_size: int = 100, max_keys: int = 100):
+        self.tip = tip
+        self.tx_states = tx_states
+        self.address_utxos = address_utxos
+        self.locate = locate
+        self.interval = interval
+        self.queue_size = queue_size
+        self.max_keys = max_keys
+        self._subscribers = set()
+        self._by_tx = {}        # tx_id -> subscriptions
+        self._by_address = {}   # address -> subscriptions
+        self._tip = None
+        self._tx = {}           # tx_id -> last state
+        self._utxos = {}        # address -> last utxos
+        self._task = None
+        # Set when the last subscriber leaves, ends the poller's wait
+        self._idle = None
+        self.polls = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def open(self, tx_ids: Iterable[str] = (), addresses: Iterable[str] = ()) -> Subscription:
+        """New subscription, starting the poller if needed. Close it when done.
+        Raises ValueError above max_keys"""
+        subscription = Subscription(self, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._tip is not None:
+            subscription.push({"event": "tip", **self._tip})
+        try:
+            subscription.subscribe(tx_ids, addresses)
+        except ValueError:
+            subscription.close()
+            raise
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return subscription
+
+    def subscribe(self, subscription: Subscription, tx_ids: Iterable[str], addresses: Iterable[str]) -> None:
+        tx_ids = set(tx_ids) - subscription.tx_ids
+        addresses = set(addresses) - subscription.addresses
+        total = len(subscription.tx_ids) + len(subscription.addresses) + len(tx_ids) + len(addresses)
+        if total > self.max_keys:
+            raise ValueError(f"At most {self.max_keys} transactions and addresses per subscription")
+        for tx_id in tx_ids:
+            subscription.tx_ids.add(tx_id)
+            self._by_tx.setdefault(tx_id, set()).add(subscription)
+            if tx_id in self._tx:
+                subscription.push(self._tx_event(tx_id))
+        for address in addresses:
+            subscription.addresses.add(address)
+            self._by_address.setdefault(address, set()).add(subscription)
+            if address in self._utxos:
+                subscription.push(self._address_event(address))
+
+    def unsubscribe(self, subscription: Subscription, tx_ids: Iterable[str], addresses: Iterable[str]) -> None:
+        for tx_id in set(tx_ids) & subscription.tx_ids:
+            subscription.tx_ids.discard(tx_id)
+            self._discard(self._by_tx, self._tx, tx_id, subscription)
+        for address in set(addresses) & subscription.addresses:
+            subscription.addresses.discard(address)
+            self._discard(self._by_address, self._utxos, address, subscription)
+
+    @staticmethod
+    def _discard(index: dict, states: dict, key: str, subscription: Subscription) -> None:
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                # Nobody follows it anymore, stop querying it
+                del index[key]
+                states.pop(key, None)
+
+    def remove(self, subscription: Subscription) -> None:
+        if subscription not in self._subscribers:
+            return
+        self._subscribers.discard(subscription)
+        if subscription.dropped:
+            self.dropped += 1
+        self.unsubscribe(subscription, list(subscription.tx_ids), list(subscription.addresses))
+        if not self._subscribers and self._idle is not None:
+            self._idle.set()
+
+    def _tx_event(self, tx_id: str) -> dict:
+        return {"event": "tx", "tx_id": tx_id, **self._tx[tx_id]}
+
+    def _address_event(self, address: str) -> dict:
+        return {"event": "address", "address": address, "utxos": self._utxos[address]}
+
+    def _publish(self, subscriptions: Iterable[Subscription], event: dict) -> None:
+        for subscription in list(subscriptions):
+            subscription.push(event)
+
+    async def poll(self) -> None:
+        """Read the tip and the subscribed state once and publish the changes"""
+        tip = await self.tip()
+        new_block = self._tip is None or tip.get("block") != self._tip.get("block")
+        if new_block:
+            self._tip = tip
+            self._publish(self._subscribers, {"event": "tip", **tip})
+
+        tx_ids = list(self._by_tx)
+        if tx_ids:
+            states = await self.tx_states(tx_ids)
+            missing = [tx_id for tx_id in tx_ids if tx_id not in states]
+            if missing and self.locate is not None:
+                if new_block:
+                    for tx_id, (slot, block) in (await self.locate(missing, tip)).items():
+                        states[tx_id] = {"status": "on_chain", "confirmed_slot": slot,
+                            "confirmed_block": block, "depth": max(tip["block"] - block, 0)}
+                else:
+                    # Not ours: only looked up on chain once per block
+                    states.update((tx_id, self._tx[tx_id]) for tx_id in missing if tx_id in self._tx)
+            for tx_id, state in states.items():
+                if tx_id in self._by_tx and self._tx.get(tx_id) != state:
+                    self._tx[tx_id] = state
+                    self._publish(self._by_tx[tx_id], self._tx_event(tx_id))
+
+        # UTxOs only change with a block, new addresses are read right away
+        addresses = [address for address in self._by_address if new_block or address not in self._utxos]
+        if addresses:
+            for address, utxos in (await self.address_utxos(addresses)).items():
+                if address in self._by_address and self._utxos.get(address) != utxos:
+                    self._utxos[address] = utxos
+                    self._publish(self._by_address[address], self._address_event(address))
+        self.polls += 1
+
+    async def run(self) -> None:
+        self._idle = asyncio.Event()
+        try:
+            while self._subscribers:
+                try:
+                    await self.poll()
+                    self.last_error = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # The node may be briefly unavailable, retry next poll
+                    self.last_error = repr(e)
+                    logger.exception("Event poll failed")
+                try:
+                    await asyncio.wait_for(self._idle.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._idle.clear()
+        finally:
+            self._task = None
+            # State is only kept up to date while someone listens
+            self._tip = None
+            self._tx.clear()
+            self._utxos.clear()
+
+    async def stop(self) -> None:
+        for subscription in list(self._subscribers):
+            subscription.close()
+        task = self._task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "subscribers": len(self._subscribers),
+            "tx_ids": len(self._by_tx),
+            "addresses": len(self._by_address),
+            "polls": self.polls,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
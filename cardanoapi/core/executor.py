@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from core.config import settings
+
+
+def _timed_call(fn, args, kwargs):
+    # Runs inside the worker; the start time is returned with the result so
+    # the caller can tell how long the call waited in the pool queue.
+    return time.time(), fn(*args, **kwargs)
+
+
+class BoundedExecutor:
+    """Fixed-size worker pool with queue-depth and wait-time bookkeeping.
+
+    Blocking work (cardano-cli subprocesses, key derivation, hashing) is
+    submitted here so the asyncio event loop stays free for cheap requests.
+    """
+
+    def __init__(self, name: str, pool_class, max_workers: int):
+        self.name = name
+        self.pool_class = pool_class
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self.pool_class(max_workers=self.max_workers)
+        return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            started, result = await loop.run_in_executor(
+                self.pool, functools.partial(_timed_call, fn, args, kwargs))
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        wait = max(started - submitted, 0.0)
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += time.time() - started
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "running": min(self.in_flight, self.max_workers),
+                "queue_depth": max(self.in_flight - self.max_workers, 0),
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.total_wait / done * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / done * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+thread_executor = BoundedExecutor("thread", ThreadPoolExecutor, settings.EXECUTOR_THREAD_WORKERS)
+process_executor = BoundedExecutor("process", ProcessPoolExecutor, settings.EXECUTOR_PROCESS_WORKERS)
+# Kept apart so login bursts don't queue behind other CPU bound work
+hash_executor = BoundedExecutor("hash", ProcessPoolExecutor, settings.PASSWORD_HASH_WORKERS)
+# Bulk wallet generation, so large batches don't starve the other pools
+wallet_executor = BoundedExecutor("wallet", ProcessPoolExecutor, settings.BULK_WALLET_WORKERS)
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    """Run a blocking, I/O bound call (e.g. a cardano-cli subprocess)."""
+    return await thread_executor.run(fn, *args, **kwargs)
+
+
+async def run_in_process(fn, *args, **kwargs):
+    """Run a CPU bound call. `fn` and its arguments must be picklable."""
+    return await process_executor.run(fn, *args, **kwargs)
+
+
+def executor_stats() -> dict:
+    return {
+        thread_executor.name: thread_executor.stats(),
+        process_executor.name: process_executor.stats(),
+        hash_executor.name: hash_executor.stats(),
+        wallet_executor.name: wallet_executor.stats(),
+    }
+
+
+def shutdown_executors() -> None:
+    thread_executor.shutdown()
+    process_executor.shutdown()
+    hash_executor.shutdown()
+    wallet_executor.shutdown()
@@ -0,0 +1,107 @@
+"""Bulk wallet generation.
+
+Keys are derived by cardanopythonlib (cardano-address and cardano-cli
+subprocesses) in the wallet process pool, a chunk of wallets per call and
+several chunks at a time. Each derived chunk is stored with one INSERT and
+reported as soon as it is committed.
+"""
+import asyncio
+import time
+from typing import AsyncIterator, List
+
+from sqlalchemy import insert
+
+from core.config import settings
+from core.context import context
+from core.executor import wallet_executor
+from core.workspace import node_workspace
+from db.dblib import SessionLocal
+from db.models import dbmodels
+
+WALLET_FIELDS = ("base_addr", "payment_addr", "payment_skey", "payment_vkey", "stake_addr",
+    "stake_skey", "stake_vkey", "hash_verification_key")
+# Secrets only returned when the wallet is created, never stored in wallet
+SECRET_FIELDS = ("mnemonic", "root_key", "private_stake_key", "private_payment_key",
+    "payment_account_key", "stake_account_key")
+
+
+def derive_wallets(names: List[str], size: int) -> List[dict]:
+    """Runs in a wallet pool process, with its own context.keys. Key files
+    only live in a workspace, the skeys are kept in the database"""
+    wallets = []
+    with node_workspace(context.keys) as ws:
+        for name in names:
+            try:
+                keys = ws.node.deriveAllKeys(name, size=size, save_flag=False)
+                wallet = {field: keys.get(field) for field in WALLET_FIELDS + SECRET_FIELDS}
+                wallet["name"] = name
+            except Exception as e:
+                wallet = {"name": name, "error": repr(e)}
+            wallets.append(wallet)
+    return wallets
+
+
+async def store_wallets(wallets: List[dict]) -> List[dict]:
+    """Insert the derived wallets in one statement, returning id and addresses"""
+    wallet = dbmodels.Wallet
+    rows = [{field: item[field] for field in ("name",) + WALLET_FIELDS} for item in wallets]
+    async with SessionLocal() as db:
+        result = await db.execute(insert(wallet).values(rows)
+            .returning(wallet.id, wallet.name, wallet.payment_addr, wallet.base_addr, wallet.stake_addr))
+        created = [dict(row._mapping) for row in result]
+        await db.commit()
+    return created
+
+
+async def generate_wallets(names: List[str], size: int, include_mnemonic: bool = False) -> AsyncIterator[dict]:
+    """Create a wallet per name, yielding each one once stored (in completion
+    order), the failures, and a summary with the throughput last"""
+    chunk_size = settings.BULK_WALLET_CHUNK_SIZE
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    # Enough chunks queued to keep every worker busy, not the whole request
+    semaphore = asyncio.Semaphore(wallet_executor.max_workers * 2)
+
+    async def derive(chunk: List[str]) -> List[dict]:
+        async with semaphore:
+            try:
+                return await wallet_executor.run(derive_wallets, chunk, size)
+            except Exception as e:
+                # The pool itself failed, e.g. a worker died
+                return [{"name": name, "error": repr(e)} for name in chunk]
+
+    started = time.time()
+    created = failed = 0
+    tasks = [asyncio.create_task(derive(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            wallets = await next_done
+            derived = [wallet for wallet in wallets if "error" not in wallet]
+            for wallet in wallets:
+                if "error" in wallet:
+                    failed += 1
+                    yield wallet
+            if not derived:
+                continue
+            try:
+                stored = await store_wallets(derived)
+            except Exception as e:
+                failed += len(derived)
+                yield {"error": repr(e), "names": [wallet["name"] for wallet in derived]}
+                continue
+            created += len(stored)
+            mnemonics = {wallet["payment_addr"]: wallet["mnemonic"] for wallet in derived}
+            for row in stored:
+                if include_mnemonic:
+                    row["mnemonic"] = mnemonics[row["payment_addr"]]
+                yield row
+    finally:
+        # Client gone or done: don't derive chunks nobody will store
+        for task in tasks:
+            task.cancel()
+    seconds = time.time() - started
+    yield {
+        "created": created,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "wallets_per_second": round(created / seconds, 2) if seconds else None,
+    }
@@ -0,0 +1,107 @@
+"""Incremental witness collection of multisig (simple script) transactions.
+
+A draft is registered once with its script, then each signer adds its
+witnesses independently: wallets stored here are signed in process (in the
+process pool, MULTISIG_SIGN_CHUNK keys per call, for large wallet sets) and
+other signers send cardano-cli witness files. Witnesses are kept per
+(tx id, key hash), so concurrent additions never overwrite each other and
+adding the same signer twice does nothing.
+
+After each addition the collected signers are checked against the script.
+The first request that meets it assembles the signed transaction while
+holding a row lock on the transaction, so it is assembled (and submitted)
+once, with only the witnesses the script needs: the fee of the draft was
+estimated for that many.
+"""
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import cbor, native_scripts, signing
+from core.config import settings
+from core.executor import run_in_process
+from db.models import dbmodels
+
+COLLECTING = "collecting"
+READY = "ready"
+SUBMITTED = "submitted"
+FAILED = "failed"
+
+
+def key_hash(vkey: bytes) -> str:
+    return hashlib.blake2b(vkey, digest_size=28).hexdigest()
+
+def check_witnesses(message: bytes, witnesses: List[bytes], signers: set, verify: bool = True) -> Dict[str, bytes]:
+    """{key hash: witness} of encoded vkey witnesses of `message`. Raises
+    ValueError for a key that is not one of `signers` or, with `verify`, a
+    signature that doesn't verify"""
+    checked = {}
+    for witness in witnesses:
+        vkey, signature = cbor.decode(witness)
+        signer = key_hash(vkey)
+        if signer not in signers:
+            raise ValueError(f"Key {signer} is not a signer of the script")
+        if verify and not signing.verify(vkey, message, signature):
+            raise ValueError(f"Invalid signature of key {signer}")
+        checked[signer] = witness
+    return checked
+
+async def make_witnesses(message: bytes, skeys: List[dict]) -> List[bytes]:
+    """vkey witnesses of `message`, chunks of keys signed in parallel"""
+    chunk_size = settings.MULTISIG_SIGN_CHUNK
+    if len(skeys) <= chunk_size:
+        return signing.vkey_witnesses(message, skeys)
+    chunks = [skeys[i:i + chunk_size] for i in range(0, len(skeys), chunk_size)]
+    results = await asyncio.gather(*(run_in_process(signing.vkey_witnesses, message, chunk) for chunk in chunks))
+    return [witness for result in results for witness in result]
+
+async def add_witnesses(db: AsyncSession, tx_id: str, witnesses: Dict[str, bytes]) -> List[str]:
+    """Store the witnesses, returning the key hashes that were new"""
+    if not witnesses:
+        return []
+    table = dbmodels.MultisigWitnesses
+    result = await db.execute(insert(table)
+        .values([{"tx_id": tx_id, "key_hash": signer, "witness": witness} for signer, witness in witnesses.items()])
+        .on_conflict_do_nothing(index_elements=["tx_id", "key_hash"])
+        .returning(table.key_hash))
+    return list(result.scalars())
+
+async def signers(db: AsyncSession, tx_id: str) -> Dict[str, bytes]:
+    table = dbmodels.MultisigWitnesses
+    rows = await db.execute(select(table.key_hash, table.witness).where(table.tx_id == tx_id).order_by(table.key_hash))
+    return dict(rows.all())
+
+def needed(script: dict, collected: List[str]) -> List[str]:
+    """Smallest subset of the collected signers that still meets the script"""
+    keep = list(collected)
+    for signer in collected:
+        rest = [item for item in keep if item != signer]
+        if native_scripts.satisfied(script, set(rest)):
+            keep = rest
+    return keep
+
+async def assemble(db: AsyncSession, tx_id: str, script: dict) -> Optional[dbmodels.MultisigTransactions]:
+    """Lock the transaction and, if it is still collecting and its signers
+    meet the script, add their witnesses to the draft (status ready). Returns
+    the locked transaction, None if it isn't registered. The lock is held
+    until `db` commits"""
+    table = dbmodels.MultisigTransactions
+    # FOR NO KEY UPDATE: the witness inserts of other requests hold KEY SHARE
+    # locks on the row (foreign key), FOR UPDATE would deadlock with them
+    db_multisig = await db.scalar(select(table).where(table.tx_id == tx_id).with_for_update(key_share=True)
+        .execution_options(populate_existing=True))
+    if db_multisig is None or db_multisig.status != COLLECTING:
+        return db_multisig
+    witnesses = await signers(db, tx_id)
+    if not native_scripts.satisfied(script, set(witnesses)):
+        return db_multisig
+    db_multisig.tx_signed = signing.add_witnesses(db_multisig.tx_draft,
+        [witnesses[signer] for signer in needed(script, list(witnesses))])
+    db_multisig.status = READY
+    db_multisig.updated_at = datetime.utcnow()
+    return db_multisig
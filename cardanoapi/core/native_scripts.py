@@ -0,0 +1,108 @@
+"""Policy ids of simple (native) scripts computed in process.
+
+The policy id is blake2b-224 over the native script tag (0x00) followed by
+the CBOR of the script, the same hash `cardano-cli transaction policyid`
+prints. Results are cached by a hash of the script content, so building or
+uploading a script already seen doesn't hash it again.
+"""
+import hashlib
+import json
+
+from core import cbor
+from core.cache import TTLCache
+from core.config import settings
+
+NATIVE_SCRIPT_TAG = b"\x00"
+
+# Ledger constructors of the script JSON types of cardano-cli
+SCRIPT_PUBKEY = 0
+SCRIPT_ALL = 1
+SCRIPT_ANY = 2
+SCRIPT_N_OF_K = 3
+INVALID_BEFORE = 4
+INVALID_HEREAFTER = 5
+
+# Policy ids never change for a given content, entries only leave by LRU
+policy_id_cache = TTLCache(float("inf"), settings.POLICY_ID_CACHE_SIZE)
+
+
+def _slot(script: dict) -> int:
+    slot = script.get("slot")
+    if not isinstance(slot, int) or isinstance(slot, bool) or slot < 0:
+        raise ValueError(f"Script slot must be a non negative integer: {script}")
+    return slot
+
+def _scripts(script: dict) -> list:
+    scripts = script.get("scripts")
+    if not isinstance(scripts, list):
+        raise ValueError(f"Script of type {script.get('type')} needs a list of scripts")
+    return [to_ledger(item) for item in scripts]
+
+def to_ledger(script: dict) -> list:
+    """Ledger form of a cardano-cli simple script JSON. Raises ValueError if it is not one"""
+    if not isinstance(script, dict):
+        raise ValueError(f"Script must be a JSON object: {script}")
+    script_type = script.get("type")
+    if script_type == "sig":
+        try:
+            key_hash = bytes.fromhex(script["keyHash"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Script of type sig needs a hex keyHash: {script}")
+        if len(key_hash) != 28:
+            raise ValueError(f"keyHash must be 28 bytes: {script['keyHash']}")
+        return [SCRIPT_PUBKEY, key_hash]
+    if script_type == "all":
+        return [SCRIPT_ALL, _scripts(script)]
+    if script_type == "any":
+        return [SCRIPT_ANY, _scripts(script)]
+    if script_type == "atLeast":
+        required = script.get("required")
+        if not isinstance(required, int) or isinstance(required, bool) or required < 0:
+            raise ValueError(f"Script of type atLeast needs a non negative required: {script}")
+        return [SCRIPT_N_OF_K, required, _scripts(script)]
+    if script_type == "after":
+        return [INVALID_BEFORE, _slot(script)]
+    if script_type == "before":
+        return [INVALID_HEREAFTER, _slot(script)]
+    raise ValueError(f"Unknown script type: {script_type}")
+
+def content_hash(script: dict) -> str:
+    canonical = json.dumps(script, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=32).hexdigest()
+
+def policy_id(script: dict) -> str:
+    """Policy id (hex) of a simple script JSON. Raises ValueError if the script is invalid"""
+    key = content_hash(script)
+    cached = policy_id_cache.get(key)
+    if cached is not None:
+        policy_id_cache.hits += 1
+        return cached
+    policy_id_cache.misses += 1
+    script_cbor = cbor.encode(to_ledger(script))
+    result = hashlib.blake2b(NATIVE_SCRIPT_TAG + script_cbor, digest_size=28).hexdigest()
+    policy_id_cache.set(key, result)
+    return result
+
+def key_hashes(script: dict) -> set:
+    """keyHash of every sig of a simple script JSON"""
+    if script.get("type") == "sig":
+        return {str(script.get("keyHash", "")).lower()}
+    return set().union(*(key_hashes(item) for item in script.get("scripts", [])))
+
+def satisfied(script: dict, signers: set) -> bool:
+    """True once the key hashes in `signers` meet the script's sig, all, any
+    and atLeast conditions. before/after count as met: they bound the
+    validity interval of the body, which the node checks on submit"""
+    script_type = script.get("type")
+    if script_type == "sig":
+        return str(script.get("keyHash", "")).lower() in signers
+    scripts = script.get("scripts", [])
+    if script_type == "all":
+        return all(satisfied(item, signers) for item in scripts)
+    if script_type == "any":
+        return any(satisfied(item, signers) for item in scripts)
+    if script_type == "atLeast":
+        return sum(satisfied(item, signers) for item in scripts) >= script.get("required", 0)
+    if script_type in ("before", "after"):
+        return True
+    raise ValueError(f"Unknown script type: {script_type}")
@@ -0,0 +1,85 @@
+"""
+bcrypt hashing off the event loop. The sync functions run in the hash process
+pool (core.executor.hash_executor); the async ones are what handlers call.
+"""
+import asyncio
+import collections
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from core.config import settings
+from core.executor import hash_executor
+
+# min_rounds: hashes with a lower cost need an update, so verify_and_update
+# returns a new hash for them on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS, bcrypt__min_rounds=settings.BCRYPT_ROUNDS)
+
+_semaphore = None
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash). new_hash is set when the stored hash uses another
+    cost or scheme and should be replaced"""
+    if not hashed_password:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(password, hashed_password)
+    except ValueError:
+        # Not a hash passlib knows
+        return False, None
+
+
+async def _run(fn, *args):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+    async with _semaphore:
+        return await hash_executor.run(fn, *args)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run(hash_password, password)
+
+
+async def verify_password(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update, password, hashed_password)
+
+
+class LatencyStats:
+    """Count, mean, max and percentiles of the last `window` durations"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = collections.deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def stats(self) -> dict:
+        recent = sorted(self.recent)
+
+        def percentile(q):
+            return round(recent[min(int(q * len(recent)), len(recent) - 1)] * 1000, 3) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / (self.count or 1) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+login_latency = LatencyStats()
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import weakref
+from typing import List
+
+from core.config import settings
+from core.txplanner import utxo_ref
+
+
+class PendingUtxos:
+    """UTxOs spent or created by our own transactions before they reach a block.
+
+    Inputs are reserved while a transaction is being built and stay reserved
+    after submit until the node stops reporting them or the TTL runs out, so
+    concurrent sends from one wallet never pick the same inputs. Outputs of
+    submitted transactions (the change) are offered as inputs right away,
+    which lets a wallet chain several transactions per block. Everything
+    expires after `ttl` seconds: a transaction that was never included
+    releases its inputs and drops its outputs.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._spent = {}    # ref -> (expires_at, address)
+        self._outputs = {}  # ref -> (expires_at, address, utxo)
+        self._mutex = threading.Lock()
+        self._locks = weakref.WeakValueDictionary()
+
+    def lock(self, address: str) -> asyncio.Lock:
+        """Hold it from reading available() to reserve() so two requests
+        don't select the same inputs"""
+        lock = self._locks.get(address)
+        if lock is None:
+            lock = self._locks[address] = asyncio.Lock()
+        return lock
+
+    def _expire(self, now: float) -> None:
+        for ref in [ref for ref, entry in self._spent.items() if entry[0] < now]:
+            del self._spent[ref]
+        for ref in [ref for ref, entry in self._outputs.items() if entry[0] < now]:
+            del self._outputs[ref]
+
+    def available(self, address: str, utxos: List[dict]) -> List[dict]:
+        """UTxOs reported by the node for `address` minus the reserved ones,
+        plus our own unconfirmed outputs to it"""
+        chain_refs = {utxo_ref(utxo) for utxo in utxos}
+        with self._mutex:
+            self._expire(time.monotonic())
+            for ref, entry in list(self._spent.items()):
+                # Not in the ledger anymore: the spending tx made it to a block
+                if entry[1] == address and ref not in chain_refs and ref not in self._outputs:
+                    del self._spent[ref]
+            for ref, entry in list(self._outputs.items()):
+                if entry[1] == address and ref in chain_refs:
+                    del self._outputs[ref]
+            result = [utxo for utxo in utxos if utxo_ref(utxo) not in self._spent]
+            result.extend(entry[2] for ref, entry in self._outputs.items()
+                          if entry[1] == address and ref not in self._spent)
+        return result
+
+    def is_pending(self, utxo: dict) -> bool:
+        """Whether the UTxO is an output of an unconfirmed transaction of ours"""
+        with self._mutex:
+            return utxo_ref(utxo) in self._outputs
+
+    def reserve(self, address: str, utxos: List[dict]) -> List[str]:
+        """Reserve the inputs of a transaction being built. Returns the refs
+        to pass to commit or release"""
+        expires_at = time.monotonic() + self.ttl
+        refs = [utxo_ref(utxo) for utxo in utxos]
+        with self._mutex:
+            for ref in refs:
+                self._spent[ref] = (expires_at, address)
+        return refs
+
+    def release(self, refs: List[str]) -> None:
+        """The transaction failed before reaching the node"""
+        with self._mutex:
+            for ref in refs:
+                self._spent.pop(ref, None)
+
+    def commit(self, refs: List[str], tx_id: str, outputs: List[dict], address: str) -> None:
+        """The transaction was submitted. `outputs` are [{"address", "amounts"}]
+        in the order of the transaction body, with the amounts (tokens too)
+        as node.get_transactions lists them; the ones back to `address`
+        (usually only the change) become available for chaining"""
+        expires_at = time.monotonic() + self.ttl
+        with self._mutex:
+            for ref in refs:
+                if ref in self._spent:
+                    self._spent[ref] = (expires_at, self._spent[ref][1])
+            for index, output in enumerate(outputs):
+                if output["address"] != address:
+                    continue
+                utxo = {
+                    "hash": tx_id,
+                    "id": str(index),
+                    "amounts": [dict(amount) for amount in output["amounts"]],
+                }
+                self._outputs[utxo_ref(utxo)] = (expires_at, address, utxo)
+
+    def stats(self) -> dict:
+        with self._mutex:
+            self._expire(time.monotonic())
+            return {
+                "reserved_inputs": len(self._spent),
+                "pending_outputs": len(self._outputs),
+            }
+
+
+pending_utxos = PendingUtxos(settings.PENDING_UTXO_TTL)
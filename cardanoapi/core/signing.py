@@ -0,0 +1,169 @@
+"""Transaction signing in process, without skey files or cardano-cli.
+
+A vkey witness is an Ed25519 signature of the transaction id (blake2b-256 of
+the body). The curve and scalar arithmetic on secrets is libsodium's
+(through PyNaCl), which is constant time. Wallet keys derived from
+mnemonics are BIP32-Ed25519 extended keys
+(PaymentExtendedSigningKeyShelley_ed25519_bip32): their 64 byte secret is
+already the scalar and the nonce key, so they are signed with the Ed25519
+formulas on libsodium's primitives, the scalar left unclamped
+(crypto_scalarmult_ed25519_base_noclamp). Plain Ed25519 keys are a seed
+signed with crypto_sign.
+
+Witnesses are added to the witness set of the draft; the body and the rest
+of the transaction keep their original bytes, so the id doesn't change.
+Witnesses made elsewhere (cardano-cli transaction witness) are added the
+same way.
+"""
+import hashlib
+from typing import List, Tuple
+
+from nacl import bindings
+from nacl.exceptions import BadSignatureError
+
+from core import cbor
+from core.txview import transaction_items
+
+EXTENDED_KEY_TYPES = ("PaymentExtendedSigningKeyShelley_ed25519_bip32", "StakeExtendedSigningKeyShelley_ed25519_bip32")
+KEY_TYPES = ("PaymentSigningKeyShelley_ed25519", "StakeSigningKeyShelley_ed25519", "GenesisUTxOSigningKey_ed25519")
+
+# Witness set keys
+VKEY_WITNESSES = 0
+NATIVE_SCRIPTS = 1
+PLUTUS_V1_SCRIPTS = 3
+PLUTUS_V2_SCRIPTS = 6
+# Script kinds of the script list of TxBody envelopes (Alonzo onwards)
+SCRIPT_WITNESS_KEYS = {0: NATIVE_SCRIPTS, 1: PLUTUS_V1_SCRIPTS, 2: PLUTUS_V2_SCRIPTS}
+
+
+def _reduce(value: bytes) -> bytes:
+    """`value` (at most 64 bytes, little endian) modulo the group order"""
+    return bindings.crypto_core_ed25519_scalar_reduce(value.ljust(64, b"\0"))
+
+def _sign_extended(secret: bytes, vkey: bytes, message: bytes) -> bytes:
+    """Ed25519 signature with an extended secret (scalar, nonce key)"""
+    scalar = _reduce(secret[:32])
+    r = _reduce(hashlib.sha512(secret[32:64] + message).digest())
+    encoded_r = bindings.crypto_scalarmult_ed25519_base_noclamp(r)
+    h = _reduce(hashlib.sha512(encoded_r + vkey + message).digest())
+    s = bindings.crypto_core_ed25519_scalar_add(r, bindings.crypto_core_ed25519_scalar_mul(h, scalar))
+    return encoded_r + s
+
+def sign(skey: dict, message: bytes) -> Tuple[bytes, bytes]:
+    """(verification key, Ed25519 signature of `message`) with a cardano-cli skey JSON"""
+    try:
+        key_type = skey["type"]
+        raw = cbor.decode(bytes.fromhex(skey["cborHex"]))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Signing key must be a cardano-cli skey JSON")
+    if key_type in EXTENDED_KEY_TYPES and isinstance(raw, bytes) and len(raw) == 128:
+        # Extended secret (scalar, nonce key), verification key, chain code
+        vkey = raw[64:96]
+        return vkey, _sign_extended(raw[:64], vkey, message)
+    if key_type in KEY_TYPES and isinstance(raw, bytes) and len(raw) == 32:
+        vkey, secret = bindings.crypto_sign_seed_keypair(raw)
+        return vkey, bindings.crypto_sign(message, secret)[:bindings.crypto_sign_BYTES]
+    raise ValueError(f"Unsupported signing key type: {key_type}")
+
+def _vkey_witnesses(existing: bytes, witnesses: List[bytes]) -> bytes:
+    """Witness list with `witnesses` appended to the `existing` encoded one,
+    skipping keys that already signed. A set tag (Conway) is kept"""
+    prefix = b""
+    if existing.startswith(b"\xd9\x01\x02"):
+        prefix, existing = existing[:3], existing[3:]
+    items = cbor.array_items(existing)
+    signed = {cbor.decode(item)[0] for item in items}
+    items += [witness for witness in witnesses if cbor.decode(witness)[0] not in signed]
+    return prefix + cbor.head(cbor.ARRAY, len(items)) + b"".join(items)
+
+def _witness_set(entries: List[Tuple[bytes, bytes]], witnesses: List[bytes]) -> bytes:
+    """Encoded witness set from encoded (key, value) entries plus the new vkey witnesses"""
+    vkey_key = cbor.encode(VKEY_WITNESSES)
+    existing = next((value for key, value in entries if key == vkey_key), cbor.encode([]))
+    entries = [(vkey_key, _vkey_witnesses(existing, witnesses))] + [
+        (key, value) for key, value in entries if key != vkey_key]
+    return cbor.head(cbor.MAP, len(entries)) + b"".join(key + value for key, value in entries)
+
+def _script_entries(scripts: bytes, tagged: bool) -> List[Tuple[bytes, bytes]]:
+    """Witness set entries of the script list of a TxBody envelope. From
+    Alonzo each script is [kind, script]; before, a bare native script"""
+    by_key = {}
+    for item in cbor.array_items(scripts):
+        if tagged:
+            parts = cbor.array_items(item)
+            kind = cbor.decode(parts[0])
+            if len(parts) != 2 or kind not in SCRIPT_WITNESS_KEYS:
+                raise ValueError("Unexpected script in the transaction body envelope")
+            by_key.setdefault(SCRIPT_WITNESS_KEYS[kind], []).append(parts[1])
+        else:
+            by_key.setdefault(NATIVE_SCRIPTS, []).append(item)
+    return [(cbor.encode(key), cbor.head(cbor.ARRAY, len(items)) + b"".join(items))
+        for key, items in sorted(by_key.items())]
+
+def verify(vkey: bytes, message: bytes, signature: bytes) -> bool:
+    """True if `signature` is an Ed25519 signature of `message` by `vkey`"""
+    try:
+        bindings.crypto_sign_open(signature + message, vkey)
+    except (BadSignatureError, ValueError, TypeError):
+        return False
+    return True
+
+def vkey_witnesses(message: bytes, skeys: List[dict]) -> List[bytes]:
+    """Encoded [vkey, signature] witnesses of `message` (a transaction id)"""
+    return [cbor.encode(list(sign(skey, message))) for skey in skeys]
+
+def read_witness(envelope: dict) -> bytes:
+    """Encoded [vkey, signature] of a cardano-cli witness envelope (what
+    cardano-cli transaction witness writes). Raises ValueError otherwise"""
+    try:
+        kind, witness = cbor.decode(bytes.fromhex(envelope["cborHex"]))
+        vkey, signature = witness
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Witness must be a cardano-cli witness envelope")
+    # 1 is a Byron bootstrap witness
+    if kind != 0 or not isinstance(vkey, bytes) or not isinstance(signature, bytes):
+        raise ValueError("Only key witnesses are supported")
+    return cbor.encode([vkey, signature])
+
+def _items(envelope: dict) -> Tuple[str, list]:
+    try:
+        return envelope["type"], transaction_items(bytes.fromhex(envelope["cborHex"]))
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError("Transaction must be a cardano-cli envelope")
+
+def transaction_id(envelope: dict) -> bytes:
+    """Transaction id (the message of the witnesses) of a cardano-cli envelope"""
+    _, items = _items(envelope)
+    return hashlib.blake2b(items[0], digest_size=32).digest()
+
+def add_witnesses(envelope: dict, witnesses: List[bytes]) -> dict:
+    """Signed transaction envelope (what cardano-cli transaction sign or
+    assemble writes) from a draft or partially signed envelope and encoded
+    vkey witnesses. Raises ValueError for layouts it can't handle"""
+    key_type, items = _items(envelope)
+    body = items[0]
+    if len(items) > 1 and items[1][0] >> 5 == cbor.MAP:
+        # Transaction: body, witness set, [is valid,] auxiliary data
+        rest = items[2:]
+        entries = cbor.map_items(items[1])
+        signed_type = key_type.replace("Unwitnessed Tx", "Witnessed Tx")
+        description = envelope.get("description", "")
+    elif key_type.startswith("TxBody") and len(items) in (3, 4):
+        # cardano-cli 1.35 TxBody: body, scripts, [script validity,] auxiliary data
+        rest = items[2:]
+        entries = _script_entries(items[1], tagged=len(items) == 4)
+        era = key_type[len("TxBody"):]
+        signed_type = "TxSignedShelley" if era == "Shelley" else f"Tx {era}Era"
+        description = ""
+    else:
+        # Plutus script data and bare bodies are left to cardano-cli
+        raise ValueError(f"Unsupported transaction layout: {key_type}")
+
+    tx = cbor.head(cbor.ARRAY, 2 + len(rest)) + body + _witness_set(entries, witnesses) + b"".join(rest)
+    return {"type": signed_type, "description": description, "cborHex": tx.hex()}
+
+def sign_transaction(envelope: dict, skeys: List[dict]) -> dict:
+    """Signed transaction envelope (what cardano-cli transaction sign writes)
+    from a draft or partially signed envelope. Raises ValueError for keys or
+    layouts it can't handle"""
+    return add_witnesses(envelope, vkey_witnesses(transaction_id(envelope), skeys))
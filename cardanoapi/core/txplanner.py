@@ -0,0 +1,300 @@
+"""
+In-process transaction planning: coin selection, fee and min-UTxO estimation
+from the protocol parameters. It works on UTxO lists in the format returned
+by node.get_transactions and never calls cardano-cli.
+"""
+import bisect
+import itertools
+import json
+import random
+from typing import List, Optional
+
+from core.workspace import input_assets
+
+# Serialized size estimates (bytes) of the transaction parts
+TX_OVERHEAD_SIZE = 16          # tx array, body map, fee and ttl fields
+INPUT_SIZE = 40                # [tx hash (32 bytes), index]
+OUTPUT_OVERHEAD_SIZE = 14      # output map/array, address header, lovelace
+ASSET_SIZE = 12                # per native asset, plus its name length
+POLICY_SIZE = 31               # policy id (28 bytes) plus its header
+VKEY_WITNESS_SIZE = 101        # [vkey (32 bytes), signature (64 bytes)]
+# Constant added to the output size by the babbage min-UTxO rule
+UTXO_ENTRY_OVERHEAD = 160
+BECH32_CHECKSUM_LEN = 6
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def utxo_ref(utxo: dict) -> str:
+    return utxo["hash"] + "#" + str(utxo["id"])
+
+
+def utxo_lovelace(utxo: dict) -> int:
+    for amount in utxo["amounts"]:
+        if amount["token"] == "lovelace":
+            return int(amount["amount"])
+    return 0
+
+
+def utxo_amounts(lovelace: int, assets: Optional[dict] = None) -> List[dict]:
+    """Amounts of an output as node.get_transactions lists them, tokens
+    given as {"policy.asset_name": amount}"""
+    amounts = [{"token": "lovelace", "amount": str(lovelace)}]
+    amounts.extend({"token": token, "amount": str(amount)} for token, amount in (assets or {}).items())
+    return amounts
+
+
+def is_ada_only(utxo: dict) -> bool:
+    return all(amount["token"] == "lovelace" for amount in utxo["amounts"])
+
+
+def change_assets(inputs: List[dict]) -> List[dict]:
+    """Native tokens of the inputs as output assets: build_raw sends them all
+    to the change. cardano-cli prints asset names in hex"""
+    assets = []
+    for token in input_assets(inputs):
+        policy, _, name = token.partition(".")
+        assets.append({"policyID": policy, "asset_name": bytes.fromhex(name)})
+    return assets
+
+
+def address_size(address: str) -> int:
+    """Length in bytes of a bech32 address, without decoding it"""
+    data = address.rsplit("1", 1)[-1]
+    return max(len(data) - BECH32_CHECKSUM_LEN, 0) * 5 // 8
+
+
+def output_size(address: str, assets: Optional[List[dict]] = None) -> int:
+    size = OUTPUT_OVERHEAD_SIZE + address_size(address)
+    if assets:
+        policies = {asset["policyID"] for asset in assets}
+        size += len(policies) * POLICY_SIZE
+        size += sum(ASSET_SIZE + len(asset["asset_name"]) for asset in assets)
+    return size
+
+
+def estimate_tx_size(input_count: int, outputs: List[dict], change_address: str = "",
+        metadata: Optional[dict] = None, witnesses: int = 1, change_assets: Optional[List[dict]] = None) -> int:
+    """Approximate size of the signed transaction"""
+    size = TX_OVERHEAD_SIZE + input_count * INPUT_SIZE
+    size += sum(output_size(output["address"], output.get("assets")) for output in outputs)
+    if change_address:
+        size += output_size(change_address, change_assets)
+    if metadata:
+        size += len(json.dumps(metadata, separators=(",", ":")).encode("utf-8"))
+    size += witnesses * VKEY_WITNESS_SIZE
+    return size
+
+
+def min_fee(tx_size: int, protocol_params: dict) -> int:
+    return int(protocol_params["txFeeFixed"]) + int(protocol_params["txFeePerByte"]) * tx_size
+
+
+def min_utxo(address: str, protocol_params: dict, assets: Optional[List[dict]] = None) -> int:
+    """Minimum lovelace an output must hold"""
+    cost_per_byte = protocol_params.get("utxoCostPerByte")
+    if cost_per_byte is not None:
+        return (UTXO_ENTRY_OVERHEAD + output_size(address, assets)) * int(cost_per_byte)
+    cost_per_word = protocol_params.get("utxoCostPerWord")
+    if cost_per_word is not None:
+        # Same rule as base.Starter.min_utxo_lovelace
+        assets = assets or []
+        byte_len = len(assets) * 12 + sum(len(asset["asset_name"]) for asset in assets) + 28
+        return (27 + 6 + (byte_len + 7) // 8) * int(cost_per_word)
+    return int(protocol_params.get("minUTxOValue") or 0)
+
+
+def largest_first(utxos: List[dict], target: int) -> List[dict]:
+    """Take the biggest UTxOs until the target is covered"""
+    selected = []
+    total = 0
+    for utxo in sorted(utxos, key=utxo_lovelace, reverse=True):
+        if total >= target:
+            break
+        selected.append(utxo)
+        total += utxo_lovelace(utxo)
+    if total < target:
+        raise InsufficientFunds(f"Balance {total} lower than required {target}")
+    return selected
+
+
+def random_improve(utxos: List[dict], target: int, rng: Optional[random.Random] = None) -> List[dict]:
+    """CIP-2 random-improve on the lovelace target: pick random UTxOs until
+    the target is covered, then keep adding random UTxOs while they move the
+    total closer to twice the target without exceeding three times it"""
+    rng = rng or random
+    pool = list(utxos)
+    rng.shuffle(pool)
+    selected = []
+    total = 0
+    while pool and total < target:
+        utxo = pool.pop()
+        selected.append(utxo)
+        total += utxo_lovelace(utxo)
+    if total < target:
+        raise InsufficientFunds(f"Balance {total} lower than required {target}")
+
+    ideal = 2 * target
+    upper = 3 * target
+    for utxo in pool:
+        amount = utxo_lovelace(utxo)
+        if total + amount > upper:
+            continue
+        if abs(ideal - (total + amount)) < abs(ideal - total):
+            selected.append(utxo)
+            total += amount
+    return selected
+
+
+SELECTION_STRATEGIES = {
+    "largest_first": largest_first,
+    "random_improve": random_improve,
+}
+
+
+def _select(select, utxos: List[dict], outputs: List[dict], change_address: str,
+        protocol_params: dict, metadata: Optional[dict], witnesses: int) -> dict:
+    total_out = sum(output["amount"] for output in outputs)
+    min_change = min_utxo(change_address, protocol_params)
+    fee = min_fee(estimate_tx_size(1, outputs, change_address, metadata, witnesses), protocol_params)
+    # Selection depends on the fee and the change, the fee on the number of
+    # inputs and both on the tokens the change carries
+    for _ in range(10):
+        inputs = select(utxos, total_out + fee + min_change)
+        assets = change_assets(inputs)
+        tx_size = estimate_tx_size(len(inputs), outputs, change_address, metadata, witnesses, assets)
+        needed_fee = min_fee(tx_size, protocol_params)
+        needed_change = min_utxo(change_address, protocol_params, assets)
+        if needed_fee <= fee and needed_change <= min_change:
+            break
+        fee = max(fee, needed_fee)
+        min_change = max(min_change, needed_change)
+    max_tx_size = protocol_params.get("maxTxSize")
+    if max_tx_size is not None and tx_size > int(max_tx_size):
+        raise ValueError(f"Transaction size {tx_size} exceeds max tx size of {max_tx_size}")
+    total_in = sum(utxo_lovelace(utxo) for utxo in inputs)
+    if total_in - total_out - fee < min_change:
+        raise InsufficientFunds(f"Balance {total_in} can't cover {total_out} plus fee {fee} and change")
+    return {
+        "inputs": inputs,
+        "fee": fee,
+        "change": total_in - total_out - fee,
+        "change_assets": input_assets(inputs),
+        "total_in": total_in,
+        "total_out": total_out,
+        "tx_size": tx_size,
+    }
+
+
+def plan_transaction(utxos: List[dict], outputs: List[dict], change_address: str,
+        protocol_params: dict, metadata: Optional[dict] = None, witnesses: int = 1,
+        strategy: str = "largest_first") -> dict:
+    """Select the inputs for `outputs` ([{"address", "amount"}]) and estimate
+    fee and change.
+
+    UTxOs holding only ADA are tried first. When they are not enough the
+    UTxOs with native tokens are selected too, their tokens go to the change
+    ("change_assets", {"policy.asset_name": amount}) and count in its
+    min-UTxO and in the size.
+
+    Raises InsufficientFunds when the UTxOs can't cover outputs, fee and a
+    valid change output, and ValueError when an output is below min-UTxO.
+    """
+    select = SELECTION_STRATEGIES[strategy]
+
+    for output in outputs:
+        required = min_utxo(output["address"], protocol_params, output.get("assets"))
+        if output["amount"] < required:
+            raise ValueError(f"Output to {output['address']} of {output['amount']} is below min utxo of {required}")
+
+    ada_only = [utxo for utxo in utxos if is_ada_only(utxo)]
+    if len(ada_only) < len(utxos):
+        try:
+            return _select(select, ada_only, outputs, change_address, protocol_params, metadata, witnesses)
+        except (InsufficientFunds, ValueError):
+            pass
+    return _select(select, utxos, outputs, change_address, protocol_params, metadata, witnesses)
+
+
+def pack_outputs(utxos: List[dict], outputs: List[dict], change_address: str,
+        protocol_params: dict, metadata: Optional[dict] = None, witnesses: int = 1) -> List[dict]:
+    """Split `outputs` into the fewest transactions that fit in maxTxSize,
+    each funded by its own largest-first inputs so they can be submitted
+    independently. UTxOs with native tokens are spent after the ADA only
+    ones, their tokens go to the change. Returns one plan_transaction-like
+    dict per transaction with its "outputs"."""
+    max_tx_size = int(protocol_params.get("maxTxSize") or 16384)
+    min_change = min_utxo(change_address, protocol_params)
+    for output in outputs:
+        required = min_utxo(output["address"], protocol_params, output.get("assets"))
+        if output["amount"] < required:
+            raise ValueError(f"Output to {output['address']} of {output['amount']} is below min utxo of {required}")
+
+    ada_only = [utxo for utxo in utxos if is_ada_only(utxo)]
+    with_tokens = [utxo for utxo in utxos if not is_ada_only(utxo)]
+    pool = sorted(ada_only, key=utxo_lovelace, reverse=True) + sorted(with_tokens, key=utxo_lovelace, reverse=True)
+    first_token = len(ada_only)
+    change_size = output_size(change_address)
+
+    def fit(batch_outputs, batch_size, batch_total):
+        # Largest-first on the sorted pool is a prefix of it
+        fee = min_fee(batch_size + INPUT_SIZE, protocol_params)
+        change_min = min_change
+        for _ in range(10):
+            target = batch_total + fee + change_min
+            index = bisect.bisect_left(prefix, target)
+            if index >= len(prefix):
+                return None
+            # Only the UTxOs after first_token hold tokens
+            assets = change_assets(pool[first_token:index + 1])
+            tx_size = batch_size + (index + 1) * INPUT_SIZE + output_size(change_address, assets) - change_size
+            needed_fee = min_fee(tx_size, protocol_params)
+            needed_change = min_utxo(change_address, protocol_params, assets)
+            if needed_fee <= fee and needed_change <= change_min:
+                break
+            fee = max(fee, needed_fee)
+            change_min = max(change_min, needed_change)
+        else:
+            return None
+        if tx_size > max_tx_size:
+            return None
+        inputs = pool[:index + 1]
+        total_in = prefix[index]
+        return {
+            "inputs": inputs,
+            "outputs": batch_outputs,
+            "fee": fee,
+            "change": total_in - batch_total - fee,
+            "change_assets": input_assets(inputs),
+            "total_in": total_in,
+            "total_out": batch_total,
+            "tx_size": tx_size,
+        }
+
+    plans = []
+    prefix = list(itertools.accumulate(utxo_lovelace(utxo) for utxo in pool))
+    base_size = estimate_tx_size(0, [], change_address, metadata, witnesses)
+    batch, batch_size, batch_total, batch_plan = [], base_size, 0, None
+    for output in outputs:
+        size = output_size(output["address"], output.get("assets"))
+        plan = fit(batch + [output], batch_size + size, batch_total + output["amount"])
+        if plan is None:
+            if batch_plan is None:
+                raise InsufficientFunds(f"Not enough funds or space to pay {output['amount']} to {output['address']}")
+            plans.append(batch_plan)
+            pool = pool[len(batch_plan["inputs"]):]
+            first_token = max(first_token - len(batch_plan["inputs"]), 0)
+            prefix = list(itertools.accumulate(utxo_lovelace(utxo) for utxo in pool))
+            batch, batch_size, batch_total = [], base_size, 0
+            plan = fit([output], base_size + size, output["amount"])
+            if plan is None:
+                raise InsufficientFunds(f"Not enough funds or space to pay {output['amount']} to {output['address']}")
+        batch.append(output)
+        batch_size += size
+        batch_total += output["amount"]
+        batch_plan = plan
+    if batch_plan is not None:
+        plans.append(batch_plan)
+    return plans
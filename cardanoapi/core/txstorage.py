@@ -0,0 +1,58 @@
+"""Storage of signed transactions.
+
+cardano-cli writes transactions as a JSON envelope holding the CBOR as hex.
+Only the raw CBOR is stored (bytea, half the size of the hex and no JSON to
+parse), next to the envelope type and description, and the envelope is
+rebuilt when it is asked for. Rows written before that keep the envelope in
+the tx_cborhex JSON column until migrated.
+"""
+from typing import Optional
+
+from core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed to read or write compressed CBOR
+    zstandard = None
+
+
+# Frame header of zstd. CBOR of a transaction starts with an array header
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(cbor: bytes) -> bytes:
+    if not settings.TX_CBOR_ZSTD:
+        return cbor
+    if zstandard is None:
+        raise RuntimeError("TX_CBOR_ZSTD is set but zstandard is not installed")
+    return zstandard.ZstdCompressor(level=settings.TX_CBOR_ZSTD_LEVEL).compress(cbor)
+
+def decompress(data: bytes) -> bytes:
+    if not data.startswith(ZSTD_MAGIC):
+        return data
+    if zstandard is None:
+        raise RuntimeError("Transaction stored compressed but zstandard is not installed")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+def storage_fields(envelope: Optional[dict]) -> dict:
+    """Transactions columns storing `envelope` in the configured mode"""
+    if envelope is None:
+        return {}
+    if settings.TX_CBOR_STORAGE == "json":
+        return {"tx_cborhex": envelope}
+    return {
+        "tx_cbor": compress(bytes.fromhex(envelope["cborHex"])),
+        "tx_type": envelope.get("type"),
+        "tx_description": envelope.get("description"),
+    }
+
+def envelope(transaction) -> Optional[dict]:
+    """cardano-cli envelope of a stored transaction. tx_cbor and tx_cborhex
+    are deferred, load them with the query (undefer) before calling this"""
+    if transaction.tx_cbor is not None:
+        return {
+            "type": transaction.tx_type,
+            "description": transaction.tx_description,
+            "cborHex": decompress(transaction.tx_cbor).hex(),
+        }
+    return transaction.tx_cborhex
@@ -0,0 +1,108 @@
+"""Transaction id and summary read from the transaction CBOR, without
+calling cardano-cli (transaction txid / view).
+
+The id is blake2b-256 over the transaction body exactly as it was encoded.
+cardano-cli envelopes hold either a whole transaction (an array whose first
+item is the body) or, for old TxBody envelopes, an array starting with the
+body too; a bare body map is accepted as well.
+"""
+import hashlib
+from typing import List, Optional, Tuple
+
+from core import cbor
+from core.addresses import encode_address
+
+# Transaction body keys
+INPUTS = 0
+OUTPUTS = 1
+FEE = 2
+TTL = 3
+METADATA_HASH = 7
+VALIDITY_START = 8
+MINT = 9
+REQUIRED_SIGNERS = 14
+# Witness set keys
+VKEY_WITNESSES = 0
+NATIVE_SCRIPTS = 1
+
+
+def transaction_items(tx: bytes) -> list:
+    """Encoded items of a transaction, the body first"""
+    if tx and tx[0] >> 5 == cbor.MAP:
+        # A body alone, checked to be one well formed map before it is hashed
+        cbor.map_items(tx)
+        items = [tx]
+    else:
+        items = cbor.array_items(tx)
+    if not items or items[0][0] >> 5 != cbor.MAP:
+        raise ValueError("CBOR is not a transaction or transaction body")
+    return items
+
+def body_bytes(tx: bytes) -> bytes:
+    return transaction_items(tx)[0]
+
+def tx_id(cbor_hex: str) -> str:
+    """Id of the transaction in an envelope's cborHex. Raises ValueError if it can't be read"""
+    return hashlib.blake2b(body_bytes(bytes.fromhex(cbor_hex)), digest_size=32).hexdigest()
+
+def _assets(multiasset: Optional[dict]) -> Optional[dict]:
+    if multiasset is None:
+        return None
+    return {policy.hex(): {name.hex(): quantity for name, quantity in assets.items()}
+        for policy, assets in multiasset.items()}
+
+def _output(output) -> dict:
+    # Legacy outputs are arrays and Babbage ones maps, both with the address at 0 and the value at 1
+    address, value = output[0], output[1]
+    if isinstance(value, list):
+        coin, assets = value[0], _assets(value[1])
+    else:
+        coin, assets = value, None
+    summary = {"address": encode_address(address), "lovelace": coin}
+    if assets:
+        summary["assets"] = assets
+    return summary
+
+def analyze(cbor_hex: str) -> dict:
+    """Inputs, outputs, fee, validity interval, mint and witness counts of a
+    transaction, like cardano-cli transaction view. Raises ValueError if it can't be read"""
+    items = transaction_items(bytes.fromhex(cbor_hex))
+    raw_body = items[0]
+    body = cbor.decode(raw_body)
+    try:
+        analysis = {
+            "tx_id": hashlib.blake2b(raw_body, digest_size=32).hexdigest(),
+            "inputs": [f"{tx_hash.hex()}#{index}" for tx_hash, index in body[INPUTS]],
+            "outputs": [_output(output) for output in body[OUTPUTS]],
+            "fee": body[FEE],
+            "validity_interval": {
+                "invalid_before": body.get(VALIDITY_START),
+                "invalid_hereafter": body.get(TTL),
+            },
+            "mint": _assets(body.get(MINT)),
+            "metadata_hash": body[METADATA_HASH].hex() if METADATA_HASH in body else None,
+            "required_signers": [key_hash.hex() for key_hash in body.get(REQUIRED_SIGNERS, [])],
+        }
+        witnesses = cbor.decode(items[1]) if len(items) > 1 else None
+        if isinstance(witnesses, dict):
+            analysis["witnesses"] = {
+                "vkey": len(witnesses.get(VKEY_WITNESSES, [])),
+                "native_scripts": len(witnesses.get(NATIVE_SCRIPTS, [])),
+            }
+    except (KeyError, IndexError, TypeError, AttributeError) as e:
+        raise ValueError(f"Unexpected transaction body: {e}")
+    return analysis
+
+def ttl(cbor_hex: str) -> Optional[int]:
+    """Slot from which the transaction is invalid, None if it has no TTL.
+    Raises ValueError if it can't be read"""
+    return cbor.decode(body_bytes(bytes.fromhex(cbor_hex))).get(TTL)
+
+def inputs_outputs(cbor_hex: str) -> Tuple[List[str], int]:
+    """Inputs ("tx_hash#index") and number of outputs of a transaction.
+    Raises ValueError if it can't be read"""
+    body = cbor.decode(body_bytes(bytes.fromhex(cbor_hex)))
+    try:
+        return [f"{tx_hash.hex()}#{index}" for tx_hash, index in body[INPUTS]], len(body[OUTPUTS])
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Unexpected transaction body: {e}")
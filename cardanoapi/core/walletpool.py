@@ -0,0 +1,181 @@
+"""Warm pool of derived wallets for /keys/generate.
+
+Deriving a wallet (mnemonic plus about ten cardano-address and cardano-cli
+calls) dominates the latency of /keys/generate. With WALLET_POOL_SIZE set,
+wallets are derived ahead of time in the wallet process pool and kept in
+the wallet_pool table; a request claims one with a single DELETE ...
+RETURNING over a FOR UPDATE SKIP LOCKED subquery, so concurrent requests
+(and API workers) never get the same one and never wait on each other.
+
+A background task refills the pool up to WALLET_POOL_SIZE once it drops
+below the low watermark. A postgres advisory lock keeps one refill at a
+time across API workers.
+
+Only what /keys/generate stores for a wallet (addresses, cardano-cli keys)
+is kept in the pool. The mnemonic, root and account keys are dropped as
+soon as the wallet is derived, so pooled wallets are only handed out to
+requests that don't ask for them.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import BigInteger, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.executor import wallet_executor
+from core.keygen import WALLET_FIELDS, derive_wallets
+from db.dblib import get_engine
+from db.models import dbmodels
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key of the refill
+REFILL_LOCK = 0x77706f6f6c
+
+
+def pool_keys(wallet: dict) -> dict:
+    """Part of a derived wallet kept in the pool, secrets left out"""
+    return {field: wallet.get(field) for field in WALLET_FIELDS}
+
+
+class WarmWalletPool:
+    """Claims pooled wallets and runs the refill task"""
+
+    def __init__(self, engine, size: int = settings.WALLET_POOL_SIZE,
+            low_watermark: int = settings.WALLET_POOL_LOW_WATERMARK,
+            mnemonic_size: int = settings.WALLET_POOL_MNEMONIC_SIZE,
+            interval: float = settings.WALLET_POOL_INTERVAL, chunk_size: int = settings.BULK_WALLET_CHUNK_SIZE):
+        # Callable returning the AsyncEngine, refills hold one connection
+        # for their session level advisory lock
+        self.engine = engine
+        self.size = size
+        # Refill as soon as a wallet is claimed unless a lower mark is set
+        self.low_watermark = low_watermark or size
+        self.mnemonic_size = mnemonic_size
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task = None
+        self._wake = None
+        self.hits = 0
+        self.misses = 0
+        self.refilled = 0
+        self.refill_seconds = 0.0
+        self.last_error = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def claim(self, db: AsyncSession, size: int) -> Optional[dict]:
+        """Stored keys (pool_keys) of a pooled wallet, None if the pool is off,
+        empty or has no wallet with `size` words. The claim is part of the
+        caller's transaction: it is only final once `db` commits"""
+        if not self.enabled or size != self.mnemonic_size:
+            return None
+        pool = dbmodels.WalletPool
+        claimable = (select(pool.id).where(pool.size == size).order_by(pool.id).limit(1)
+            .with_for_update(skip_locked=True).scalar_subquery())
+        keys = await db.scalar(delete(pool).where(pool.id == claimable).returning(pool.keys)
+            .execution_options(synchronize_session=False))
+        if keys is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if self._wake is not None:
+            self._wake.set()
+        return keys
+
+    async def available(self) -> int:
+        pool = dbmodels.WalletPool
+        async with self.engine().connect() as connection:
+            return await connection.scalar(select(func.count()).select_from(pool).where(pool.size == self.mnemonic_size))
+
+    async def refill(self) -> Optional[int]:
+        """Derive wallets until the pool is full again if it is below the low
+        watermark. Returns the number added, None if another worker is refilling"""
+        pool = dbmodels.WalletPool
+        added = 0
+        async with self.engine().connect() as connection:
+            lock = literal(REFILL_LOCK, BigInteger)
+            if not await connection.scalar(select(func.pg_try_advisory_lock(lock))):
+                await connection.commit()
+                return None
+            try:
+                count = await connection.scalar(select(func.count()).select_from(pool).where(pool.size == self.mnemonic_size))
+                await connection.commit()
+                if count >= self.low_watermark:
+                    return 0
+                missing = self.size - count
+                while added < missing:
+                    started = time.time()
+                    names = ["pool"] * min(self.chunk_size, missing - added)
+                    wallets = [wallet for wallet in await wallet_executor.run(derive_wallets, names, self.mnemonic_size)
+                        if "error" not in wallet]
+                    if not wallets:
+                        raise RuntimeError("No wallet could be derived for the pool")
+                    await connection.execute(insert(pool).values([{"size": self.mnemonic_size,
+                        "keys": pool_keys(wallet)} for wallet in wallets]))
+                    await connection.commit()
+                    added += len(wallets)
+                    self.refilled += len(wallets)
+                    self.refill_seconds += time.time() - started
+            finally:
+                await connection.rollback()
+                await connection.execute(select(func.pg_advisory_unlock(lock)))
+                await connection.commit()
+        return added
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await self.refill()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # cardano-cli or the database may be briefly unavailable, retry later
+                self.last_error = repr(e)
+                logger.exception("Wallet pool refill failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    async def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "available": await self.available() if self.enabled else 0,
+            "size": self.size,
+            "low_watermark": self.low_watermark,
+            "mnemonic_size": self.mnemonic_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else None,
+            "refilled": self.refilled,
+            "refill_rate": round(self.refilled / self.refill_seconds, 2) if self.refill_seconds else None,
+            "last_error": self.last_error,
+        }
+
+
+wallet_pool = WarmWalletPool(get_engine)
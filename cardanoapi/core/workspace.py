@@ -0,0 +1,174 @@
+import copy
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+
+def input_assets(inputs: list) -> dict:
+    """Native tokens of the inputs, {"policy.asset_name": amount}"""
+    assets = {}
+    for utxo in inputs:
+        for amount in utxo["amounts"]:
+            if amount["token"] != "lovelace":
+                assets[amount["token"]] = assets.get(amount["token"], 0) + int(amount["amount"])
+    return assets
+
+
+class Workspace:
+    """Private scratch directory and node copy for a single request.
+
+    cardanopythonlib reads and writes every intermediate file (tx.draft,
+    tx.signed, protocol.json, skeys, scripts) under the paths stored on the
+    Starter instance. Each workspace gets a shallow copy of the shared node
+    with those paths pointed to its own directory, so concurrent requests
+    never see each other's files.
+    """
+
+    def __init__(self, starter, root: str = "", protocol_params: dict = None):
+        if root == "":
+            root = starter.TRANSACTION_PATH_FILE + "/workspaces"
+        self.id = uuid.uuid4().hex
+        self.path = root + "/" + self.id
+        self.keys_path = self.path + "/keys"
+        self.scripts_path = self.path + "/scripts"
+
+        self.node = copy.copy(starter)
+        self.protocol_params = None
+        self.node.TRANSACTION_PATH_FILE = self.path
+        self.node.KEYS_FILE_PATH = self.keys_path
+        self.node.SCRIPTS_FILE_PATH = self.scripts_path
+        self.node.PLUTUS_FOLDER = self.scripts_path + "/plutus"
+        self.node.MINT_FOLDER = self.scripts_path + "/mint"
+        self.node.MULTISIG_FOLDER = self.scripts_path + "/multisig"
+        if hasattr(self.node, "path"):
+            # base.Keys keeps its own copy of the keys folder
+            self.node.path = self.keys_path
+
+        for folder in (self.path, self.keys_path, self.node.PLUTUS_FOLDER,
+                       self.node.MINT_FOLDER, self.node.MULTISIG_FOLDER):
+            os.makedirs(folder, exist_ok=True)
+        if protocol_params is not None:
+            self.use_protocol_params(protocol_params)
+
+    def use_protocol_params(self, protocol_params: dict) -> None:
+        """Serve node.query_protocol from already known parameters instead of
+        spawning cardano-cli."""
+        self.protocol_params = protocol_params
+        def query_protocol(saving_path=""):
+            path = saving_path if saving_path != "" else self.path
+            with open(path + "/protocol.json", "w") as f:
+                json.dump(protocol_params, f, indent=4, ensure_ascii=False)
+            return protocol_params
+
+        self.node.query_protocol = query_protocol
+
+    def _network_args(self) -> list:
+        if self.node.CARDANO_NETWORK == "testnet":
+            return ["--testnet-magic", str(self.node.CARDANO_NETWORK_MAGIC)]
+        return ["--mainnet"]
+
+    def build_raw(self, inputs: list, outputs: list, change_address: str,
+            metadata: dict = None, witnesses: int = 1, ttl: int = None) -> int:
+        """Write tx.draft paying ADA to `outputs` with exactly `inputs` plus
+        the change as last output, and return the fee. Native tokens of the
+        inputs all go to the change, as `transaction build` does. With `ttl`
+        the transaction is invalid from that slot on.
+
+        Unlike `transaction build` it never asks the node for the inputs, so
+        outputs of our own transactions still in the mempool can be spent.
+        Needs the workspace protocol parameters.
+        """
+        total_in = sum(int(amount["amount"]) for utxo in inputs
+                       for amount in utxo["amounts"] if amount["token"] == "lovelace")
+        change_assets = ""
+        for token, amount in input_assets(inputs).items():
+            # "policy." is a token with an empty asset name
+            change_assets += "+" + str(amount) + " " + token.rstrip(".")
+        total_out = sum(output["amount"] for output in outputs)
+        self.write_json("protocol.json", self.protocol_params)
+        command_string = [self.node.CARDANO_CLI_PATH, "transaction", "build-raw",
+                          "--" + str(self.node.CARDANO_ERA)]
+        for utxo in inputs:
+            command_string.extend(["--tx-in", utxo["hash"] + "#" + str(utxo["id"])])
+        for output in outputs:
+            command_string.extend(["--tx-out", output["address"] + "+" + str(output["amount"])])
+        options = ["--out-file", self.file("tx.draft")]
+        if ttl is not None:
+            options.extend(["--invalid-hereafter", str(ttl)])
+        if metadata:
+            options.extend(["--metadata-json-file", self.write_json("tx_metadata.json", metadata)])
+
+        def build(fee):
+            if os.path.exists(self.file("tx.draft")):
+                os.remove(self.file("tx.draft"))
+            change_out = ["--tx-out", change_address + "+" + str(total_in - total_out - fee) + change_assets]
+            result = self.node.execute_command(command_string + change_out + ["--fee", str(fee)] + options, None)
+            if not os.path.exists(self.file("tx.draft")):
+                raise ValueError(result)
+
+        # Draft with a zero fee to measure it, then the final body
+        build(0)
+        fee_response = self.node.execute_command([
+            self.node.CARDANO_CLI_PATH, "transaction", "calculate-min-fee",
+            "--tx-body-file", self.file("tx.draft"),
+            "--tx-in-count", str(len(inputs)),
+            "--tx-out-count", str(len(outputs) + 1),
+            "--witness-count", str(witnesses),
+            "--protocol-params-file", self.file("protocol.json"),
+        ] + self._network_args(), None)
+        try:
+            fee = int(fee_response.split()[0])
+        except (IndexError, ValueError):
+            raise ValueError(fee_response)
+        build(fee)
+        return fee
+
+    def file(self, name: str) -> str:
+        return self.path + "/" + name
+
+    def write_json(self, name: str, content: dict) -> str:
+        with open(self.file(name), "w") as f:
+            json.dump(content, f, indent=4, ensure_ascii=False)
+        return self.file(name)
+
+    def write_text(self, name: str, content: str) -> str:
+        with open(self.file(name), "w") as f:
+            f.write(content)
+        return self.file(name)
+
+    def read_json(self, name: str) -> dict:
+        with open(self.file(name), "r") as f:
+            return json.load(f)
+
+    def save_skey(self, name: str, payment_skey: dict) -> str:
+        """Store a payment skey where node.sign_transaction expects it and
+        return the name to pass to it."""
+        folder = self.keys_path + "/" + name
+        os.makedirs(folder, exist_ok=True)
+        with open(folder + "/" + name + ".payment.skey", "w") as f:
+            json.dump(payment_skey, f, indent=4, ensure_ascii=False)
+        return name
+
+    def keep(self, name: str, dest_root: str) -> None:
+        """Move the keys folder `name` out of the workspace so it survives
+        cleanup."""
+        source = self.keys_path + "/" + name
+        if os.path.exists(source):
+            os.makedirs(dest_root, exist_ok=True)
+            shutil.rmtree(dest_root + "/" + name, ignore_errors=True)
+            shutil.move(source, dest_root + "/" + name)
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+@contextmanager
+def node_workspace(starter, root: str = "", protocol_params: dict = None):
+    """Yield a Workspace for `starter` and always remove it afterwards."""
+    workspace = Workspace(starter, root, protocol_params)
+    try:
+        yield workspace
+    finally:
+        workspace.cleanup()
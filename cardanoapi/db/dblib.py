@@ -1,9 +1,11 @@
 from configparser import ConfigParser
 from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, undefer
 
 config_path = './config.ini' # Optional argument
 # config_path = './cardanoapi/config.ini' # Optional argument
@@ -24,23 +26,59 @@ def config(config_path: str, section: str) -> dict:
 
     return db
 
-""" Connect to the PostgreSQL database server using SQLAlchemy method """
-# read connection parameters
-params = config(config_path, section='postgresql')
+def pool_options(params: dict) -> dict:
+    """Connection pool settings from the optional pool_size, max_overflow,
+    pool_pre_ping, pool_recycle and pool_timeout keys of the postgresql section"""
+    return {
+        "pool_size": int(params.get("pool_size", 10)),
+        "max_overflow": int(params.get("max_overflow", 20)),
+        "pool_pre_ping": params.get("pool_pre_ping", "true").lower() in ("1", "true", "yes", "on"),
+        "pool_recycle": int(params.get("pool_recycle", 1800)),
+        "pool_timeout": float(params.get("pool_timeout", 30)),
+    }
 
-# connect to the PostgreSQL server
-print('Connecting to the PostgreSQL database...')
-conn_string = f"postgresql://{params['user']}:{params['password']}@{params['host']}:{params['port']}/{params['database']}"
-engine = create_engine(conn_string, connect_args={}, future=True)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+def database_url(params: dict) -> str:
+    return f"postgresql+asyncpg://{params['user']}:{params['password']}@{params['host']}:{params['port']}/{params['database']}"
 
 Base = declarative_base()
-connection = engine.connect()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# The engine is created on first use, so importing the models or the routers
+# doesn't read config.ini or touch the database
+_engine = None
+_sessions = None
+
+def get_engine() -> AsyncEngine:
+    global _engine, _sessions
+    if _engine is None:
+        params = config(config_path, section='postgresql')
+        _engine = create_async_engine(database_url(params), **pool_options(params))
+        _sessions = sessionmaker(_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _engine
+
+def SessionLocal() -> AsyncSession:
+    get_engine()
+    return _sessions()
+
+async def dispose_engine() -> None:
+    global _engine, _sessions
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _sessions = None
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def insert_unique(db: AsyncSession, model, conflict_column: str, commit: bool = True, **values):
+    """INSERT ... ON CONFLICT (conflict_column) DO NOTHING and commit, unless
+    `commit` is False to write more in the same transaction.
+    Returns the new row, or None when one with the same value exists, in a
+    single round trip instead of a select before the insert"""
+    statement = insert(model).values(**values).on_conflict_do_nothing(
+        index_elements=[conflict_column]).returning(*model.__table__.columns)
+    row = await db.scalar(select(model).options(undefer('*')).from_statement(statement)
+        .execution_options(populate_existing=True))
+    if commit:
+        await db.commit()
+    return row
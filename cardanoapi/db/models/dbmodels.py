@@ -1,8 +1,8 @@
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Boolean, Column, Enum
-from sqlalchemy import ForeignKey, Integer, String, Text, DateTime, BigInteger
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, Enum, Index, text
+from sqlalchemy import ForeignKey, Integer, LargeBinary, String, Text, Date, DateTime, BigInteger
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSON
 
 from ..dblib import Base
@@ -13,6 +13,7 @@ from routers.api_v1.endpoints.pydantic_schemas import ScriptPurpose
 
 class Wallet(Timestamp, Base):
     __tablename__ = "wallet"
+    __table_args__ = (Index("ix_wallet_created_at_id", "created_at", "id"),)
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     name = Column(Text, nullable=False)
@@ -30,10 +31,11 @@ class Wallet(Timestamp, Base):
 
 class User(Timestamp, Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    id_wallet = Column(UUID(as_uuid=True), ForeignKey('wallet.id'), nullable=True)
-    username = Column(String(100), nullable=False)
+    id_wallet = Column(UUID(as_uuid=True), ForeignKey('wallet.id'), nullable=True, index=True)
+    username = Column(String(100), nullable=False, unique=True)
     hashed_password = Column(String)
     is_verified = Column(Boolean, default=False)
 
@@ -41,23 +43,92 @@ class User(Timestamp, Base):
 
 class Transactions(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_submission_id", "submission", "id"),
+        # Serves the history of one wallet in (submission, id) order
+        Index("ix_transactions_id_wallet_submission", "id_wallet", "submission", "id"),
+        # Only the transactions the confirmation tracker still looks at
+        Index("ix_transactions_tracked", "id", postgresql_where=text("status IN ('submitted', 'confirmed')")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    tx_id = Column(Text, nullable=False)
+    tx_id = Column(Text, nullable=False, unique=True)
     id_wallet = Column(UUID(as_uuid=True), ForeignKey('wallet.id'), nullable=True)
-    submission = Column(DateTime, default=datetime.utcnow, nullable=True)
+    submission = Column(DateTime, default=datetime.utcnow, nullable=False)
     address_origin = Column(Text, nullable=True)
     address_destin = Column(Text, nullable=True)
-    tx_cborhex = Column(JSON, nullable=True)
+    # Signed transaction, see core.txstorage. The CBOR columns are only
+    # loaded when asked for (undefer), listings don't read them
+    tx_cbor = deferred(Column(LargeBinary, nullable=True))
+    tx_type = Column(Text, nullable=True)
+    tx_description = Column(Text, nullable=True)
+    # cardano-cli JSON envelope, rows stored before tx_cbor or with TX_CBOR_STORAGE=json
+    tx_cborhex = deferred(Column(JSON, nullable=True))
     metadata_info = Column(JSON, nullable=True)
     fees = Column(BigInteger, nullable=True)
     network = Column(Text, nullable=True)
+    # True once the transaction is seen on chain, see core.confirmations
     processed = Column(Boolean, nullable=True)
+    # submitted, confirmed (tracking depth), final, expired, failed or unknown
+    status = Column(Text, nullable=False, default="submitted", server_default="submitted")
+    ttl = Column(BigInteger, nullable=True)
+    confirmed_slot = Column(BigInteger, nullable=True)
+    confirmed_block = Column(BigInteger, nullable=True)
+    depth = Column(Integer, nullable=True)
+    # Shared by the transactions of one batched payout
+    batch_id = Column(UUID(as_uuid=True), nullable=True, index=True)
 
     wallet = relationship("Wallet", back_populates="transactions")
 
-class Scripts(Base):
+class WalletPool(Base):
+    """Wallets derived ahead of time, claimed (and deleted) by /keys/generate.
+    keys holds the fields a wallet row stores, never the mnemonic or private keys"""
+    __tablename__ = "wallet_pool"
+
+    id = Column(Integer, primary_key=True)
+    size = Column(Integer, nullable=False)
+    keys = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class MultisigTransactions(Timestamp, Base):
+    """Transactions of multisig scripts collecting witnesses, see core.multisig"""
+    __tablename__ = "multisig_transactions"
+
+    tx_id = Column(Text, primary_key=True)
+    id_script = Column(UUID(as_uuid=True), ForeignKey('scripts.id'), nullable=False)
+    tx_draft = Column(JSON, nullable=False)
+    auto_submit = Column(Boolean, nullable=False, default=False)
+    # collecting, ready (assembled), submitted or failed
+    status = Column(Text, nullable=False, default="collecting")
+    tx_signed = Column(JSON, nullable=True)
+    submit = Column(Text, nullable=True)
+
+    witnesses = relationship("MultisigWitnesses", back_populates="transaction")
+
+class MultisigWitnesses(Base):
+    """One vkey witness ([vkey, signature] CBOR) per signer of a multisig transaction"""
+    __tablename__ = "multisig_witnesses"
+
+    tx_id = Column(Text, ForeignKey('multisig_transactions.tx_id', ondelete="CASCADE"), primary_key=True)
+    key_hash = Column(Text, primary_key=True)
+    witness = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    transaction = relationship("MultisigTransactions", back_populates="witnesses")
+
+class WalletDailyTotals(Base):
+    """Count and fees of the transactions of a wallet per UTC day, kept up
+    to date as transactions are stored so totals don't scan transactions"""
+    __tablename__ = "wallet_daily_totals"
+
+    id_wallet = Column(UUID(as_uuid=True), ForeignKey('wallet.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    tx_count = Column(Integer, nullable=False, default=0)
+    total_fees = Column(BigInteger, nullable=False, default=0)
+
+class Scripts(Timestamp, Base):
     __tablename__ = "scripts"
+    __table_args__ = (Index("ix_scripts_created_at_id", "created_at", "id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     name = Column(Text, nullable=True)
@@ -68,4 +139,4 @@ class Scripts(Base):
     slot = Column(Integer, nullable=True)
     purpose = Column(Enum(ScriptPurpose), nullable=True)
     content = Column(JSON, nullable=True)
-    policyID = Column(Text, nullable=True)
\ No newline at end of file
+    policyID = Column(Text, nullable=True, unique=True)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from db.dblib import SessionLocal
+
+
+def encode_cursor(values: list) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """Raises ValueError if the cursor wasn't produced for these columns"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    parsed = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            parsed.append(datetime.fromisoformat(value) if python_type is datetime else python_type(value))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+    return parsed
+
+def keyset(statement: Select, columns: list, cursor: Optional[str] = None) -> Select:
+    """Newest first on `columns` (e.g. created_at, id), after `cursor`.
+    The comparison is on the row value, so a composite index on the same
+    columns serves any page in one index range scan, unlike OFFSET"""
+    statement = statement.order_by(*[column.desc() for column in columns])
+    if cursor:
+        statement = statement.where(tuple_(*columns) < tuple_(*decode_cursor(cursor, columns)))
+    return statement
+
+async def fetch_page(db: AsyncSession, statement: Select, columns: list, cursor: Optional[str],
+        limit: int) -> Tuple[List, Optional[str]]:
+    """One page of ORM rows and the cursor of the next one, None on the last page"""
+    rows = (await db.scalars(keyset(statement, columns, cursor).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+async def stream_ndjson(statement: Select, columns: list, serialize: Callable,
+        chunk_size: int = 1000) -> AsyncIterator[str]:
+    """All rows as NDJSON lines read through a server side cursor, `chunk_size`
+    rows at a time. Uses its own session, which lives as long as the stream"""
+    async with SessionLocal() as db:
+        result = await db.stream_scalars(keyset(statement, columns).execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield "".join(serialize(row) + "\n" for row in partition)
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored as naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def between(statement: Select, column, since: Optional[datetime], until: Optional[datetime]) -> Select:
+    since, until = naive_utc(since), naive_utc(until)
+    if since is not None:
+        statement = statement.where(column >= since)
+    if until is not None:
+        statement = statement.where(column < until)
+    return statement
+
+async def paginate(response: Response, db: AsyncSession, statement: Select, columns: list,
+        cursor: Optional[str], limit: int) -> List:
+    """fetch_page for an endpoint: the next cursor goes in the X-Next-Cursor
+    header, absent on the last page, so the body stays a plain list"""
+    try:
+        rows, next_cursor = await fetch_page(db, statement, columns, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+def ndjson_response(statement: Select, columns: list, schema) -> StreamingResponse:
+    """Every row of `statement` serialized with the pydantic `schema`"""
+    return StreamingResponse(stream_ndjson(statement, columns, lambda row: schema.from_orm(row).json()),
+        media_type="application/x-ndjson")
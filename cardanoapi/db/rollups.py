@@ -0,0 +1,45 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import dbmodels
+
+
+async def add_to_wallet_totals(db: AsyncSession, transaction: dbmodels.Transactions) -> None:
+    """Count `transaction` in the daily totals of its wallet. Call it in the
+    transaction that inserts it so both are committed together"""
+    if transaction.id_wallet is None:
+        return
+    totals = dbmodels.WalletDailyTotals
+    statement = insert(totals).values(
+        id_wallet=transaction.id_wallet,
+        day=transaction.submission.date(),
+        tx_count=1,
+        total_fees=transaction.fees or 0,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[totals.id_wallet, totals.day],
+        set_={
+            "tx_count": totals.tx_count + 1,
+            "total_fees": totals.total_fees + statement.excluded.total_fees,
+        })
+    await db.execute(statement)
+
+async def wallet_totals(db: AsyncSession, id_wallet, period: str, since: Optional[date] = None,
+        until: Optional[date] = None) -> List[dict]:
+    """Transactions count and fees of a wallet per day, week, month or year,
+    newest first, summed from the daily totals"""
+    totals = dbmodels.WalletDailyTotals
+    # period comes from a closed set of names; a literal lets GROUP BY match the select
+    bucket = cast(func.date_trunc(literal_column(f"'{period}'"), totals.day), Date).label("period")
+    statement = select(bucket, func.sum(totals.tx_count).label("tx_count"),
+            func.sum(totals.total_fees).label("total_fees")) \
+        .where(totals.id_wallet == id_wallet).group_by(bucket).order_by(bucket.desc())
+    if since is not None:
+        statement = statement.where(totals.day >= since)
+    if until is not None:
+        statement = statement.where(totals.day < until)
+    return [dict(row._mapping) for row in await db.execute(statement)]
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .endpoints import admin_api, blockchain_api, keys_api, transactions_api, scripts_api, security
+from .endpoints import admin_api, blockchain_api, keys_api, transactions_api, scripts_api, security, jobs_api, multisig_api, stream_api, wallets_api
 
 
 api_router = APIRouter()
@@ -8,5 +8,9 @@ api_router.include_router(security.router, prefix="/security", tags=["Security"]
 api_router.include_router(admin_api.router, prefix="/admin", tags=["Admin"])
 api_router.include_router(blockchain_api.router, prefix="/blockchain", tags=["Blockchain"])
 api_router.include_router(keys_api.router, prefix="/keys", tags=["Keys"])
+api_router.include_router(wallets_api.router, prefix="/wallets", tags=["Wallets"])
 api_router.include_router(transactions_api.router, prefix="/transactions", tags=["Transactions"])
-api_router.include_router(scripts_api.router, prefix="/scripts", tags=["Scripts"])
\ No newline at end of file
+api_router.include_router(scripts_api.router, prefix="/scripts", tags=["Scripts"])
+api_router.include_router(multisig_api.router, prefix="/multisig", tags=["Multisig"])
+api_router.include_router(jobs_api.router, prefix="/jobs", tags=["Jobs"])
+api_router.include_router(stream_api.router, prefix="/stream", tags=["Stream"])
@@ -1,32 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.dblib import get_db
+from db.dblib import get_db, insert_unique
+from db.pagination import between, ndjson_response, paginate
 from routers.api_v1.endpoints import pydantic_schemas
 from db.models import dbmodels
+from core.executor import executor_stats
+from core.pending import pending_utxos
+from core.passwords import login_latency
+from core.native_scripts import policy_id_cache
+from core.confirmations import confirmation_tracker
+from core.walletpool import wallet_pool
+from routers.api_v1.endpoints.stream_api import event_hub
+from routers.api_v1.endpoints.security import invalidate_user_tokens
 
 from pydantic import UUID4
 
 router = APIRouter()
 
+# Listings are ordered newest first and paginated by keyset: the response
+# carries the cursor of the next page in the X-Next-Cursor header, absent
+# on the last page. Exports stream every matching row as NDJSON.
+
+def _users_query(id_wallet: Optional[UUID4], since: Optional[datetime], until: Optional[datetime]):
+    statement = between(select(dbmodels.User), dbmodels.User.created_at, since, until)
+    if id_wallet is not None:
+        statement = statement.where(dbmodels.User.id_wallet == id_wallet)
+    return statement
+
+USER_ORDER = [dbmodels.User.created_at, dbmodels.User.id]
+
 @router.get("/users",
         summary="Get all the users stored in local database",
         response_description="List of users",
         response_model=List[pydantic_schemas.User])
-def get_users(skip: int= 0, limit: int = 100, db: Session = Depends(get_db)):
-    db_user = db.query(dbmodels.User).offset(skip).limit(limit).all()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+async def get_users(response: Response, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+        id_wallet: Optional[UUID4] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+        db: AsyncSession = Depends(get_db)):
+    """Users newest first. Pass the X-Next-Cursor header of a response as **cursor** to get the next page"""
+    return await paginate(response, db, _users_query(id_wallet, since, until), USER_ORDER, cursor, limit)
+
+@router.get("/users/export",
+        summary="Export users as NDJSON",
+        response_description="One user per line")
+async def export_users(id_wallet: Optional[UUID4] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    return ndjson_response(_users_query(id_wallet, since, until), USER_ORDER, pydantic_schemas.User)
 
 @router.get("/users/{user_id}",
         summary="Get user by id",
         response_description="User by id",
         response_model=pydantic_schemas.User)
-def get_user_by_id(user_id: UUID4, db: Session = Depends(get_db)):
-    db_user = db.query(dbmodels.User).filter(dbmodels.User.id == user_id).first()
+async def get_user_by_id(user_id: UUID4, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(dbmodels.User).where(dbmodels.User.id == user_id))
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
@@ -35,8 +64,8 @@ def get_user_by_id(user_id: UUID4, db: Session = Depends(get_db)):
         summary="Get user by wallet id",
         response_description="User by wallet id",
         response_model=pydantic_schemas.User)
-def get_user_by_wallet_id(id_wallet: UUID4, db: Session = Depends(get_db)):
-    db_user = db.query(dbmodels.User).filter(dbmodels.User.id_wallet == id_wallet).first()
+async def get_user_by_wallet_id(id_wallet: UUID4, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(dbmodels.User).where(dbmodels.User.id_wallet == id_wallet))
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
@@ -45,10 +74,142 @@ def get_user_by_wallet_id(id_wallet: UUID4, db: Session = Depends(get_db)):
                 summary="Create User",
                 response_description="User created",
                 response_model=pydantic_schemas.User)
-def create_user(user: pydantic_schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: pydantic_schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     fake_hashed_password = user.password + "notreallyhashed"
-    db_user = dbmodels.User(username=user.username, hashed_password=fake_hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    db_user = await insert_unique(db, dbmodels.User, "username", username=user.username, hashed_password=fake_hashed_password)
+    if db_user is None:
+        raise HTTPException(status_code=400, detail="User already exists")
+    invalidate_user_tokens(db_user.username)
+    return db_user
+
+def _wallets_query(since: Optional[datetime], until: Optional[datetime]):
+    return between(select(dbmodels.Wallet), dbmodels.Wallet.created_at, since, until)
+
+WALLET_ORDER = [dbmodels.Wallet.created_at, dbmodels.Wallet.id]
+
+@router.get("/wallets",
+        summary="Get the wallets stored in local database",
+        response_description="List of wallets without their signing keys",
+        response_model=List[pydantic_schemas.WalletInfo])
+async def get_wallets(response: Response, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+        since: Optional[datetime] = None, until: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    return await paginate(response, db, _wallets_query(since, until), WALLET_ORDER, cursor, limit)
+
+@router.get("/wallets/export",
+        summary="Export wallets as NDJSON",
+        response_description="One wallet per line, without signing keys")
+async def export_wallets(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    return ndjson_response(_wallets_query(since, until), WALLET_ORDER, pydantic_schemas.WalletInfo)
+
+def _transactions_query(id_wallet: Optional[UUID4], network: Optional[str], processed: Optional[bool],
+        since: Optional[datetime], until: Optional[datetime]):
+    statement = between(select(dbmodels.Transactions), dbmodels.Transactions.submission, since, until)
+    if id_wallet is not None:
+        statement = statement.where(dbmodels.Transactions.id_wallet == id_wallet)
+    if network is not None:
+        statement = statement.where(dbmodels.Transactions.network == network)
+    if processed is not None:
+        statement = statement.where(dbmodels.Transactions.processed == processed)
+    return statement
+
+TRANSACTION_ORDER = [dbmodels.Transactions.submission, dbmodels.Transactions.id]
+
+@router.get("/transactions",
+        summary="Get the transactions stored in local database",
+        response_description="List of transactions",
+        response_model=List[pydantic_schemas.TransactionInfo])
+async def get_transactions(response: Response, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+        id_wallet: Optional[UUID4] = None, network: Optional[str] = None, processed: Optional[bool] = None,
+        since: Optional[datetime] = None, until: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    """Transactions by submission time, newest first. **since** and **until** bound the submission time"""
+    statement = _transactions_query(id_wallet, network, processed, since, until)
+    return await paginate(response, db, statement, TRANSACTION_ORDER, cursor, limit)
+
+@router.get("/transactions/export",
+        summary="Export transactions as NDJSON",
+        response_description="One transaction per line")
+async def export_transactions(id_wallet: Optional[UUID4] = None, network: Optional[str] = None,
+        processed: Optional[bool] = None, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    statement = _transactions_query(id_wallet, network, processed, since, until)
+    return ndjson_response(statement, TRANSACTION_ORDER, pydantic_schemas.TransactionInfo)
+
+def _scripts_query(purpose: Optional[pydantic_schemas.ScriptPurpose], since: Optional[datetime], until: Optional[datetime]):
+    statement = between(select(dbmodels.Scripts), dbmodels.Scripts.created_at, since, until)
+    if purpose is not None:
+        statement = statement.where(dbmodels.Scripts.purpose == purpose)
+    return statement
+
+SCRIPT_ORDER = [dbmodels.Scripts.created_at, dbmodels.Scripts.id]
+
+@router.get("/scripts",
+        summary="Get the scripts stored in local database",
+        response_description="List of scripts",
+        response_model=List[pydantic_schemas.ScriptInfo])
+async def get_scripts(response: Response, cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=1000),
+        purpose: Optional[pydantic_schemas.ScriptPurpose] = None, since: Optional[datetime] = None,
+        until: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    return await paginate(response, db, _scripts_query(purpose, since, until), SCRIPT_ORDER, cursor, limit)
+
+@router.get("/scripts/export",
+        summary="Export scripts as NDJSON",
+        response_description="One script per line")
+async def export_scripts(purpose: Optional[pydantic_schemas.ScriptPurpose] = None,
+        since: Optional[datetime] = None, until: Optional[datetime] = None):
+    return ndjson_response(_scripts_query(purpose, since, until), SCRIPT_ORDER, pydantic_schemas.ScriptInfo)
+
+@router.get("/executor",
+        summary="Worker pool usage",
+        response_description="Queue depth and wait times of the executor pools")
+async def get_executor_stats():
+    """Stats of the thread and process pools used to run cardano-cli and other blocking calls"""
+    return executor_stats()
+
+@router.get("/pending",
+        summary="Pending utxos of our own transactions",
+        response_description="Reserved inputs and unconfirmed outputs")
+async def get_pending_stats():
+    """Inputs reserved by in-flight or unconfirmed transactions and change outputs available for chaining"""
+    return pending_utxos.stats()
+
+@router.get("/auth",
+        summary="Login latency",
+        response_description="Latency of the token endpoint")
+async def get_auth_stats():
+    """Latency of password logins (including the bcrypt check) and usage of the hashing pool"""
+    return {
+        "login": login_latency.stats(),
+        "hash_pool": executor_stats()["hash"],
+    }
+
+@router.get("/scripts/cache",
+        summary="Policy id cache",
+        response_description="Size, hits and misses of the policy id cache")
+async def get_policy_id_cache_stats():
+    """Policy ids computed in process, cached by script content"""
+    return policy_id_cache.stats()
+
+@router.get("/confirmations",
+        summary="Confirmation tracker",
+        response_description="Tracker state and transactions by status")
+async def get_confirmation_stats(db: AsyncSession = Depends(get_db)):
+    """State of the background tracker that follows submitted transactions until they are final or expire"""
+    transactions = dbmodels.Transactions
+    counts = await db.execute(select(transactions.status, func.count()).group_by(transactions.status))
+    return {
+        "tracker": confirmation_tracker.stats(),
+        "transactions": dict(counts.all()),
+    }
+
+@router.get("/streams",
+        summary="Event stream usage",
+        response_description="Subscribers and followed keys of the shared poller")
+async def get_stream_stats():
+    """Subscribers, transactions and addresses followed by the /stream poller of this worker"""
+    return event_hub.stats()
+
+@router.get("/wallet-pool",
+        summary="Warm wallet pool",
+        response_description="Size, hit/miss counters and refill rate of the wallet pool")
+async def get_wallet_pool_stats():
+    """Wallets ready to be claimed by /keys/generate, claims served from the pool (hits) or derived on the spot (misses) by this worker and wallets derived per second by its refills"""
+    return await wallet_pool.stats()
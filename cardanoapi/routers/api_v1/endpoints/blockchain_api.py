@@ -1,14 +1,141 @@
-from fastapi import APIRouter
+import asyncio
+import json
+import uuid
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Optional
 
-from cardanopythonlib import base
-from routers.api_v1.endpoints.pydantic_schemas import NodeCommandName
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from routers.api_v1.endpoints.pydantic_schemas import NodeCommandName, AddressQuery
+from db.dblib import get_db
+from db.models import dbmodels
+from core.context import context
+from core.executor import run_in_thread
+from core.cache import TTLCache
+from core.config import settings
+from core import txview
 
 router = APIRouter()
 
-config_path = './config.ini' # Optional argument
-# config_path = './cardanoapi/config.ini' # Optional argument
-starter = base.Starter(config_path)
-node = base.Node(config_path) # Or with the default ini: node = base.Node()
+
+tip_cache = TTLCache(settings.TIP_CACHE_TTL)
+# Keyed by epoch, parameters can only change at an epoch boundary
+protocol_cache = TTLCache(settings.PROTOCOL_PARAMS_CACHE_TTL, maxsize=2)
+# UTxOs per address, invalidated by our own transactions
+utxo_cache = TTLCache(settings.UTXO_CACHE_TTL, maxsize=settings.UTXO_CACHE_SIZE)
+
+
+async def get_tip() -> dict:
+    """Chain tip, at most TIP_CACHE_TTL seconds old"""
+    tip, _ = await tip_cache.get_or_load("tip", lambda: run_in_thread(context.node.query_tip_exec))
+    return tip
+
+async def get_protocol_params() -> dict:
+    """Protocol parameters of the current epoch. Also used by the transaction builders"""
+    tip = await get_tip()
+    epoch = tip.get("epoch")
+    protocol_params, _ = await protocol_cache.get_or_load(epoch, lambda: run_in_thread(context.node.query_protocol))
+    return protocol_params
+
+async def get_utxos(address: str):
+    """UTxO list of the address in node.get_transactions format and whether
+    it was served from cache. The list is shared, copy it before mutating"""
+    return await utxo_cache.get_or_load(address, lambda: run_in_thread(context.node.get_transactions, address))
+
+def invalidate_addresses(addresses: Iterable[str]) -> None:
+    for address in addresses:
+        utxo_cache.invalidate(address)
+
+def invalidate_transaction(envelope: Optional[dict]) -> None:
+    """Drop the cached UTxOs of the addresses a submitted transaction pays
+    to and of the ones holding its inputs. Everything is dropped if the
+    transaction can't be read"""
+    try:
+        analysis = txview.analyze(envelope["cborHex"])
+    except (KeyError, TypeError, ValueError):
+        utxo_cache.clear()
+        return
+    invalidate_addresses(output["address"] for output in analysis["outputs"])
+    spent = set(analysis["inputs"])
+    utxo_cache.invalidate_where(lambda utxos: any(utxo["hash"] + "#" + str(utxo["id"]) in spent for utxo in utxos))
+
+def query_utxos_batch(addresses: list) -> dict:
+    """Single cardano-cli query for the UTxOs of several addresses.
+    Returns {address: utxos} in node.get_transactions format"""
+    command_string = [context.node.CARDANO_CLI_PATH, "query", "utxo"]
+    for address in addresses:
+        command_string.extend(["--address", address])
+    if context.node.CARDANO_NETWORK == "testnet":
+        command_string.extend(["--testnet-magic", str(context.node.CARDANO_NETWORK_MAGIC)])
+    else:
+        command_string.append("--mainnet")
+    command_string.extend(["--out-file", "/dev/stdout"])
+    rawResult = json.loads(context.node.execute_command(command_string, None))
+
+    utxos_by_address = {address: [] for address in addresses}
+    for tx_in, utxo in rawResult.items():
+        tx_hash, tx_index = tx_in.split("#")
+        amounts = []
+        for policyid, value in utxo["value"].items():
+            if policyid == "lovelace":
+                amounts.insert(0, {"token": "lovelace", "amount": str(value)})
+            else:
+                for asset_name, amount in value.items():
+                    amounts.append({"token": policyid + "." + asset_name, "amount": str(amount)})
+        utxos_by_address.setdefault(utxo["address"], []).append({
+            "hash": tx_hash,
+            "id": tx_index,
+            "amounts": amounts,
+        })
+    return utxos_by_address
+
+async def get_utxos_bulk(addresses: list) -> dict:
+    """{address: (utxos, cached)} using the cache first, one node query for
+    the missing addresses and parallel single queries if that fails"""
+    result = {}
+    missing = []
+    for address in addresses:
+        utxos = utxo_cache.get(address)
+        if utxos is None:
+            missing.append(address)
+        else:
+            result[address] = (utxos, True)
+    if missing:
+        try:
+            fetched = await run_in_thread(query_utxos_batch, missing)
+        except (ValueError, KeyError):
+            # Wallet names or a cardano-cli without json output
+            fetched = None
+        if fetched is not None:
+            for address in missing:
+                utxo_cache.set(address, fetched[address])
+                result[address] = (fetched[address], False)
+        else:
+            responses = await asyncio.gather(*[get_utxos(address) for address in missing])
+            result.update(zip(missing, responses))
+    return result
+
+def utxos_balance(utxos: list) -> dict:
+    """Same output as node.get_balance computed from an UTxO list"""
+    balance_dict = {}
+    amounts = sorted((amount for utxo in utxos for amount in utxo["amounts"]), key=itemgetter("token"))
+    for token, values in groupby(amounts, key=itemgetter("token")):
+        balance = sum(int(value["amount"]) for value in values)
+        if token != "lovelace":
+            policyid, _, asset_name = token.partition(".")
+            asset_name = bytes.fromhex(asset_name).decode("utf-8", errors="replace")
+            balance_dict[asset_name] = {
+                "policyID": policyid,
+                "balance": balance,
+            }
+        else:
+            balance_dict[token] = balance
+    return balance_dict
+
 
 @router.get("/status", 
                 summary="This is the query tip to the blockchain",
@@ -16,7 +143,7 @@ node = base.Node(config_path) # Or with the default ini: node = base.Node()
                 )
 async def check_status():
     """It returns basic info about the status of the blockchain"""
-    return node.query_tip_exec()
+    return await get_tip()
 
 @router.get("/protocolParams",
                 summary="Protocol parameters",
@@ -24,21 +151,75 @@ async def check_status():
                 )
 async def query_protocolParams():
     """It returns the protocol parameters of the blockchain"""
-    return node.query_protocol()
+    return await get_protocol_params()
 
 @router.get("/address/{command_name}/{address}", 
                 summary="Query address",
                 response_description="Wallet balance/Utxos list"
                 )
-async def cardano_address(address: str, command_name: NodeCommandName):
+async def cardano_address(address: str, command_name: NodeCommandName, response: Response):
     """Get balance or utxo list of specified address or wallet stored \n
     **address**: Address in bech32 format or wallet id stored in local DB. \n
-    **command_name**: It can be balance to get overall balance consolidated or utxos to get the list of utxos associated.
+    **command_name**: It can be balance to get overall balance consolidated or utxos to get the list of utxos associated.\n
+    The X-Cache response header is HIT when the utxos were served from cache and MISS when queried from the node.
     """
-    response = None
+    utxos, cached = await get_utxos(address)
+    response.headers["X-Cache"] = "HIT" if cached else "MISS"
+    result = None
     if command_name is NodeCommandName.utxos:
-        response = node.get_transactions(address)
+        result = utxos
     elif command_name is NodeCommandName.balance:
-        response = node.get_balance(address)
+        result = utxos_balance(utxos)
+
+    return(result)
+
+@router.post("/addresses/{command_name}",
+                summary="Query many addresses at once",
+                response_description="Wallet balance/Utxos list per address"
+                )
+async def cardano_addresses(query: AddressQuery, command_name: NodeCommandName,
+        stream: bool = False, db: AsyncSession = Depends(get_db)):
+    """Get balance or utxo list of several addresses and/or wallets stored in local DB.
+    Addresses are resolved in batches with a single node query per batch.\n
+    **addresses**: List of addresses in bech32 format.\n
+    **wallet_ids**: List of wallet ids stored in local DB.\n
+    **command_name**: balance or utxos.\n
+    **stream**: If true results are streamed as NDJSON, one line per address. Large inputs are always streamed.
+    """
+    items = [{"address": address} for address in query.addresses]
+    if query.wallet_ids:
+        # Any spelling of a UUID (e.g. uppercase) finds the wallet, ids that aren't one find none
+        wallet_uuids = {}
+        for wallet_id in query.wallet_ids:
+            try:
+                wallet_uuids[wallet_id] = uuid.UUID(wallet_id)
+            except ValueError:
+                wallet_uuids[wallet_id] = None
+        db_wallets = (await db.execute(select(dbmodels.Wallet.id, dbmodels.Wallet.payment_addr)
+            .where(dbmodels.Wallet.id.in_([id for id in wallet_uuids.values() if id is not None])))).all()
+        wallet_addresses = dict(db_wallets)
+        for wallet_id in query.wallet_ids:
+            items.append({"wallet_id": wallet_id, "address": wallet_addresses.get(wallet_uuids[wallet_id])})
+
+    async def resolve():
+        batch_size = settings.BULK_QUERY_BATCH_SIZE
+        for i in range(0, len(items), batch_size):
+            batch = items[i:i + batch_size]
+            addresses = list({item["address"] for item in batch if item["address"] is not None})
+            responses = await get_utxos_bulk(addresses)
+            for item in batch:
+                if item["address"] is None:
+                    yield dict(item, error="Wallet not found")
+                    continue
+                utxos, cached = responses[item["address"]]
+                if command_name is NodeCommandName.utxos:
+                    yield dict(item, utxos=utxos, cached=cached)
+                else:
+                    yield dict(item, balance=utxos_balance(utxos), cached=cached)
 
-    return(response)
\ No newline at end of file
+    if stream or len(items) > settings.BULK_STREAM_THRESHOLD:
+        async def ndjson():
+            async for result in resolve():
+                yield json.dumps(result) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    return [result async for result in resolve()]
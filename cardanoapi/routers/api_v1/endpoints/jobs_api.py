@@ -0,0 +1,39 @@
+from celery.result import AsyncResult
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from core.celery_app import celery, JobError
+
+router = APIRouter()
+
+
+def enqueue_job(task, *args) -> JSONResponse:
+    """Send the task to the queue and answer straight away with its job id"""
+    job = task.delay(*args)
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status})
+
+
+@router.get("/{job_id}",
+                summary="Status of an asynchronous job",
+                response_description="Job status and result"
+                )
+async def get_job(job_id: str) -> dict:
+    """Status of a job created with async_mode=true.\n
+    **status**: PENDING, STARTED, SUCCESS or FAILURE.\n
+    **result**: endpoint response once the job succeeded, error detail if it failed.
+    """
+    job = AsyncResult(job_id, app=celery)
+    job_info = {
+        "job_id": job_id,
+        "status": job.status,
+        "result": None
+    }
+    if job.successful():
+        job_info["result"] = job.result
+    elif job.failed():
+        error = job.result
+        if isinstance(error, JobError):
+            job_info["result"] = {"status_code": error.status_code, "detail": error.detail}
+        else:
+            job_info["result"] = {"detail": str(error)}
+    return job_info
@@ -1,35 +1,54 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import json
 
-from cardanopythonlib import base
-from routers.api_v1.endpoints.pydantic_schemas import KeyCreate, KeyRecover
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from routers.api_v1.endpoints.pydantic_schemas import KeyBulkCreate, KeyCreate, KeyRecover
 from db.dblib import get_db
 from db.models import dbmodels
+from core.config import settings
+from core.context import context
+from core.keygen import generate_wallets
+from core.walletpool import wallet_pool
+from core.executor import run_in_thread
+from core.workspace import node_workspace
+from core.celery_app import celery, run_job
+from routers.api_v1.endpoints.jobs_api import enqueue_job
 import uuid
 
 router = APIRouter()
 
-config_path = './config.ini' # Optional argument
-# config_path = './cardanoapi/config.ini' # Optional argument
-starter = base.Starter(config_path)
-keys = base.Keys(config_path) # Or with the default ini: node = base.Node()
 
 @router.post("/generate", status_code=201, 
                 summary="Create wallet using mnemonics as root key",
                 response_description="Keys generated"
                 )
-async def create_keys(key: KeyCreate, db: Session = Depends(get_db)) -> dict:
+async def create_keys(key: KeyCreate, async_mode: bool = False, db: AsyncSession = Depends(get_db)) -> dict:
     """Generate full wallet with mnemonics, cardano keys and base address
         This method does not store any wallet info if the save_flag is False
         If the save_flag is True, cardano cli skeys are stored in local db.\n
         **name**: wallet name if to be stored in local db.\n
         **size**: mnemonic size (12, 15, 24).\n
-        **save_flag**: If to be stored in local db. It only stores cardano cli skeys to sign transactions
+        **save_flag**: If to be stored in local db. It only stores cardano cli skeys to sign transactions\n
+        **include_mnemonic**: If false the mnemonic, root and private keys are not returned.\n
+        **async_mode**: If true, keys are generated as a background job and the job id is returned. See jobs section.\n
+        With the wallet pool enabled (WALLET_POOL_SIZE) and include_mnemonic false, the keys of a wallet derived beforehand are used when available.
+        The pool never keeps mnemonics, so requests that want one always derive a new wallet.
     """
+    if async_mode:
+        return enqueue_job(create_keys_job, key.dict())
+
     if key.name is None:
         key.name = "WalletDummyName" + str(uuid.uuid4)
 
-    key_created = keys.deriveAllKeys(key.name, size = key.size, save_flag = key.save_flag)
+    # A pooled wallet keeps its keys in the database only, no key files
+    key_created = None if key.include_mnemonic else await wallet_pool.claim(db, key.size)
+    if key_created is None:
+        with node_workspace(context.keys) as ws:
+            key_created = await run_in_thread(ws.node.deriveAllKeys, key.name, size = key.size, save_flag = key.save_flag)
+            if key.save_flag:
+                ws.keep(key.name, context.keys.path)
     db_key = dbmodels.Wallet(
         name = key.name,
         base_addr = key_created.get("base_addr"),
@@ -43,11 +62,15 @@ async def create_keys(key: KeyCreate, db: Session = Depends(get_db)) -> dict:
     )
     if key.save_flag:
         db.add(db_key)
-        db.commit()
-        db.refresh(db_key)
+    # Also makes the pool claim final
+    await db.commit()
+    if key.save_flag:
+        await db.refresh(db_key)
     
     key_response = {}
     key_response.update(db_key.__dict__)
+    if not key.include_mnemonic:
+        return key_response
     key_response["mnemonic"] = key_created.get("mnemonic")
     key_response["root_key"] = key_created.get("root_key")
     key_response["private_stake_key"] = key_created.get("private_stake_key")
@@ -56,6 +79,28 @@ async def create_keys(key: KeyCreate, db: Session = Depends(get_db)) -> dict:
     key_response["stake_account_key"] = key_created.get("stake_account_key")
     return key_response
 
+@router.post("/generate/bulk", status_code=201,
+                summary="Create many stored wallets at once",
+                response_description="NDJSON stream of the wallets created"
+                )
+async def create_keys_bulk(keys: KeyBulkCreate):
+    """Generate and store wallets in bulk, keys are derived in parallel in the wallet process pool.\n
+        **count**: number of wallets, named WalletDummyName + a uuid.\n
+        **names**: wallet names, one wallet per name (instead of count).\n
+        **size**: mnemonic size (12, 15, 24).\n
+        **include_mnemonic**: If true the mnemonic of each wallet is streamed too. Mnemonics are never stored.\n
+        The response is NDJSON: one line per wallet created (id, name, addresses) as soon as it is stored,
+        one line with an error per wallet that failed, and a last line with the totals and wallets per second.
+    """
+    names = keys.names if keys.names is not None else ["WalletDummyName" + str(uuid.uuid4()) for _ in range(max(keys.count, 0))]
+    if not 0 < len(names) <= settings.BULK_WALLET_MAX:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {settings.BULK_WALLET_MAX} wallets per request")
+
+    async def ndjson():
+        async for line in generate_wallets(names, keys.size, keys.include_mnemonic):
+            yield json.dumps(line, default=str) + "\n"
+    return StreamingResponse(ndjson(), status_code=201, media_type="application/x-ndjson")
+
 @router.post("/mnemonics", status_code=201, 
                 summary="Generate mnemonics only",
                 response_description="mnemonics generated"
@@ -65,13 +110,13 @@ async def generate_mnemonics(size: int = 24) -> list:
             any info in local db.\n
         **size**: mnemonic size (12, 15, 24).
     """
-    return keys.generate_mnemonic(size)
+    return await run_in_thread(context.keys.generate_mnemonic, size)
 
 @router.post("/recover", status_code=201, 
                 summary="Recover wallet by using mnemonics",
                 response_description="Recover keys info"
                 )
-async def recover_keys(key: KeyRecover, db: Session = Depends(get_db)) -> dict:
+async def recover_keys(key: KeyRecover, db: AsyncSession = Depends(get_db)) -> dict:
     """Generate full wallet cardano keys and base address from mnemonics\n
     **name**: wallet name if to be stored in local db.\n
     **words**: The mnemonic list\n
@@ -79,7 +124,10 @@ async def recover_keys(key: KeyRecover, db: Session = Depends(get_db)) -> dict:
     """
     if key.name is None:
         key.name = "WalletDummyName"
-    key_created = keys.deriveAllKeys(key.name, words = key.words, save_flag = key.save_flag)
+    with node_workspace(context.keys) as ws:
+        key_created = await run_in_thread(ws.node.deriveAllKeys, key.name, words = key.words, save_flag = key.save_flag)
+        if key.save_flag:
+            ws.keep(key.name, context.keys.path)
     db_key = dbmodels.Wallet(
         name=key.name,
         base_addr=key_created.get("base_addr"),
@@ -93,6 +141,11 @@ async def recover_keys(key: KeyRecover, db: Session = Depends(get_db)) -> dict:
     )
     if key.save_flag:
         db.add(db_key)
-        db.commit()
-        db.refresh(db_key)
-    return db_key
\ No newline at end of file
+        await db.commit()
+        await db.refresh(db_key)
+    return db_key
+
+
+@celery.task(name="keys.create_keys")
+def create_keys_job(key: dict) -> dict:
+    return run_job(create_keys, KeyCreate(**key))
@@ -0,0 +1,163 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import confirmations, multisig, native_scripts, signing, txview
+from core.context import context
+from core.executor import run_in_thread
+from core.workspace import node_workspace
+from db.dblib import get_db, insert_unique
+from db.models import dbmodels
+from routers.api_v1.endpoints.blockchain_api import invalidate_transaction
+from routers.api_v1.endpoints.pydantic_schemas import MultisigCreate, MultisigSign
+from routers.api_v1.endpoints.transactions_api import analysis, store_transaction, submitted_status, wallet_skeys
+
+router = APIRouter()
+
+
+async def multisig_script(db: AsyncSession, tx_id: str) -> tuple:
+    """(registered transaction, script content)"""
+    row = (await db.execute(select(dbmodels.MultisigTransactions, dbmodels.Scripts.content)
+        .join(dbmodels.Scripts, dbmodels.Scripts.id == dbmodels.MultisigTransactions.id_script)
+        .where(dbmodels.MultisigTransactions.tx_id == tx_id))).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Multisig transaction not found")
+    return row[0], row[1]
+
+async def multisig_info(db: AsyncSession, db_multisig: dbmodels.MultisigTransactions, script: dict) -> dict:
+    collected = sorted(await multisig.signers(db, db_multisig.tx_id))
+    return {
+        "tx_id": db_multisig.tx_id,
+        "script_id": db_multisig.id_script,
+        "status": db_multisig.status,
+        "auto_submit": db_multisig.auto_submit,
+        "signers": collected,
+        "missing": sorted(native_scripts.key_hashes(script) - set(collected)),
+        "tx_cborhex": db_multisig.tx_signed,
+        "submit": db_multisig.submit,
+        "created_at": db_multisig.created_at,
+        "updated_at": db_multisig.updated_at,
+    }
+
+async def submit_multisig(db: AsyncSession, db_multisig: dbmodels.MultisigTransactions) -> None:
+    """Submit the assembled transaction and store it for the confirmation
+    tracker if the node accepts it. Commits `db`, releasing the row lock"""
+    with node_workspace(context.node) as ws:
+        ws.write_json('tx.signed', db_multisig.tx_signed)
+        submit_response = (await run_in_thread(ws.node.submit_transaction))[:-1]
+    invalidate_transaction(db_multisig.tx_signed)
+    status = submitted_status(submit_response)
+    db_multisig.submit = submit_response
+    db_multisig.status = multisig.FAILED if status == confirmations.FAILED else multisig.SUBMITTED
+    db_multisig.updated_at = datetime.utcnow()
+    if db_multisig.status == multisig.FAILED:
+        await db.commit()
+        return
+    await store_transaction(db,
+        tx_id = db_multisig.tx_id,
+        tx_cborhex = db_multisig.tx_signed,
+        fees = analysis(db_multisig.tx_signed).get("fee"),
+        network = context.node.CARDANO_NETWORK,
+        status = status,
+    )
+
+
+@router.post("/", status_code=201,
+                summary="Register a multisig transaction to collect its witnesses",
+                response_description="Multisig transaction"
+                )
+async def create_multisig(multisig_params: MultisigCreate, db: AsyncSession = Depends(get_db)) -> dict:
+    """Register the draft of a transaction of a simple script so its signers can add witnesses separately.\n
+    **script_id**: script id as returned by the scripts endpoints. Its type and required signers decide when the transaction is complete.\n
+    **tx_cborhex**: draft transaction (e.g. tx_cborhex of /transactions/buildtx, built with the number of witnesses the script needs).\n
+    **auto_submit**: if true, the transaction is submitted as soon as it has the witnesses the script needs.\n
+    Registering the same draft again returns the registered transaction.
+    """
+    tx_draft = multisig_params.tx_cborhex
+    try:
+        tx_id = txview.tx_id(tx_draft["cborHex"])
+        # Layouts core.signing can't add witnesses to are rejected up front
+        signing.add_witnesses(tx_draft, [])
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"Problems reading the transaction: {e}")
+    db_script = await db.scalar(select(dbmodels.Scripts).where(dbmodels.Scripts.id == multisig_params.script_id))
+    if db_script is None:
+        raise HTTPException(status_code=404, detail=f"Script with id: {multisig_params.script_id} not found")
+    try:
+        native_scripts.to_ledger(db_script.content)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=f"Script is not a simple script: {e}")
+
+    db_multisig = await insert_unique(db, dbmodels.MultisigTransactions, "tx_id",
+        tx_id = tx_id,
+        id_script = db_script.id,
+        tx_draft = tx_draft,
+        auto_submit = multisig_params.auto_submit,
+        status = multisig.COLLECTING,
+    )
+    if db_multisig is None:
+        db_multisig, script = await multisig_script(db, tx_id)
+        return await multisig_info(db, db_multisig, script)
+    return await multisig_info(db, db_multisig, db_script.content)
+
+@router.post("/{tx_id}/witnesses", status_code=201,
+                summary="Add witnesses to a multisig transaction",
+                response_description="Multisig transaction"
+                )
+async def add_multisig_witnesses(tx_id: str, sign_params: MultisigSign, db: AsyncSession = Depends(get_db)) -> dict:
+    """Each signer adds its witnesses independently, in any order and at the same time as the others.\n
+    **wallet_ids**: wallets in the local DB signing the transaction.\n
+    **witnesses**: witness files of other signers, as written by cardano-cli transaction witness.\n
+    Only keys of the script are accepted and a signer that already signed is ignored.
+    **added** lists the signers added by this request. Once the signers meet the script the
+    transaction is assembled (status ready) and, with auto_submit, submitted.
+    """
+    db_multisig, script = await multisig_script(db, tx_id)
+    added = []
+    if db_multisig.status == multisig.COLLECTING:
+        message = bytes.fromhex(tx_id)
+        key_hashes = native_scripts.key_hashes(script)
+        skeys = await wallet_skeys(db, sign_params.wallet_ids) if sign_params.wallet_ids else []
+        try:
+            witnesses = multisig.check_witnesses(message,
+                [signing.read_witness(witness) for witness in sign_params.witnesses], key_hashes)
+            # Signed here, no need to verify
+            witnesses.update(multisig.check_witnesses(message,
+                await multisig.make_witnesses(message, skeys), key_hashes, verify=False))
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=f"Problems adding the witnesses: {e}")
+        added = await multisig.add_witnesses(db, tx_id, witnesses)
+        db_multisig = await multisig.assemble(db, tx_id, script)
+        if db_multisig.status == multisig.READY and db_multisig.auto_submit:
+            await submit_multisig(db, db_multisig)
+        else:
+            await db.commit()
+    tx_info = await multisig_info(db, db_multisig, script)
+    tx_info["added"] = added
+    return tx_info
+
+@router.get("/{tx_id}",
+                summary="Status of a multisig transaction",
+                response_description="Multisig transaction"
+                )
+async def get_multisig(tx_id: str, db: AsyncSession = Depends(get_db)) -> dict:
+    """Signers so far, signers of the script still missing and, once assembled, the signed transaction"""
+    db_multisig, script = await multisig_script(db, tx_id)
+    return await multisig_info(db, db_multisig, script)
+
+@router.post("/{tx_id}/submit", status_code=201,
+                summary="Submit an assembled multisig transaction",
+                response_description="Multisig transaction"
+                )
+async def submit_multisig_tx(tx_id: str, db: AsyncSession = Depends(get_db)) -> dict:
+    """Submit a transaction with status ready, or retry one that failed"""
+    _, script = await multisig_script(db, tx_id)
+    db_multisig = await multisig.assemble(db, tx_id, script)
+    status = db_multisig.status
+    if status not in (multisig.READY, multisig.FAILED):
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=f"Multisig transaction is {status}")
+    await submit_multisig(db, db_multisig)
+    return await multisig_info(db, db_multisig, script)
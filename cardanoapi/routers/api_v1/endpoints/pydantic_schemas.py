@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import List, Union, Optional
-from datetime import datetime
+from datetime import date, datetime
 from pydantic import UUID4, ValidationError
 import uuid
 
@@ -15,7 +15,7 @@ class UserBase(BaseModel):
 
 class User(UserBase):
     id: UUID4
-    id_wallet: Optional[str]=None
+    id_wallet: Optional[UUID4]=None
     is_verified: bool
     created_at: datetime
     updated_at: datetime
@@ -38,10 +38,37 @@ class TokenData(BaseModel):
 # Wallet section definition
 ############################
 
+class WalletInfo(BaseModel):
+    """Public part of a stored wallet, signing keys are never listed"""
+    id: UUID4
+    name: str
+    base_addr: str
+    payment_addr: str
+    stake_addr: str
+    hash_verification_key: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
 class KeyCreate(BaseModel):
     name: Union [str, None]
     size: int = 24
     save_flag: bool = True
+    include_mnemonic: bool = True
+
+class KeyBulkCreate(BaseModel):
+    count: Optional[int] = None
+    names: Optional[List[str]] = None
+    size: int = 24
+    include_mnemonic: bool = False
+
+    @validator("names", always=True)
+    def check_names(cls, value, values):
+        if (value is None) == (values.get("count") is None):
+            raise ValueError("Either count or names must be given")
+        return value
 
 class KeyRecover(BaseModel):
     name: Union [str, None]
@@ -63,16 +90,32 @@ class KeyRecover(BaseModel):
 class NodeCommandName(str, Enum):
     utxos = "utxos"
     balance = "balance"
+
+class AddressQuery(BaseModel):
+    addresses: List[str] = []
+    wallet_ids: List[str] = []
     
 class AddressDestin(BaseModel):
     address: str
     amount: int
 
+class CoinSelection(str, Enum):
+    largest_first = "largest_first"
+    random_improve = "random_improve"
+
 class SimpleSend(BaseModel):
     wallet_id: str
     address_destin: list[AddressDestin]
     metadata: Union [dict, None] = None
     witness: int = 1
+    coin_selection: CoinSelection = CoinSelection.largest_first
+
+class FeeQuote(BaseModel):
+    address_origin: str
+    address_destin: list[AddressDestin]
+    metadata: Union [dict, None] = None
+    witness: int = 1
+    coin_selection: CoinSelection = CoinSelection.largest_first
 
 class Tokens(BaseModel):
     name: str
@@ -85,6 +128,7 @@ class BuildTx(BaseModel):
     script_id: str = ""
     mint: Union[list[Tokens], None] = None
     witness: int = 1
+    coin_selection: CoinSelection = CoinSelection.largest_first
 
     @validator("script_id", always=True)
     def chekc_script_id(cls, value):
@@ -111,6 +155,51 @@ class Mint(SimpleSend):
     #     assert isinstance(value, UUID4), "Script_id field must be a valid UUID4"
     #     return value
 
+class MultisigCreate(BaseModel):
+    script_id: UUID4
+    tx_cborhex: dict
+    auto_submit: bool = False
+
+class MultisigSign(BaseModel):
+    wallet_ids: List[str] = []
+    witnesses: List[dict] = []
+
+class TransactionInfo(BaseModel):
+    id: int
+    tx_id: str
+    id_wallet: Optional[UUID4]=None
+    submission: datetime
+    address_origin: Optional[str]=None
+    address_destin: Optional[str]=None
+    metadata_info: Optional[Union[dict, list]]=None
+    fees: Optional[int]=None
+    network: Optional[str]=None
+    processed: Optional[bool]=None
+    batch_id: Optional[UUID4]=None
+    status: Optional[str]=None
+    ttl: Optional[int]=None
+    confirmed_slot: Optional[int]=None
+    confirmed_block: Optional[int]=None
+    depth: Optional[int]=None
+
+    class Config:
+        orm_mode = True
+
+class TransactionRecord(TransactionInfo):
+    tx_cborhex: Optional[dict]=None
+    tx_analysis: Optional[dict]=None
+
+class TotalsPeriod(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+    year = "year"
+
+class WalletTotals(BaseModel):
+    period: date
+    tx_count: int
+    total_fees: int
+
 ############################
 # Script section definition
 ############################
@@ -153,4 +242,21 @@ class Script(BaseModel):
 
 class ScriptPurpose(str, Enum):
     mint = "mint"
-    multisig = "multisig"
\ No newline at end of file
+    multisig = "multisig"
+
+class ScriptInfo(BaseModel):
+    id: UUID4
+    name: Optional[str]=None
+    type: Optional[str]=None
+    required: Optional[int]=None
+    hashes: Optional[str]=None
+    type_time: Optional[str]=None
+    slot: Optional[int]=None
+    purpose: Optional[ScriptPurpose]=None
+    content: Optional[Union[dict, list]]=None
+    policyID: Optional[str]=None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
@@ -1,18 +1,24 @@
 import json
 from fastapi import APIRouter, UploadFile, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from cardanopythonlib import base, path_utils
+from cardanopythonlib import path_utils
 from routers.api_v1.endpoints.pydantic_schemas import ScriptPurpose, Script
-from db.dblib import get_db
+from db.dblib import get_db, insert_unique
 from db.models import dbmodels
+from core.context import context
+from core.executor import run_in_thread
+from core import native_scripts
 
 router = APIRouter()
 
-config_path = './config.ini' # Optional argument
-# config_path = './cardanoapi/config.ini' # Optional argument
-starter = base.Starter(config_path)
-node = base.Node(config_path) # Or with the default ini: node = base.Node()
+async def store_script(db: AsyncSession, **fields) -> dbmodels.Scripts:
+    # policyID is unique: the same script was already stored, return it
+    db_script = await insert_unique(db, dbmodels.Scripts, "policyID", **fields)
+    if db_script is None:
+        db_script = await db.scalar(select(dbmodels.Scripts).where(dbmodels.Scripts.policyID == fields["policyID"]))
+    return db_script
 
 
 @router.post("/uploadScript/{script_purpose}", status_code=201, 
@@ -22,27 +28,26 @@ node = base.Node(config_path) # Or with the default ini: node = base.Node()
 async def upload_script(script_name: str, 
         file: UploadFile, 
         script_purpose: ScriptPurpose,
-        db: Session = Depends(get_db)):
+        db: AsyncSession = Depends(get_db)):
     """Upload script file and stores it in local db. Purpose: mint, multisig\n
     **file**: script file to be uploaded.\n
     """
     script_content = await file.read()
-    script_file_path = node.MINT_FOLDER
     script_content = json.loads(script_content)
-    path_utils.save_metadata(script_file_path, script_name, script_content)
-    policyID = node.create_policy_id(script_purpose, script_name)
+    # The script file is written from the db when a transaction needs it
+    try:
+        policyID = native_scripts.policy_id(script_content)
+    except ValueError:
+        policyID = None
     if policyID is None:
         db_script = {"msg": "Problems building the script"}
     else:
-        db_script = dbmodels.Scripts(
+        db_script = await store_script(db,
             name = script_name,
             purpose = script_purpose,
             content = script_content,
             policyID = policyID
         )
-        db.add(db_script)
-        db.commit()
-        db.refresh(db_script)
 
     return db_script
 
@@ -52,7 +57,7 @@ async def upload_script(script_name: str,
                 )
 async def simpleScript(simpleScript_params: Script, 
     script_purpose: ScriptPurpose,
-    db: Session = Depends(get_db)) -> dict:
+    db: AsyncSession = Depends(get_db)) -> dict:
     """Creation of a script depending of its purpose: mint or multisig.\n
     **name**: name of the script.\n
     **type**: type of the script. Options are: all, any, atLeast.\n
@@ -76,12 +81,12 @@ async def simpleScript(simpleScript_params: Script,
         "slot": slot,
         "purpose": script_purpose
     }
-    simple_script, policyID = node.create_simple_script(parameters=parameters)
+    simple_script, policyID = await run_in_thread(context.node.create_simple_script, parameters=parameters)
     if simple_script is None or policyID is None:
         db_script = {"msg": "Problems building the script"}
     else:
         script_purpose = script_purpose._value_
-        db_script = dbmodels.Scripts(
+        db_script = await store_script(db,
             name = script_name,
             purpose = script_purpose,
             content = simple_script,
@@ -92,15 +97,12 @@ async def simpleScript(simpleScript_params: Script,
             type_time = type_time,
             slot = slot
         )
-        db.add(db_script)
-        db.commit()
-        db.refresh(db_script)
     
     script_file_path = ''
     if script_purpose == 'mint':
-        script_file_path = node.MINT_FOLDER
+        script_file_path = context.node.MINT_FOLDER
     elif script_purpose == 'multisig':
-        script_file_path = node.MULTISIG_FOLDER
+        script_file_path = context.node.MULTISIG_FOLDER
 
     script_file_name = '/' + script_name + '.script'
     policy_file_name = '/' + script_name + '.policyid'
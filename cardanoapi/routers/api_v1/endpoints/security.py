@@ -1,80 +1,85 @@
+import time
 from datetime import datetime, timedelta
 from typing import Union, List
 
 from fastapi import Depends, HTTPException, status, APIRouter
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
-from db.dblib import get_db, config
-from sqlalchemy.orm import Session
+from db.dblib import get_db, insert_unique
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.models import dbmodels
 from routers.api_v1.endpoints import pydantic_schemas
 from core.config import settings
+from core.cache import TTLCache
+from core.passwords import get_password_hash, verify_password, login_latency
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/security/token")
 
 router = APIRouter()
 
+# Verified token -> pydantic_schemas.User, saves the decode and the db query
+token_cache = TTLCache(settings.TOKEN_CACHE_TTL, maxsize=settings.TOKEN_CACHE_SIZE)
+
 #############################################
 # Security section
 
-def verify_user_existence(username: str, db: Session):
-    return db.query(dbmodels.User).filter(dbmodels.User.username == username).first()
+async def verify_user_existence(username: str, db: AsyncSession):
+    return await db.scalar(select(dbmodels.User).where(dbmodels.User.username == username))
 #  user_db = db.query(dbmodels.User).filter(dbmodels.User.username == form_data.username).first()
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
+async def authenticate_user(user_db, password: str, db: AsyncSession) -> bool:
+    # Verify password and upgrade the stored hash if its cost changed
+    password_flag, new_hash = await verify_password(password, user_db.hashed_password)
+    if password_flag and new_hash is not None:
+        user_db.hashed_password = new_hash
+        await db.commit()
+    return password_flag
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def authenticate_user(user_db, password: str):
-    # Verify password and verification
-    password_flag = verify_password(password, user_db.hashed_password)
-    if password_flag:
-        return True
-    else:
-        return False
+def invalidate_user_tokens(username: str) -> None:
+    """Call it whenever the user is created, changed or removed"""
+    token_cache.invalidate_where(lambda user: user.username == username)
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None):
-    params = config('./config.ini', section='users')
     to_encode = data.copy()
-    print(data)
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, params["secret_key"], algorithm=params["algorithm"])
-    print(encoded_jwt)
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    params = config('./config.ini', section='users')
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    current_user = token_cache.get(token)
+    if current_user is not None:
+        return current_user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, params["secret_key"], algorithms=[params["algorithm"]])
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload["sub"]
         if username is None:
             raise credentials_exception
         token_data = pydantic_schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user_db = db.query(dbmodels.User).filter(dbmodels.User.username == token_data.username).first()
+    user_db = await verify_user_existence(token_data.username, db)
     if user_db is None:
         raise credentials_exception
-    return pydantic_schemas.User.from_orm(user_db)
+    current_user = pydantic_schemas.User.from_orm(user_db)
+    # Cached until the token expires at the latest
+    ttl = min(settings.TOKEN_CACHE_TTL, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, current_user, ttl)
+    return current_user
 
 
 # async def get_current_active_user(current_user: dbmodels.User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -90,19 +95,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
                 summary="Create User",
                 response_description="User created",
                 response_model=pydantic_schemas.Token)
-async def create_user(user: pydantic_schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user_existing = verify_user_existence(user.username, db)
-    if db_user_existing is not None:
+async def create_user(user: pydantic_schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    hashed_password = await get_password_hash(user.password)
+    # All users is_verified=True. To be used in future
+    db_user = await insert_unique(db, dbmodels.User, "username",
+        username=user.username, hashed_password=hashed_password, is_verified=True)
+    if db_user is None:
         raise HTTPException(status_code=400, detail="User already exists")
-
-    hashed_password = get_password_hash(user.password)
-    db_user = dbmodels.User(username=user.username, hashed_password=hashed_password, is_verified=True) # All users is_verified=True. To be used in future
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    invalidate_user_tokens(db_user.username)
     # Once user is registered, create and return token
-    params = config('./config.ini', section='users')
-    access_token_expires = timedelta(minutes=int(params["token_expire"]))
+    access_token_expires = timedelta(minutes=settings.TOKEN_EXPIRE)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
@@ -112,20 +114,20 @@ async def create_user(user: pydantic_schemas.UserCreate, db: Session = Depends(g
     summary="Get token for registerd user",
     response_description="login succesfull",
     response_model=pydantic_schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user_db = db.query(dbmodels.User).filter(dbmodels.User.username == form_data.username).first()
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    started = time.perf_counter()
+    user_db = await verify_user_existence(form_data.username, db)
     if not user_db:
         raise HTTPException(status_code=400, detail="Incorrect username")
-    authenticate_flag = authenticate_user(user_db, form_data.password)
+    authenticate_flag = await authenticate_user(user_db, form_data.password, db)
+    login_latency.record(time.perf_counter() - started)
     if not authenticate_flag:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password or user not verified",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    params = config('./config.ini', section='users')
-    access_token_expires = timedelta(minutes=int(params["token_expire"]))
-    print(form_data.username)
+    access_token_expires = timedelta(minutes=settings.TOKEN_EXPIRE)
     access_token = create_access_token(
         data={"sub": form_data.username}, expires_delta=access_token_expires
     )
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from typing import Dict, List
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from core.config import settings
+from core.confirmations import confirmation_tracker
+from core.events import EventHub, Subscription
+from db.dblib import SessionLocal
+from db.models import dbmodels
+from routers.api_v1.endpoints.blockchain_api import get_tip, get_utxos_bulk, invalidate_addresses
+
+router = APIRouter()
+
+
+async def tx_states(tx_ids: List[str]) -> Dict[str, dict]:
+    """Status of our stored transactions, kept up to date by the confirmation tracker"""
+    transactions = dbmodels.Transactions
+    async with SessionLocal() as db:
+        rows = await db.execute(
+            select(transactions.tx_id, transactions.status, transactions.confirmed_slot,
+                transactions.confirmed_block, transactions.depth)
+            .where(transactions.tx_id.in_(tx_ids)))
+        return {row.tx_id: {"status": row.status, "confirmed_slot": row.confirmed_slot,
+            "confirmed_block": row.confirmed_block, "depth": row.depth} for row in rows}
+
+async def address_utxos(addresses: List[str]) -> Dict[str, list]:
+    # Called on a new block: the cached UTxOs are stale, the fresh ones are
+    # cached again for /blockchain/address
+    invalidate_addresses(addresses)
+    result = {}
+    for i in range(0, len(addresses), settings.BULK_QUERY_BATCH_SIZE):
+        responses = await get_utxos_bulk(addresses[i:i + settings.BULK_QUERY_BATCH_SIZE])
+        result.update((address, utxos) for address, (utxos, _) in responses.items())
+    return result
+
+
+event_hub = EventHub(get_tip, tx_states, address_utxos, confirmation_tracker.source.locate,
+    interval=settings.STREAM_POLL_INTERVAL, queue_size=settings.STREAM_QUEUE_SIZE,
+    max_keys=settings.STREAM_MAX_KEYS)
+
+
+def check_keys(tx_ids: List[str], addresses: List[str]) -> None:
+    if len(set(tx_ids)) + len(set(addresses)) > settings.STREAM_MAX_KEYS:
+        raise HTTPException(status_code=400,
+            detail=f"At most {settings.STREAM_MAX_KEYS} transactions and addresses per subscription")
+
+@router.get("/events",
+        summary="Server-sent events of new blocks, transactions and addresses",
+        response_description="text/event-stream of tip, tx and address events")
+async def stream_events(tx_id: List[str] = Query([]), address: List[str] = Query([])):
+    """Push notifications instead of polling /blockchain/status and the address endpoints.\n
+    **tx_id**: Transaction ids to follow (repeat the parameter for several). Our transactions report the status of the confirmation tracker, others are looked up on chain once per block.\n
+    **address**: Addresses whose UTxOs to follow, reported when they change.\n
+    Every event is a JSON object whose "event" field (tip, tx or address) is also the SSE event name.
+    A tip event is sent on every new block. Clients that don't keep up are disconnected.
+    """
+    check_keys(tx_id, address)
+
+    async def events():
+        subscription = event_hub.open(tx_id, address)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), settings.STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/ws")
+async def stream_websocket(websocket: WebSocket, tx_id: List[str] = Query([]), address: List[str] = Query([])):
+    """Same events as /stream/events. Subscriptions can be changed by sending
+    {"subscribe": {"tx_ids": [...], "addresses": [...]}} or {"unsubscribe": {...}}"""
+    await websocket.accept()
+    try:
+        subscription = event_hub.open(tx_id, address)
+    except ValueError as e:
+        await websocket.send_json({"event": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    async def receive(subscription: Subscription) -> None:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                subscription.push({"event": "error", "detail": "Messages must be JSON"})
+                continue
+            for action in ("subscribe", "unsubscribe"):
+                keys = message.get(action) if isinstance(message, dict) else None
+                if not isinstance(keys, dict):
+                    continue
+                tx_ids, addresses = keys.get("tx_ids", []), keys.get("addresses", [])
+                if not all(isinstance(key, str) for key in [*tx_ids, *addresses]):
+                    subscription.push({"event": "error", "detail": "tx_ids and addresses must be lists of strings"})
+                elif action == "subscribe":
+                    try:
+                        subscription.subscribe(tx_ids, addresses)
+                    except ValueError as e:
+                        subscription.push({"event": "error", "detail": str(e)})
+                else:
+                    subscription.unsubscribe(tx_ids, addresses)
+
+    async def send(subscription: Subscription) -> None:
+        while True:
+            event = await subscription.get()
+            if event is None:
+                await websocket.close(code=1008)
+                return
+            await websocket.send_json(event)
+
+    tasks = [asyncio.create_task(receive(subscription)), asyncio.create_task(send(subscription))]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
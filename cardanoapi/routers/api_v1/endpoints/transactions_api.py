@@ -1,20 +1,179 @@
+import asyncio
 import json
+import uuid
 
 from fastapi import APIRouter, UploadFile, Depends, HTTPException, Form, File
-from sqlalchemy.orm import Session
-from db.dblib import get_db
-from typing import Optional
-
-from cardanopythonlib import base, path_utils
-from routers.api_v1.endpoints.pydantic_schemas import SimpleSend, BuildTx, Mint, SignCommandName, SimpleSign
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.dblib import get_db, insert_unique
+from typing import List, Optional
+
+from cardanopythonlib import path_utils
+from routers.api_v1.endpoints.pydantic_schemas import SimpleSend, BuildTx, Mint, SignCommandName, SimpleSign, FeeQuote, CoinSelection
+from routers.api_v1.endpoints.pydantic_schemas import TransactionInfo, TransactionRecord
 from db.models import dbmodels
+from db.rollups import add_to_wallet_totals
+from core.config import settings
+from core.context import context
+from core.workspace import Workspace, input_assets, node_workspace
+from core.executor import run_in_thread
+from core.celery_app import celery, run_job
+from routers.api_v1.endpoints.jobs_api import enqueue_job
+from routers.api_v1.endpoints.blockchain_api import get_protocol_params, get_tip, get_utxos, invalidate_addresses, invalidate_transaction
+from core import confirmations, native_scripts, signing, txplanner, txstorage, txview
+from core.pending import pending_utxos
 
 router = APIRouter()
 
-config_path = './config.ini' # Optional argument
-# config_path = './cardanoapi/config.ini' # Optional argument
-starter = base.Starter(config_path)
-node = base.Node(config_path) # Or with the default ini: node = base.Node()
+
+
+async def validity_end() -> int:
+    """TTL slot of the transactions built now"""
+    return (await get_tip())["slot"] + settings.TX_TTL_SLOTS
+
+async def plan_inputs(address_origin: str, address_destin: list, metadata: Optional[dict],
+        witness: int, coin_selection: CoinSelection, protocol_params: dict, reserve: bool = False) -> dict:
+    """Select inputs and estimate the fee in process with core.txplanner.
+    Inputs of our pending transactions are skipped and their change can be
+    chained. Native tokens of the inputs go back to the change. With
+    `reserve` the inputs stay reserved until the transaction
+    is submitted or fails, see send_transaction"""
+    utxos, _ = await get_utxos(address_origin)
+    async with pending_utxos.lock(address_origin):
+        utxos = pending_utxos.available(address_origin, utxos)
+        try:
+            plan = await run_in_thread(txplanner.plan_transaction, utxos, address_destin, address_origin,
+                protocol_params, metadata, witness, coin_selection.value)
+        except (txplanner.InsufficientFunds, ValueError) as e:
+            raise HTTPException(status_code=404, detail=f"Problems building the transaction: {e}")
+        if reserve:
+            plan["reserved"] = pending_utxos.reserve(address_origin, plan["inputs"])
+    plan["ttl"] = await validity_end()
+    return plan
+
+async def read_tx_id(envelope: dict, cli_txid) -> str:
+    """Id of the transaction in a cardano-cli envelope, hashed in process.
+    `cli_txid` (the node's get_txid_* for the same file) is only called for
+    CBOR core.txview can't read"""
+    try:
+        return txview.tx_id(envelope["cborHex"])
+    except (KeyError, TypeError, ValueError):
+        return (await run_in_thread(cli_txid))[:-1]
+
+async def wallet_skeys(db: AsyncSession, ids: List[str]) -> List[dict]:
+    """Payment skeys of the wallets, in the order of `ids`, with one query"""
+    try:
+        wallet_ids = [uuid.UUID(str(id)) for id in ids]
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    rows = await db.execute(select(dbmodels.Wallet.id, dbmodels.Wallet.payment_skey)
+        .where(dbmodels.Wallet.id.in_(wallet_ids)))
+    skeys = dict(rows.all())
+    if any(wallet_id not in skeys for wallet_id in wallet_ids):
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    return [skeys[wallet_id] for wallet_id in wallet_ids]
+
+async def sign_envelope(tx_draft: dict, skeys: List[dict]) -> tuple:
+    """(signed envelope, tx id). Witnesses are made in process by core.signing,
+    keys and layouts it can't handle (e.g. Plutus script data) are signed by
+    cardano-cli with temporary skey files"""
+    try:
+        tx_signed = signing.sign_transaction(tx_draft, skeys)
+        return tx_signed, txview.tx_id(tx_signed["cborHex"])
+    except ValueError:
+        pass
+    with node_workspace(context.node) as ws:
+        ws.write_json('tx.draft', tx_draft)
+        sign_file_names = [ws.save_skey(f"temp_{index}", skey) for index, skey in enumerate(skeys)]
+        if await run_in_thread(ws.node.sign_transaction, *sign_file_names) is None:
+            raise HTTPException(status_code=404, detail="Problems signing the transaction")
+        tx_signed = ws.read_json('tx.signed')
+        return tx_signed, await read_tx_id(tx_signed, ws.node.get_txid_signed)
+
+def analysis(envelope: Optional[dict]) -> dict:
+    """core.txview analysis of the transaction in an envelope, for analyze=true"""
+    try:
+        return txview.analyze(envelope["cborHex"])
+    except (KeyError, TypeError, ValueError) as e:
+        return {"msg": f"Transaction could not be analyzed: {e}"}
+
+async def send_transaction(ws: Workspace, params: dict, payment_skey: dict, plan: Optional[dict] = None) -> dict:
+    """Build, sign with one wallet and submit the transaction inside the workspace.
+    With a plan from core.txplanner the transaction is built with exactly its
+    inputs and, if they were reserved, the reservation is committed or released"""
+    reserved = plan.get("reserved", []) if plan is not None else []
+    try:
+        if plan is not None:
+            try:
+                fees = await run_in_thread(ws.build_raw, plan["inputs"], params["address_destin"],
+                    params["change_address"], params["metadata"], params["witness"], plan.get("ttl"))
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=f"Problems building the transaction: {e}")
+        else:
+            build_response = await run_in_thread(ws.node.build_tx_components, params)
+            if build_response is None:
+                raise HTTPException(status_code=404, detail="Problems building the transaction")
+            try:
+                fees = int(build_response.split(' ')[-1][:-1])
+            except ValueError:
+                # cardano-cli error output
+                raise HTTPException(status_code=404, detail=f"Problems building the transaction: {build_response}")
+        tx_signed, tx_id = await sign_envelope(ws.read_json('tx.draft'), [payment_skey])
+        ws.write_json('tx.signed', tx_signed)
+        submit_response = (await run_in_thread(ws.node.submit_transaction))[:-1]
+    except BaseException:
+        pending_utxos.release(reserved)
+        raise
+    if "Command failed" in submit_response:
+        pending_utxos.release(reserved)
+    elif plan is not None:
+        # build_raw sends the tokens of the inputs to the change
+        outputs = [{"address": output["address"], "amounts": txplanner.utxo_amounts(output["amount"])}
+            for output in params["address_destin"]]
+        outputs.append({
+            "address": params["change_address"],
+            "amounts": txplanner.utxo_amounts(plan["total_in"] - plan["total_out"] - fees,
+                input_assets(plan["inputs"]))
+        })
+        pending_utxos.commit(reserved, tx_id, outputs, params["address_origin"])
+    invalidate_addresses([params["address_origin"]] + [item["address"] for item in params["address_destin"]])
+    return {
+        "tx_id": tx_id,
+        "fees": fees,
+        "submit": submit_response,
+        "tx_cborhex": tx_signed
+    }
+
+def submitted_status(submit_response: str) -> str:
+    # cardano-cli prints its errors instead of failing
+    return confirmations.FAILED if "Command failed" in submit_response else confirmations.SUBMITTED
+
+def tx_ttl(envelope: Optional[dict]) -> Optional[int]:
+    try:
+        return txview.ttl(envelope["cborHex"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+async def store_transaction(db: AsyncSession, tx_cborhex: Optional[dict] = None, **fields) -> dbmodels.Transactions:
+    """Store a submitted transaction. processed stays false until core.confirmations sees it on chain"""
+    fields.setdefault("processed", False)
+    fields.setdefault("ttl", tx_ttl(tx_cborhex))
+    # tx_id is unique, a transaction signed already stored in db is not inserted
+    db_transaction = await insert_unique(db, dbmodels.Transactions, "tx_id", commit=False,
+        **txstorage.storage_fields(tx_cborhex), **fields)
+    if db_transaction is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Transaction id already exists in database")
+    await add_to_wallet_totals(db, db_transaction)
+    await db.commit()
+    return db_transaction
+
+def transaction_record(db_transaction: dbmodels.Transactions, analyze: bool = False) -> TransactionRecord:
+    """Stored transaction with its cardano-cli envelope, and its analysis if asked"""
+    envelope = txstorage.envelope(db_transaction)
+    return TransactionRecord(**TransactionInfo.from_orm(db_transaction).dict(),
+        tx_cborhex=envelope, tx_analysis=analysis(envelope) if analyze else None)
 
 
 
@@ -22,7 +181,7 @@ node = base.Node(config_path) # Or with the default ini: node = base.Node()
                 summary="Simple send of ADA (not tokens) to multiple addresses",
                 response_description="Transaction submit"
                 )
-async def simple_send(send_params: SimpleSend, db: Session = Depends(get_db)) -> dict:
+async def simple_send(send_params: SimpleSend, async_mode: bool = False, analyze: bool = False, db: AsyncSession = Depends(get_db)) -> dict:
     """
     Simple send of ADA (not tokens) to multiple addresses.
     The system needs to have the skeys in local db to sign and submit. 
@@ -32,13 +191,14 @@ async def simple_send(send_params: SimpleSend, db: Session = Depends(get_db)) ->
     **amount**: Amount in lovelace.\n
     **metadata**: Metadata info if specified.\n
     **witness**: Default 1.\n
+    **async_mode**: If true, the transaction is processed as a background job and the job id is returned. See jobs section.\n
+    **analyze**: If true, the response includes the transaction analysis in **tx_analysis**.\n
     """
-    success_flag = False
-    fees = 0
-    msg = ""
+    if async_mode:
+        return enqueue_job(simple_send_job, send_params.dict(), analyze)
     id = send_params.wallet_id
 
-    db_wallet = db.query(dbmodels.Wallet).filter(dbmodels.Wallet.id == id).first()
+    db_wallet = await db.scalar(select(dbmodels.Wallet).where(dbmodels.Wallet.id == id))
     if db_wallet is None:
         raise HTTPException(status_code=404, detail="Wallet not found")
     
@@ -58,59 +218,116 @@ async def simple_send(send_params: SimpleSend, db: Session = Depends(get_db)) ->
         "witness": send_params.witness,
     }
 
-    sign_response = None
-    submit_response = None
-
-    build_response = node.build_tx_components(params)
-    tx_id = node.get_txid_body()
-
-    if build_response is not None:
-        fees = build_response.split(' ')[-1][:-1]
-        sign_file_name = 'temp_' + id
-        sign_path = node.KEYS_FILE_PATH + '/'
-        path_utils.save_file(sign_path + sign_file_name + '/', sign_file_name + '.payment.skey', payment_skey)
-        sign_response = node.sign_transaction([sign_file_name])
-        if sign_response is not None:
-            success_flag = True
-            tx_id = node.get_txid_signed()[:-1]
-            tx_analysis = json.dumps(node.analyze_tx_signed())
-            submit_response = node.submit_transaction()[:-1]
-            msg = "Transaction signed and submit"
-            path_utils.remove_folder(sign_path + sign_file_name)
-            cbor_tx_path = base.Starter(config_path).TRANSACTION_PATH_FILE + '/tx.signed'
-            with open(cbor_tx_path, 'r') as file:
-                cbor_tx_file = json.load(file)
-        else:
-            raise HTTPException(status_code=404, detail="Problems signing the transaction")
-    else:
-        raise HTTPException(status_code=404, detail="Problems building the transaction")
-    
-    # Check if transaction signed is already stored in db
-    db_transaction = db.query(dbmodels.Transactions).filter(dbmodels.Transactions.tx_id == tx_id).first()
-    if db_transaction is None:
-        db_transaction = dbmodels.Transactions(
-            id_wallet = id,
-            address_origin = params["address_origin"],
-            address_destin = str(params["address_destin"]),
-            tx_cborhex = cbor_tx_file,
-            metadata = params["metadata"],
-            fees = fees,
-            network = base.Starter(config_path).CARDANO_NETWORK,
-            processed = success_flag,
-            tx_id = tx_id
-        )
-        db.add(db_transaction)
-        db.commit()
-        db.refresh(db_transaction)
-    else:
-        raise HTTPException(status_code=404, detail="Transaction id already exists in database")
-    return db_transaction
+    protocol_params = await get_protocol_params()
+    plan = await plan_inputs(address_origin, address_destin_dict, send_params.metadata,
+        send_params.witness, send_params.coin_selection, protocol_params, reserve=True)
+    with node_workspace(context.node, protocol_params=protocol_params) as ws:
+        tx_result = await send_transaction(ws, params, payment_skey, plan)
+
+    return transaction_record(await store_transaction(db,
+        id_wallet = id,
+        address_origin = params["address_origin"],
+        address_destin = str(params["address_destin"]),
+        tx_cborhex = tx_result["tx_cborhex"],
+        metadata_info = params["metadata"],
+        fees = tx_result["fees"],
+        network = context.node.CARDANO_NETWORK,
+        status = submitted_status(tx_result["submit"]),
+        tx_id = tx_result["tx_id"]
+    ), analyze)
+
+@router.post("/simplesend/batch", status_code=201,
+                summary="Send ADA (not tokens) to a large list of addresses in several transactions",
+                response_description="Transactions submitted under one batch id"
+                )
+async def simple_send_batch(send_params: SimpleSend, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Same as simplesend but the destinations are packed into the fewest transactions
+    that fit the max tx size, each one funded by its own utxos. The transactions are
+    built, signed and submitted concurrently and stored under a shared batch id.\n
+    **wallet_id**: wallet id provided when generated with create_keys endpoint.\n
+    **address_destin**: List of addresses in bech32 format to send ADA.\n
+    **amount**: Amount in lovelace.\n
+    **metadata**: Metadata info if specified. It is attached to every transaction.\n
+    **witness**: Default 1.\n
+    """
+    id = send_params.wallet_id
+    db_wallet = await db.scalar(select(dbmodels.Wallet).where(dbmodels.Wallet.id == id))
+    if db_wallet is None:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    address_origin = db_wallet.payment_addr
+    payment_skey = db_wallet.payment_skey
+    address_destin_dict = [item.dict() for item in send_params.address_destin]
+
+    protocol_params = await get_protocol_params()
+    utxos, _ = await get_utxos(address_origin)
+    async with pending_utxos.lock(address_origin):
+        utxos = pending_utxos.available(address_origin, utxos)
+        try:
+            plans = await run_in_thread(txplanner.pack_outputs, utxos, address_destin_dict, address_origin,
+                protocol_params, send_params.metadata, send_params.witness)
+        except (txplanner.InsufficientFunds, ValueError) as e:
+            raise HTTPException(status_code=404, detail=f"Problems building the transaction: {e}")
+        for plan in plans:
+            plan["reserved"] = pending_utxos.reserve(address_origin, plan["inputs"])
+    ttl = await validity_end()
+    for plan in plans:
+        plan["ttl"] = ttl
+
+    async def send_batch(plan: dict) -> dict:
+        params = {
+            "address_origin": address_origin,
+            "address_destin": plan["outputs"],
+            "change_address": address_origin,
+            "metadata": send_params.metadata,
+            "mint": None,
+            "script_path": None,
+            "witness": send_params.witness,
+        }
+        with node_workspace(context.node, protocol_params=protocol_params) as ws:
+            return await send_transaction(ws, params, payment_skey, plan)
+
+    batch_id = uuid.uuid4()
+    results = await asyncio.gather(*(send_batch(plan) for plan in plans), return_exceptions=True)
+    transactions = []
+    for plan, result in zip(plans, results):
+        if isinstance(result, BaseException):
+            detail = result.detail if isinstance(result, HTTPException) else str(result)
+            transactions.append({"success_flag": False, "msg": detail, "address_destin": plan["outputs"]})
+            continue
+        status = submitted_status(result["submit"])
+        transaction = {"success_flag": status == confirmations.SUBMITTED, "status": status,
+            "tx_id": result["tx_id"], "fees": result["fees"], "address_destin": plan["outputs"]}
+        if status == confirmations.FAILED:
+            transaction["msg"] = result["submit"]
+        try:
+            await store_transaction(db,
+                id_wallet = id,
+                address_origin = address_origin,
+                address_destin = str(plan["outputs"]),
+                tx_cborhex = result["tx_cborhex"],
+                metadata_info = send_params.metadata,
+                fees = result["fees"],
+                network = context.node.CARDANO_NETWORK,
+                status = status,
+                tx_id = result["tx_id"],
+                batch_id = batch_id
+            )
+        except HTTPException as e:
+            # Already submitted: report it with the others instead of failing the batch
+            transaction["msg"] = e.detail
+        transactions.append(transaction)
+
+    return {
+        "batch_id": batch_id,
+        "transactions": transactions
+    }
 
 @router.post("/buildtx", status_code=201, 
                 summary="Simple build of tx to send ADA (not tokens) to multiple addresses",
                 response_description="Build tx"
                 )
-async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
+async def build_tx(build_tx: BuildTx, async_mode: bool = False, analyze: bool = False, db: AsyncSession = Depends(get_db)) -> dict:
     """
     Build_tx only builds the transaction, not sign or submit. 
     Simple send of ADA (not tokens) to multiple addresses.
@@ -125,7 +342,12 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
     **amount**: amount to be minted.\n
     **script_id**: script id as response returned with the post scripts endpoint. See scripts section. If not script use ""\n
     **witness**: Default 1.\n
+    **async_mode**: If true, the transaction is built as a background job and the job id is returned. See jobs section.\n
+    **analyze**: If true, the response includes the transaction analysis in **tx_analysis**.\n
     """
+    if async_mode:
+        return enqueue_job(build_tx_job, build_tx.dict(), analyze)
+
     success_flag = False
     fees = 0
     msg = ""
@@ -141,7 +363,7 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
     if (script_id == "" and mint != []) or (script_id != "" and mint == []):
         raise HTTPException(status_code=404, detail=f"Script field empty or mint info empty")
     elif script_id != "" and mint != []:
-        db_script = db.query(dbmodels.Scripts).filter(dbmodels.Scripts.id == script_id).first()
+        db_script = await db.scalar(select(dbmodels.Scripts).where(dbmodels.Scripts.id == script_id))
         if db_script is None or mint is None:
             raise HTTPException(status_code=404, detail=f"Script with id: {script_id} not found or mint field empty")
         else:
@@ -149,18 +371,29 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
             script_content = db_script.content
             script_policyID = db_script.policyID
             script_purpose = db_script.purpose
-            # Store the script locally to build the tx
+
+    protocol_params = await get_protocol_params()
+    plan = None
+    if script_id == "":
+        plan = await plan_inputs(address_origin, address_destin_dict, build_tx.metadata,
+            build_tx.witness, build_tx.coin_selection, protocol_params)
+    with node_workspace(context.node, protocol_params=protocol_params) as ws:
+        if script_id != "" and mint != []:
+            # Store the script in the workspace to build the tx
             script_file_path = ''
             if script_purpose == 'mint':
-                script_file_path = node.MINT_FOLDER
+                script_file_path = ws.node.MINT_FOLDER
             elif script_purpose == 'multisig':
-                script_file_path = node.MULTISIG_FOLDER
-            path_utils.save_metadata( script_file_path, script_name + ".script", script_content)
-            policyID = node.create_policy_id(script_purpose, script_name)
-            script_path = script_file_path + "/" + script_name + ".script"
+                script_file_path = ws.node.MULTISIG_FOLDER
             # Check script integrity
+            try:
+                policyID = native_scripts.policy_id(script_content)
+            except ValueError:
+                policyID = None
             if policyID != script_policyID:
                 raise HTTPException(status_code=404, detail=f"Script integrity not validated. PolicyID in local db is: {script_policyID} and newly generated policyID is: {policyID}")
+            path_utils.save_metadata( script_file_path, script_name + ".script", script_content)
+            script_path = script_file_path + "/" + script_name + ".script"
             
             mint_list = [item.dict() for item in mint]
             validity_interval = None
@@ -177,29 +410,36 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
                 "tokens": mint_list
             }
 
-    params = {
-        "address_origin": address_origin,
-        "address_destin": address_destin_dict,
-        "change_address": address_origin,
-        "metadata": build_tx.metadata,
-        "mint": mint_dict,
-        "script_path": script_path,
-        "witness": build_tx.witness,
-    }
-    build_response = node.build_tx_components(params)
-    tx_id = node.get_txid_body()
-
-    if build_response is not None:
-        fees = build_response.split(' ')[-1][:-1]
-        success_flag = True
-        msg = "Transaction build succesfull"
-        tx_id = node.get_txid_body()[:-1]
-        cbor_tx_path = node.TRANSACTION_PATH_FILE + '/tx.draft'
-        with open(cbor_tx_path, 'r') as file:
-            cbor_tx_file = json.load(file)
-    else:
-        msg = "Problems building the transaction"
-        cbor_tx_file = {"msg": msg}
+        params = {
+            "address_origin": address_origin,
+            "address_destin": address_destin_dict,
+            "change_address": address_origin,
+            "metadata": build_tx.metadata,
+            "mint": mint_dict,
+            "script_path": script_path,
+            "witness": build_tx.witness,
+        }
+        if plan is not None:
+            try:
+                fees = await run_in_thread(ws.build_raw, plan["inputs"], address_destin_dict,
+                    address_origin, build_tx.metadata, build_tx.witness, plan["ttl"])
+                success_flag = True
+            except ValueError:
+                success_flag = False
+        else:
+            build_response = await run_in_thread(ws.node.build_tx_components, params)
+            if build_response is not None and build_response.split(' ')[-1][:-1].isdigit():
+                fees = int(build_response.split(' ')[-1][:-1])
+                success_flag = True
+
+        tx_id = ""
+        if success_flag:
+            msg = "Transaction build succesfull"
+            cbor_tx_file = ws.read_json('tx.draft')
+            tx_id = await read_tx_id(cbor_tx_file, ws.node.get_txid_body)
+        else:
+            msg = "Problems building the transaction"
+            cbor_tx_file = {"msg": msg}
 
     tx_info = {
         "msg": msg,
@@ -209,8 +449,37 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
         "fees": fees,
         "tx_cborhex": cbor_tx_file
     }
+    if analyze and success_flag:
+        tx_info["tx_analysis"] = analysis(cbor_tx_file)
     return tx_info
 
+@router.post("/feequote", status_code=200,
+                summary="Fee estimation of a simple send",
+                response_description="Fee quote"
+                )
+async def fee_quote(quote: FeeQuote) -> dict:
+    """Estimate fee, inputs and change of sending ADA without building the transaction.
+    It is computed in process from the cached utxos and protocol parameters.\n
+    **address_origin**: address from where to send the ADA in bech32 format.\n
+    **address_destin**: List of addresses in bech32 format to send ADA.\n
+    **amount**: Amount in lovelace.\n
+    **metadata**: Metadata info if specified.\n
+    **witness**: Default 1.\n
+    **coin_selection**: largest_first or random_improve.\n
+    """
+    address_destin_dict = [item.dict() for item in quote.address_destin]
+    protocol_params = await get_protocol_params()
+    plan = await plan_inputs(quote.address_origin, address_destin_dict, quote.metadata,
+        quote.witness, quote.coin_selection, protocol_params)
+    return {
+        "fees": plan["fee"],
+        "inputs": [txplanner.utxo_ref(utxo) for utxo in plan["inputs"]],
+        "total_in": plan["total_in"],
+        "total_out": plan["total_out"],
+        "change": plan["change"],
+        "tx_size": plan["tx_size"],
+    }
+
 @router.post("/signfile", status_code=201, 
                 summary="Sign a transaction file",
                 response_description="Transaction signed"
@@ -218,44 +487,20 @@ async def build_tx(build_tx: BuildTx, db: Session = Depends(get_db)) -> dict:
 
 async def sign_tx_file(signatures: list[str],
                 file: UploadFile= File(...),
-                db: Session = Depends(get_db)) -> dict:
+                analyze: bool = False,
+                db: AsyncSession = Depends(get_db)) -> dict:
     """Sign the draft transaction file with the number of signatures specified. 
-     The wallets must exist in the local DB"""
+     The wallets must exist in the local DB.
+     With **analyze** the response includes the transaction analysis in **tx_analysis**"""
     tx_draft = await file.read()
-    tx_draft = str(tx_draft, 'utf-8')
-    draft_file_name = 'tx.draft'
-    draft_path = node.TRANSACTION_PATH_FILE + '/'
-    path_utils.save_file(draft_path, draft_file_name, tx_draft)
-    sign_file_name_array = []
-    for id in signatures:
-        db_wallet = db.query(dbmodels.Wallet).filter(dbmodels.Wallet.id == id).first()
-        if db_wallet is None:
-            raise HTTPException(status_code=404, detail="Wallet not found")
-        payment_skey = db_wallet.payment_skey
-        sign_file_name = 'temp_' + str(id)
-        sign_path = node.KEYS_FILE_PATH + '/'
-        path_utils.save_metadata(sign_path + sign_file_name + '/', sign_file_name + '.payment.skey', payment_skey)
-        sign_file_name_array.append(sign_file_name)
-    
-    cbor_tx_file = {}
-    sign_response = node.sign_transaction(sign_file_name_array)
-
-    path_utils.remove_file(draft_path, draft_file_name)
-    if sign_response is not None:
-        success_flag = True
-        tx_id = node.get_txid_signed()[:-1]
-        tx_analysis = json.dumps(node.analyze_tx_signed())
-        msg = "Transaction signed"
-        for id in signatures:
-            sign_file_name = 'temp_' + str(id)
-            sign_path = node.KEYS_FILE_PATH + '/'
-            path_utils.remove_folder(sign_path + sign_file_name)
-        cbor_tx_path = draft_path
-        with open(cbor_tx_path + 'tx.signed', 'r') as f:
-            cbor_tx_file = json.load(f)
-        path_utils.remove_file(cbor_tx_path, 'tx.signed')
-    else:
+    try:
+        tx_draft = json.loads(tx_draft)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Problems signing the transaction")
+    skeys = await wallet_skeys(db, signatures)
+    cbor_tx_file, tx_id = await sign_envelope(tx_draft, skeys)
+    success_flag = True
+    msg = "Transaction signed"
 
     tx_info = {
         "msg": msg,
@@ -264,6 +509,8 @@ async def sign_tx_file(signatures: list[str],
         "tx_cborhex": cbor_tx_file
 
     }
+    if analyze:
+        tx_info["tx_analysis"] = analysis(cbor_tx_file)
     return tx_info
 
 @router.post("/sign", status_code=201, 
@@ -273,42 +520,15 @@ async def sign_tx_file(signatures: list[str],
 
 async def sign_tx(signatures: list[str],
                 tx_cborhex: dict,
-                db: Session = Depends(get_db)) -> dict:
+                analyze: bool = False,
+                db: AsyncSession = Depends(get_db)) -> dict:
     """Sign the draft transaction sent in json format with the number of signatures specified. 
-     The wallets must exist in the local DB"""
-    tx_draft = tx_cborhex
-    draft_file_name = 'tx.draft'
-    draft_path = node.TRANSACTION_PATH_FILE + '/'
-    path_utils.save_metadata(draft_path, draft_file_name, tx_draft)
-    sign_file_name_array = []
-    for id in signatures:
-        db_wallet = db.query(dbmodels.Wallet).filter(dbmodels.Wallet.id == id).first()
-        if db_wallet is None:
-            raise HTTPException(status_code=404, detail="Wallet not found")
-        payment_skey = db_wallet.payment_skey
-        sign_file_name = 'temp_' + str(id)
-        sign_path = node.KEYS_FILE_PATH + '/'
-        path_utils.save_metadata(sign_path + sign_file_name + '/', sign_file_name + '.payment.skey', payment_skey)
-        sign_file_name_array.append(sign_file_name)
-    
-    cbor_tx_file = {}
-    sign_response = node.sign_transaction(sign_file_name_array)
-    path_utils.remove_file(draft_path, draft_file_name)
-    if sign_response is not None:
-        success_flag = True
-        tx_id = node.get_txid_signed()[:-1]
-        tx_analysis = json.dumps(node.analyze_tx_signed())
-        msg = "Transaction signed"
-        for id in signatures:
-            sign_file_name = 'temp_' + str(id)
-            sign_path = node.KEYS_FILE_PATH + '/'
-            path_utils.remove_folder(sign_path + sign_file_name)
-        cbor_tx_path = draft_path
-        with open(cbor_tx_path + 'tx.signed', 'r') as f:
-            cbor_tx_file = json.load(f)
-        path_utils.remove_file(cbor_tx_path, 'tx.signed')
-    else:
-        raise HTTPException(status_code=404, detail="Problems signing the transaction")
+     The wallets must exist in the local DB.
+     With **analyze** the response includes the transaction analysis in **tx_analysis**"""
+    skeys = await wallet_skeys(db, signatures)
+    cbor_tx_file, tx_id = await sign_envelope(tx_cborhex, skeys)
+    success_flag = True
+    msg = "Transaction signed"
 
     tx_info = {
         "msg": msg,
@@ -317,6 +537,8 @@ async def sign_tx(signatures: list[str],
         "tx_cborhex": cbor_tx_file
 
     }
+    if analyze:
+        tx_info["tx_analysis"] = analysis(cbor_tx_file)
     return tx_info
 
 
@@ -332,10 +554,14 @@ async def submit_tx_file(file: UploadFile):
 
     tx_signed = await file.read()
     tx_signed = str(tx_signed, 'utf-8')
-    sign_file_name = 'tx.signed'
-    sign_path = node.TRANSACTION_PATH_FILE + '/'
-    path_utils.save_file(sign_path, sign_file_name, tx_signed)
-    submit_response = node.submit_transaction()[:-1]
+    with node_workspace(context.node) as ws:
+        ws.write_text('tx.signed', tx_signed)
+        submit_response = (await run_in_thread(ws.node.submit_transaction))[:-1]
+    try:
+        envelope = json.loads(tx_signed)
+    except ValueError:
+        envelope = None
+    invalidate_transaction(envelope)
     if "Command failed" in submit_response:
         msg = "Problems while building the transaction"
     else:
@@ -357,10 +583,10 @@ async def submit_tx(tx_cborhex: dict):
     **file**: the file needs to be uploaded after signed.\n
     """
     tx_signed = tx_cborhex
-    sign_file_name = 'tx.signed'
-    sign_path = node.TRANSACTION_PATH_FILE + '/'
-    path_utils.save_metadata(sign_path, sign_file_name, tx_signed)
-    submit_response = node.submit_transaction()[:-1]
+    with node_workspace(context.node) as ws:
+        ws.write_json('tx.signed', tx_signed)
+        submit_response = (await run_in_thread(ws.node.submit_transaction))[:-1]
+    invalidate_transaction(tx_signed)
     if "Command failed" in submit_response:
         msg = "Problems while building the transaction"
     else:
@@ -376,135 +602,138 @@ async def submit_tx(tx_cborhex: dict):
                 summary="Mint tokens under specified policyID",
                 response_description="Mint confirmation"
                 )
-async def mint(mint_params: Mint, db: Session = Depends(get_db)) -> dict:
+async def mint(mint_params: Mint, async_mode: bool = False, analyze: bool = False, db: AsyncSession = Depends(get_db)) -> dict:
     """Mint tokens under specified policyID.
     The script must exists in local db. To create a mint script use the mint script endpoint\n
     **script_id**: id of the file stored in local db.\n
     **tokens**: list of tokens to mint with:\n
     **name**: name of the token\n
     **amount**: quantity of tokens to be minted\n
+    **async_mode**: If true, the mint is processed as a background job and the job id is returned. See jobs section.\n
+    **analyze**: If true, the response includes the transaction analysis in **tx_analysis**.\n
     """
-    success_flag = False
-    fees = 0
-    sign_response = None
-    submit_response = None
+    if async_mode:
+        return enqueue_job(mint_job, mint_params.dict(), analyze)
+
     msg = ""
     id = mint_params.wallet_id
     mint = None
-    db_wallet = db.query(dbmodels.Wallet).filter(dbmodels.Wallet.id == id).first()
+    db_wallet = await db.scalar(select(dbmodels.Wallet).where(dbmodels.Wallet.id == id))
     if db_wallet is None:
         raise HTTPException(status_code=404, detail="Wallet not found")
     address_origin = db_wallet.payment_addr
     payment_skey = db_wallet.payment_skey
 
     # (address_origin, payment_vkey) = dblib.get_address_origin('wallet', id)
-    sign_file_name = 'temp_' + id
-    sign_path = node.KEYS_FILE_PATH + '/'
-    sign_file_name = 'temp_' + id
-    path_utils.save_file(sign_path + sign_file_name + '/', sign_file_name + '.payment.skey', payment_skey)
     address_destin = mint_params.address_destin
     address_destin_dict = [item.dict() for item in address_destin]
 
     script_id = mint_params.script_id
     tokens = [item.dict() for item in mint_params.tokens]
 
-    # Check if script exists in db
-    db_script = db.query(dbmodels.Scripts).filter(dbmodels.Scripts.id == script_id).first()
-
-    if db_script is not None:
-        purpose = db_script.purpose
-        if purpose == 'mint':
-            simple_script = db_script.content
-            policyID = db_script.policyID
-
-            # Extract the time rule from the script if any
-            script_field = simple_script.get("scripts", None)
-            validity_interval = None
-            # Asuming a simple script with just one item inside the script field
-            if script_field is not None:
-                for fields in script_field:
-                    print("HOLA", fields)
-                    for k, v in fields.items():
-                        print(k, v)
-                        if v in ["before", "after"]:
-                            type_time = v
-                            slot = fields["slot"]
-                            validity_interval = {"slot": slot, "type": type_time}
-                        else:
-                            msg = "Check validity interval fields"
-                            mint = None
+    protocol_params = await get_protocol_params()
+    with node_workspace(context.node, protocol_params=protocol_params) as ws:
+        # Check if script exists in db
+        db_script = await db.scalar(select(dbmodels.Scripts).where(dbmodels.Scripts.id == script_id))
+
+        if db_script is not None:
+            purpose = db_script.purpose
+            if purpose == 'mint':
+                simple_script = db_script.content
+                policyID = db_script.policyID
+
+                # Extract the time rule from the script if any
+                script_field = simple_script.get("scripts", None)
+                validity_interval = None
+                # Asuming a simple script with just one item inside the script field
+                if script_field is not None:
+                    for fields in script_field:
+                        print("HOLA", fields)
+                        for k, v in fields.items():
+                            print(k, v)
+                            if v in ["before", "after"]:
+                                type_time = v
+                                slot = fields["slot"]
+                                validity_interval = {"slot": slot, "type": type_time}
+                            else:
+                                msg = "Check validity interval fields"
+                                mint = None
             
-                # Create the script file
-                script_name = db_script.name + '.script'
-                script_file_path = node.MINT_FOLDER
-                path_utils.save_metadata(script_file_path, script_name, simple_script)
-                script_file_path = node.MINT_FOLDER + '/' + script_name
-
-                # Build the mint field
-                mint = {
-                    "policyID": policyID,
-                    "policy_path": script_file_path,
-                    "validity_interval": validity_interval,
-                    "tokens": tokens
-                }
-            else:
-                msg = "Could not find script for minting"
+                    # Create the script file
+                    script_name = db_script.name + '.script'
+                    script_file_path = ws.node.MINT_FOLDER
+                    path_utils.save_metadata(script_file_path, script_name, simple_script)
+                    script_file_path = ws.node.MINT_FOLDER + '/' + script_name
+
+                    # Build the mint field
+                    mint = {
+                        "policyID": policyID,
+                        "policy_path": script_file_path,
+                        "validity_interval": validity_interval,
+                        "tokens": tokens
+                    }
+                else:
+                    msg = "Could not find script for minting"
             
+            else:
+                # TODO: Make transaction for multisig option
+                msg = "Script purpose is not for minting"
         else:
-            # TODO: Make transaction for multisig option
-            msg = "Script purpose is not for minting"
-    else:
-        msg = "Could not find script for minting"
-
-
-    params = {
-        "address_origin": address_origin,
-        "address_destin": address_destin_dict,
-        "change_address": address_origin,
-        "metadata": mint_params.metadata,
-        "mint": mint,
-        "script_path": None,
-        "witness": mint_params.witness,
-    }
-    build_response = node.build_tx_components(params)
-    tx_id = node.get_txid_body()
-
-    if build_response is not None:
-        success_flag = True
-        fees = build_response.split(' ')[-1][:-1]
-        sign_response = node.sign_transaction([sign_file_name])
-        if sign_response is not None:
-            tx_id = node.get_txid_signed()[:-1]
-            tx_analysis = json.dumps(node.analyze_tx_signed())
-            submit_response = node.submit_transaction()
-            msg = "Transaction signed and submit"
-            # Remove temp files
-            path_utils.remove_folder(sign_path + sign_file_name)
-            cbor_tx_path = base.Starter(config_path).TRANSACTION_PATH_FILE + '/tx.signed'
-            with open(cbor_tx_path, 'r') as file:
-                cbor_tx_file = json.load(file)
-        else:
-            raise HTTPException(status_code=404, detail="Problems signing the transaction")
-    else:
-        raise HTTPException(status_code=404, detail="Problems building the transaction")
+            msg = "Could not find script for minting"
+
+
+        params = {
+            "address_origin": address_origin,
+            "address_destin": address_destin_dict,
+            "change_address": address_origin,
+            "metadata": mint_params.metadata,
+            "mint": mint,
+            "script_path": None,
+            "witness": mint_params.witness,
+        }
+        tx_result = await send_transaction(ws, params, payment_skey)
     
-    # Check if transaction is already stored in db
-    db_transaction = db.query(dbmodels.Transactions).filter(dbmodels.Transactions.tx_id == tx_id).first()
+    return transaction_record(await store_transaction(db,
+        id_wallet = id,
+        address_origin = params["address_origin"],
+        address_destin = str(params["address_destin"]),
+        tx_cborhex = tx_result["tx_cborhex"],
+        metadata_info = params["metadata"],
+        fees = tx_result["fees"],
+        network = context.node.CARDANO_NETWORK,
+        status = submitted_status(tx_result["submit"]),
+        tx_id = tx_result["tx_id"]
+    ), analyze)
+
+
+@router.get("/stored/{tx_id}",
+                summary="Transaction stored in local database",
+                response_description="Transaction with its cardano-cli envelope",
+                response_model=TransactionRecord
+                )
+async def get_stored_transaction(tx_id: str, analyze: bool = False, db: AsyncSession = Depends(get_db)):
+    """Stored transaction by id, with the signed transaction as a cardano-cli JSON envelope in **tx_cborhex**
+    and, with **analyze**, its inputs, outputs, fee and witnesses in **tx_analysis**"""
+    db_transaction = await db.scalar(select(dbmodels.Transactions)
+        .options(undefer(dbmodels.Transactions.tx_cbor), undefer(dbmodels.Transactions.tx_cborhex))
+        .where(dbmodels.Transactions.tx_id == tx_id))
     if db_transaction is None:
-        db_transaction = dbmodels.Transactions(
-            id_wallet = id,
-            address_origin = params["address_origin"],
-            address_destin = str(params["address_destin"]),
-            tx_cborhex = cbor_tx_file,
-            metadata_info = params["metadata"],
-            fees = fees,
-            network = base.Starter(config_path).CARDANO_NETWORK,
-            processed = success_flag,
-            tx_id = tx_id
-        )
-        db.add(db_transaction)
-        db.commit()
-        db.refresh(db_transaction)
-    else:
-        raise HTTPException(status_code=404, detail="Transaction id already exists in database")
-    return db_transaction
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return transaction_record(db_transaction, analyze)
+
+
+##################################################################
+# Background jobs
+##################################################################
+
+@celery.task(name="transactions.simple_send")
+def simple_send_job(send_params: dict, analyze: bool = False) -> dict:
+    return run_job(simple_send, SimpleSend(**send_params), False, analyze)
+
+@celery.task(name="transactions.build_tx")
+def build_tx_job(build_params: dict, analyze: bool = False) -> dict:
+    return run_job(build_tx, BuildTx(**build_params), False, analyze)
+
+@celery.task(name="transactions.mint")
+def mint_job(mint_params: dict, analyze: bool = False) -> dict:
+    return run_job(mint, Mint(**mint_params), False, analyze)
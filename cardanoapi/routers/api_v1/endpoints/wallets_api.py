@@ -0,0 +1,52 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import UUID4
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dblib import get_db
+from db.models import dbmodels
+from db.pagination import between, paginate
+from db.rollups import wallet_totals
+from routers.api_v1.endpoints import pydantic_schemas
+
+router = APIRouter()
+
+
+async def check_wallet(db: AsyncSession, id: UUID4) -> None:
+    if await db.scalar(select(dbmodels.Wallet.id).where(dbmodels.Wallet.id == id)) is None:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+@router.get("/{id}/transactions",
+        summary="Transaction history of a wallet",
+        response_description="Transactions of the wallet, newest first",
+        response_model=List[pydantic_schemas.TransactionInfo])
+async def get_wallet_transactions(id: UUID4, response: Response, cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000), network: Optional[str] = None, processed: Optional[bool] = None,
+        since: Optional[datetime] = None, until: Optional[datetime] = None, db: AsyncSession = Depends(get_db)):
+    """Transactions by submission time, newest first.\n
+    Pass the X-Next-Cursor header of a response as **cursor** to get the next page.
+    **since** and **until** bound the submission time.
+    """
+    await check_wallet(db, id)
+    transactions = dbmodels.Transactions
+    statement = between(select(transactions).where(transactions.id_wallet == id), transactions.submission, since, until)
+    if network is not None:
+        statement = statement.where(transactions.network == network)
+    if processed is not None:
+        statement = statement.where(transactions.processed == processed)
+    return await paginate(response, db, statement, [transactions.submission, transactions.id], cursor, limit)
+
+@router.get("/{id}/transactions/totals",
+        summary="Transactions count and fees of a wallet per period",
+        response_description="Totals per period, newest first",
+        response_model=List[pydantic_schemas.WalletTotals])
+async def get_wallet_totals(id: UUID4, period: pydantic_schemas.TotalsPeriod = pydantic_schemas.TotalsPeriod.month,
+        since: Optional[date] = None, until: Optional[date] = None, db: AsyncSession = Depends(get_db)):
+    """Count and total fees (lovelace) of the stored transactions of the wallet per **period**:
+    day, week, month or year, by UTC submission day. **since** and **until** bound the days.
+    """
+    await check_wallet(db, id)
+    return await wallet_totals(db, id, period.value, since, until)
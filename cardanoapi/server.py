@@ -1,13 +1,17 @@
 
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from db.models import dbmodels
-from db.dblib import engine
+from db.dblib import dispose_engine
 
 from routers.api_v1.api import api_router
 from core.config import settings
+from core.executor import shutdown_executors
+from core.context import context
+from core.confirmations import confirmation_tracker
+from core.walletpool import wallet_pool
+from routers.api_v1.endpoints.stream_api import event_hub
 
-from celery import Celery
+from core.celery_app import celery
 
 database_flag = 'postgresql' # Other option could be dynamodb
 
@@ -19,8 +23,6 @@ contact = {
     "TickerPool": "MoxiePool"
 }
 
-dbmodels.Base.metadata.create_all(bind=engine)
-
 cardanodatos = FastAPI(
         title=title, 
         description=description, 
@@ -38,11 +40,6 @@ cardanodatos.add_middleware(
     allow_headers=['*']
 )
 
-celery = Celery(
-    __name__,
-    broker="redis://127.0.0.1:6379/0",
-    backend="redis://127.0.0.1:6379/0"
-)
 
 #Simulate long task
 @celery.task
@@ -59,6 +56,22 @@ def divide(x, y):
 async def root():
     return {"message": "CardanoPythonLib Api"}
 
+@cardanodatos.on_event("startup")
+async def startup():
+    # The schema is created and upgraded by alembic (alembic upgrade head)
+    context.load()
+    if settings.CONFIRMATION_TRACKER:
+        confirmation_tracker.start()
+    wallet_pool.start()
+
+@cardanodatos.on_event("shutdown")
+async def shutdown():
+    await event_hub.stop()
+    await confirmation_tracker.stop()
+    await wallet_pool.stop()
+    shutdown_executors()
+    await dispose_engine()
+
 cardanodatos.include_router(root_router)
 cardanodatos.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -0,0 +1,39 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The application modules import each other from the cardanoapi folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cardanoapi"))
+# Settings refuse to load without a JWT key
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# Jobs run in process, results kept in memory
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+
+
+@pytest.fixture
+def database():
+    """Session factory on an empty schema of the TEST_DATABASE_URL postgres
+    database (e.g. postgresql+asyncpg://postgres@localhost/cardanoapi_test).
+    Every table is dropped and created again: never point it to real data"""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+    from db.models import dbmodels
+
+    # NullPool: each test runs its own event loop
+    engine = create_async_engine(url, poolclass=NullPool)
+
+    async def reset():
+        async with engine.begin() as connection:
+            await connection.run_sync(dbmodels.Base.metadata.drop_all)
+            await connection.run_sync(dbmodels.Base.metadata.create_all)
+
+    asyncio.run(reset())
+    yield sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+from routers.api_v1.endpoints import blockchain_api
+from routers.api_v1.endpoints.pydantic_schemas import AddressQuery, NodeCommandName
+
+WALLET_ID = uuid.UUID("6b1c2f7e-3d1a-4e5b-9c8d-0a1b2c3d4e5f")
+ADDRESS = "addr_test1vrcvs7eq2rp9wk3ad0mxsq8xj6kr55nyg7pk3w7xzfnxkqs6h4cwd"
+
+
+class FakeNode:
+    CARDANO_CLI_PATH = "cardano-cli"
+    CARDANO_NETWORK = "testnet"
+    CARDANO_NETWORK_MAGIC = 1097911063
+
+    def __init__(self):
+        self.commands = []
+
+    def execute_command(self, command, _input):
+        self.commands.append(command)
+        return json.dumps({"ab" * 32 + "#1": {"address": ADDRESS, "value": {"lovelace": 5000000}}})
+
+
+def test_query_utxos_batch(monkeypatch):
+    node = FakeNode()
+    monkeypatch.setattr(blockchain_api.context, "_node", node)
+    utxos = blockchain_api.query_utxos_batch([ADDRESS])
+    assert utxos == {ADDRESS: [{"hash": "ab" * 32, "id": "1",
+        "amounts": [{"token": "lovelace", "amount": "5000000"}]}]}
+    # Every argument of the command line is a string
+    assert node.commands[0][node.commands[0].index("--testnet-magic") + 1] == "1097911063"
+
+
+class FakeSession:
+    def __init__(self, wallets):
+        self.wallets = wallets
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        ids = statement.whereclause.right.value
+        return SimpleNamespace(all=lambda: [(id, self.wallets[id]) for id in ids if id in self.wallets])
+
+
+def test_wallet_ids_in_any_spelling(monkeypatch):
+    async def get_utxos_bulk(addresses):
+        return {address: ([], False) for address in addresses}
+
+    monkeypatch.setattr(blockchain_api, "get_utxos_bulk", get_utxos_bulk)
+    db = FakeSession({WALLET_ID: ADDRESS})
+    wallet_ids = [str(WALLET_ID).upper(), WALLET_ID.hex, "not-a-uuid", str(uuid.uuid4())]
+    results = asyncio.run(blockchain_api.cardano_addresses(AddressQuery(wallet_ids=wallet_ids),
+        NodeCommandName.utxos, db=db))
+    assert [result.get("address") for result in results] == [ADDRESS, ADDRESS, None, None]
+    assert [result["wallet_id"] for result in results] == wallet_ids
+    assert results[2]["error"] == results[3]["error"] == "Wallet not found"
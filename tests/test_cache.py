@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from core import cache
+from core.cache import TTLCache
+
+
+class Loader:
+    """Loader that waits for `release` and counts its calls"""
+
+    def __init__(self, value="value", error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def test_concurrent_misses_load_once():
+    async def run():
+        tip_cache = TTLCache(ttl=60)
+        loader = Loader()
+        tasks = [asyncio.create_task(tip_cache.get_or_load("tip", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.gather(*tasks)
+        assert results == [("value", False)] * 5
+        assert loader.calls == 1
+        assert tip_cache.stats() == {"size": 1, "hits": 0, "misses": 1, "coalesced": 4}
+        assert await tip_cache.get_or_load("tip", loader) == ("value", True)
+        assert loader.calls == 1
+
+    asyncio.run(run())
+
+
+def test_loader_error_reaches_every_caller_and_is_not_cached():
+    async def run():
+        tip_cache = TTLCache(ttl=60)
+        loader = Loader(error=RuntimeError("node down"))
+        tasks = [asyncio.create_task(tip_cache.get_or_load("tip", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert [str(result) for result in results] == ["node down"] * 3
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert loader.calls == 1
+        assert tip_cache.get("tip") is None
+        loader.error = None
+        assert await tip_cache.get_or_load("tip", loader) == ("value", False)
+        assert loader.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_loader_does_not_hang_the_waiters():
+    async def run():
+        tip_cache = TTLCache(ttl=60)
+        loader = Loader()
+        first = asyncio.create_task(tip_cache.get_or_load("tip", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(tip_cache.get_or_load("tip", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+        results = await asyncio.wait_for(asyncio.gather(*waiters), timeout=5)
+        assert [value for value, _ in results] == ["value"] * 3
+        assert first.cancelled()
+        # One of the waiters loaded again
+        assert loader.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_load_running():
+    async def run():
+        tip_cache = TTLCache(ttl=60)
+        loader = Loader()
+        first = asyncio.create_task(tip_cache.get_or_load("tip", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(tip_cache.get_or_load("tip", loader))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        loader.release.set()
+        assert await first == ("value", False)
+        assert waiter.cancelled()
+        assert loader.calls == 1
+
+    asyncio.run(run())
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    tip_cache = TTLCache(ttl=10)
+    tip_cache.set("tip", 1)
+    tip_cache.set("params", 2, ttl=30)
+    now[0] += 10
+    assert tip_cache.get("tip") == 1
+    now[0] += 1
+    assert tip_cache.get("tip") is None
+    assert tip_cache.get("params") == 2
+    now[0] += 20
+    assert tip_cache.get("params") is None
+    assert tip_cache.stats()["size"] == 0
+
+
+def test_least_recently_used_evicted_at_maxsize():
+    utxo_cache = TTLCache(ttl=60, maxsize=2)
+    utxo_cache.set("a", 1)
+    utxo_cache.set("b", 2)
+    assert utxo_cache.get("a") == 1
+    utxo_cache.set("c", 3)
+    assert utxo_cache.get("b") is None
+    assert (utxo_cache.get("a"), utxo_cache.get("c")) == (1, 3)
+    utxo_cache.set("d", 4)
+    assert utxo_cache.get("a") is None
+    assert utxo_cache.stats()["size"] == 2
+
+
+@pytest.mark.parametrize("maxsize", [0, 2])
+def test_invalidate_where(maxsize):
+    utxo_cache = TTLCache(ttl=60, maxsize=maxsize)
+    utxo_cache.set("a", [1, 2])
+    utxo_cache.set("b", [3])
+    utxo_cache.invalidate_where(lambda value: 2 in value)
+    assert utxo_cache.get("a") is None
+    assert utxo_cache.get("b") == [3]
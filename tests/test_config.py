@@ -0,0 +1,21 @@
+import pydantic
+import pytest
+
+from core.config import Settings
+
+
+def test_secret_key_is_required(monkeypatch):
+    monkeypatch.delenv("SECRET_KEY")
+    with pytest.raises(pydantic.ValidationError):
+        Settings()
+
+
+def test_empty_secret_key_is_refused(monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "  ")
+    with pytest.raises(pydantic.ValidationError):
+        Settings()
+
+
+def test_secret_key_from_environment(monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "s3cret")
+    assert Settings().SECRET_KEY == "s3cret"
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from core import cbor, txstorage
+from core.confirmations import (CONFIRMED, EXPIRED, FINAL, SUBMITTED, UNKNOWN,
+    ConfirmationTracker, MemoryChainSource, NodeChainSource)
+from db.models import dbmodels
+
+ADDRESS = bytes.fromhex("60" + "11" * 28)
+
+
+def transaction(inputs, outputs=2, ttl=None):
+    """Signed transaction envelope spending `inputs` ("tx_id#index")"""
+    body = {
+        0: [[bytes.fromhex(tx_in.split("#")[0]), int(tx_in.split("#")[1])] for tx_in in inputs],
+        1: [[ADDRESS, 2000000] for _ in range(outputs)],
+        2: 170000,
+    }
+    if ttl is not None:
+        body[3] = ttl
+    raw_body = cbor.encode(body)
+    tx = cbor.head(cbor.ARRAY, 4) + raw_body + cbor.encode({}) + cbor.encode(True) + cbor.encode(None)
+    tx_id = hashlib.blake2b(raw_body, digest_size=32).hexdigest()
+    return tx_id, {"type": "Witnessed Tx BabbageEra", "description": "", "cborHex": tx.hex()}
+
+
+def tx_in(seed: int) -> str:
+    return f"{seed:064x}#0"
+
+
+async def store(sessions, envelope, tx_id, ttl=None, submission=None):
+    async with sessions() as db:
+        db.add(dbmodels.Transactions(tx_id=tx_id, status=SUBMITTED, processed=False, ttl=ttl,
+            submission=submission or datetime.utcnow(), **txstorage.storage_fields(envelope)))
+        await db.commit()
+
+
+async def statuses(sessions) -> dict:
+    transactions = dbmodels.Transactions
+    async with sessions() as db:
+        rows = await db.execute(select(transactions.tx_id, transactions.status, transactions.processed,
+            transactions.confirmed_slot, transactions.confirmed_block, transactions.depth))
+        return {row.tx_id: row[1:] for row in rows}
+
+
+def test_confirmed_with_inclusion_block_then_final(database):
+    async def run():
+        chain = MemoryChainSource(slot=1000, block=50)
+        tracker = ConfirmationTracker(chain, database, depth=3, timeout=3600)
+        tx_id, envelope = transaction([tx_in(1)])
+        await store(database, envelope, tx_id)
+        assert (await tracker.tick())["confirmed"] == 0
+        chain.add_block([tx_id], inputs={tx_id: [tx_in(1)]})
+        chain.add_block()
+        assert (await tracker.tick())["confirmed"] == 1
+        # Slot and block of the block that included it, not of the tip
+        assert (await statuses(database))[tx_id] == (CONFIRMED, True, 1020, 51, 1)
+        chain.add_block()
+        chain.add_block()
+        assert (await tracker.tick())["final"] == 1
+        assert (await statuses(database))[tx_id] == (FINAL, True, 1020, 51, 3)
+    asyncio.run(run())
+
+
+def test_late_transactions_expire_only_with_an_unspent_input(database):
+    async def run():
+        chain = MemoryChainSource(slot=1000, block=50)
+        tracker = ConfirmationTracker(chain, database, timeout=60)
+        dropped_id, dropped = transaction([tx_in(1)], ttl=1010)
+        # Its input went to another transaction and it was never seen
+        replaced_id, replaced = transaction([tx_in(2)], ttl=1010)
+        pending_id, pending = transaction([tx_in(3)], ttl=5000)
+        # Without TTL, the timeout applies
+        old_id, old = transaction([tx_in(4)])
+        await store(database, dropped, dropped_id, ttl=1010)
+        await store(database, replaced, replaced_id, ttl=1010)
+        await store(database, pending, pending_id, ttl=5000)
+        await store(database, old, old_id, submission=datetime.utcnow() - timedelta(seconds=120))
+        chain.spend([tx_in(2)])
+        chain.add_block()
+        counts = await tracker.tick()
+        assert counts["expired"] == 2 and counts["unknown"] == 1
+        result = await statuses(database)
+        assert result[dropped_id][:2] == (EXPIRED, False)
+        assert result[old_id][:2] == (EXPIRED, False)
+        assert result[replaced_id][0] == UNKNOWN
+        assert result[pending_id][0] == SUBMITTED
+        # Expired and unknown transactions are not checked again
+        assert (await tracker.tick())["checked"] == 1
+    asyncio.run(run())
+
+
+class FakeNode:
+    CARDANO_CLI_PATH = "cardano-cli"
+    CARDANO_NETWORK = "testnet"
+    CARDANO_NETWORK_MAGIC = 1097911063
+
+    def __init__(self, utxos):
+        self.utxos = utxos
+        self.commands = []
+
+    def execute_command(self, command, _input):
+        self.commands.append(command)
+        tx_ins = [command[i + 1] for i, arg in enumerate(command) if arg == "--tx-in"]
+        return "{" + ", ".join(f'"{tx_in}": {{}}' for tx_in in tx_ins if tx_in in self.utxos) + "}"
+
+
+class FakeContext:
+    def __init__(self, node):
+        self.node = node
+
+
+def test_node_source_finds_a_transaction_by_its_change():
+    tx_id = "ab" * 32
+    # The recipient already spent output 0, the change (output 1) is still there
+    node = FakeNode({f"{tx_id}#1"})
+    source = NodeChainSource(FakeContext(node))
+    tip = {"slot": 1200, "block": 60}
+    assert asyncio.run(source.locate([tx_id], tip, {tx_id: 2})) == {tx_id: (1200, 60)}
+    assert asyncio.run(source.locate([tx_id], tip)) == {}
+    assert node.commands[0][node.commands[0].index("--testnet-magic") + 1] == "1097911063"
+
+
+def test_node_source_unspent_inputs():
+    node = FakeNode({tx_in(1)})
+    source = NodeChainSource(FakeContext(node))
+    assert asyncio.run(source.unspent([tx_in(1), tx_in(2)])) == {tx_in(1)}
+    assert asyncio.run(source.unspent([])) == set()
+    assert len(node.commands) == 1
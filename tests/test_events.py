@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+from core.events import EventHub
+from routers.api_v1.endpoints import stream_api
+
+ADDRESS = "addr_test1vrcvs7eq2rp9wk3ad0mxsq8xj6kr55nyg7pk3w7xzfnxkqs6h4cwd"
+OTHER_ADDRESS = "addr_test1vqothermmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmmm"
+TX_ID = "aa" * 32
+
+
+class Chain:
+    """Event sources counting their queries"""
+
+    def __init__(self):
+        self.block = 10
+        self.states = {TX_ID: {"status": "submitted"}}
+        self.utxos = {ADDRESS: [], OTHER_ADDRESS: []}
+        self.queries = {"tip": 0, "tx_states": 0, "address_utxos": 0}
+
+    async def tip(self):
+        self.queries["tip"] += 1
+        return {"slot": self.block * 20, "block": self.block}
+
+    async def tx_states(self, tx_ids):
+        self.queries["tx_states"] += 1
+        return {tx_id: dict(self.states[tx_id]) for tx_id in tx_ids if tx_id in self.states}
+
+    async def address_utxos(self, addresses):
+        self.queries["address_utxos"] += 1
+        return {address: list(self.utxos[address]) for address in addresses}
+
+    def hub(self, **kwargs):
+        kwargs.setdefault("interval", 3600)
+        return EventHub(self.tip, self.tx_states, self.address_utxos, **kwargs)
+
+
+def drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_one_poller_for_every_subscriber():
+    async def run():
+        chain = Chain()
+        hub = chain.hub()
+        subscriptions = [hub.open([TX_ID], [ADDRESS]) for _ in range(20)]
+        task = hub._task
+        await settle()
+        assert hub._task is task
+        # One query of each source for all the clients
+        assert chain.queries == {"tip": 1, "tx_states": 1, "address_utxos": 1}
+        for subscription in subscriptions:
+            assert [event["event"] for event in drain(subscription)] == ["tip", "tx", "address"]
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_subscribers_only_get_their_events():
+    async def run():
+        chain = Chain()
+        hub = chain.hub()
+        tx_subscription = hub.open(tx_ids=[TX_ID])
+        address_subscription = hub.open(addresses=[ADDRESS])
+        await settle()
+        assert [event["event"] for event in drain(tx_subscription)] == ["tip", "tx"]
+        assert [event["event"] for event in drain(address_subscription)] == ["tip", "address"]
+
+        chain.block += 1
+        chain.states[TX_ID] = {"status": "confirmed"}
+        chain.utxos[ADDRESS] = [{"hash": "bb" * 32, "id": "0"}]
+        chain.utxos[OTHER_ADDRESS] = [{"hash": "cc" * 32, "id": "0"}]
+        await hub.poll()
+        assert drain(tx_subscription) == [{"event": "tip", "slot": 220, "block": 11},
+            {"event": "tx", "tx_id": TX_ID, "status": "confirmed"}]
+        assert drain(address_subscription) == [{"event": "tip", "slot": 220, "block": 11},
+            {"event": "address", "address": ADDRESS, "utxos": chain.utxos[ADDRESS]}]
+
+        # Nothing changed: no events
+        await hub.poll()
+        assert drain(tx_subscription) == drain(address_subscription) == []
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_is_dropped():
+    async def run():
+        chain = Chain()
+        hub = chain.hub(queue_size=3)
+        slow = hub.open()
+        fast = hub.open()
+        for _ in range(5):
+            await hub.poll()
+            drain(fast)
+            chain.block += 1
+        # The queue never holds more than queue_size events
+        assert slow.closed and slow.dropped
+        assert slow.queue.qsize() <= 3
+        assert await slow.get() is None
+        assert not fast.closed
+        assert hub.stats()["dropped"] == 1
+        assert hub.stats()["subscribers"] == 1
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_poller_stops_when_the_last_subscriber_leaves():
+    async def run():
+        chain = Chain()
+        hub = chain.hub()
+        first = hub.open([TX_ID], [ADDRESS])
+        second = hub.open([TX_ID])
+        await settle()
+        task = hub._task
+        first.close()
+        await settle()
+        assert hub.stats()["running"]
+        assert hub.stats()["addresses"] == 0
+        second.close()
+        # Without waiting for the poll interval
+        await asyncio.wait_for(task, timeout=1)
+        assert hub.stats() == {"running": False, "subscribers": 0, "tx_ids": 0, "addresses": 0,
+            "polls": 1, "dropped": 0, "last_error": None}
+        assert chain.queries["tip"] == 1
+
+    asyncio.run(run())
+
+
+def test_sse_disconnect_closes_the_subscription(monkeypatch):
+    async def run():
+        chain = Chain()
+        hub = chain.hub()
+        monkeypatch.setattr(stream_api, "event_hub", hub)
+        response = await stream_api.stream_events(tx_id=[TX_ID], address=[])
+        body = response.body_iterator
+        first = await body.__anext__()
+        assert first.startswith("event: tip\n")
+        assert json.loads((await body.__anext__()).split("data: ")[1]) == {
+            "event": "tx", "tx_id": TX_ID, "status": "submitted"}
+        task = hub._task
+        assert hub.stats()["subscribers"] == 1
+        # The client went away
+        await body.aclose()
+        assert hub.stats()["subscribers"] == 0
+        await asyncio.wait_for(task, timeout=1)
+        assert not hub.stats()["running"]
+
+    asyncio.run(run())
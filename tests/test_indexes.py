@@ -0,0 +1,30 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+WALLET_ID = str(uuid.uuid4())
+
+# Lookups of the API, each with the index it must use
+LOOKUPS = [
+    ("SELECT * FROM transactions WHERE tx_id = 'abc'", "transactions_tx_id_key"),
+    ("SELECT * FROM transactions WHERE id_wallet = :wallet ORDER BY submission DESC, id DESC LIMIT 50",
+        "ix_transactions_id_wallet_submission"),
+    ("SELECT * FROM transactions WHERE batch_id = :wallet", "ix_transactions_batch_id"),
+    ("SELECT * FROM users WHERE username = 'user'", "users_username_key"),
+    ("SELECT * FROM users WHERE id_wallet = :wallet", "ix_users_id_wallet"),
+    ('SELECT * FROM scripts WHERE "policyID" = \'abc\'', "scripts_policyID_key"),
+]
+
+
+@pytest.mark.parametrize("query, index", LOOKUPS)
+def test_lookup_uses_index(database, query, index):
+    async def plan():
+        async with database() as db:
+            # The tables are empty: make any usable index cheaper than a
+            # sequential scan, as it is on tables of real size
+            await db.execute(text("SET enable_seqscan = off"))
+            rows = await db.execute(text("EXPLAIN " + query), {"wallet": WALLET_ID} if ":wallet" in query else {})
+            return "\n".join(row[0] for row in rows)
+    assert index in asyncio.run(plan())
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from core import celery_app, txstorage
+from db.models import dbmodels
+from routers.api_v1.endpoints import jobs_api, keys_api, transactions_api
+from routers.api_v1.endpoints.pydantic_schemas import KeyCreate, SimpleSend
+
+WALLET_ID = "6b1c2f7e-3d1a-4e5b-9c8d-0a1b2c3d4e5f"
+SIGNED = {"type": "Witnessed Tx BabbageEra", "description": "", "cborHex": "84a0a0f5f6"}
+
+
+class FakeSession:
+    """Session of the jobs: no wallet is stored, writes are dropped"""
+
+    def __init__(self, wallet=None):
+        self.wallet = wallet
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def scalar(self, _statement):
+        return self.wallet
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def job_session(monkeypatch):
+    def use(wallet=None):
+        monkeypatch.setattr(celery_app, "_job_sessions", lambda: FakeSession(wallet))
+    return use
+
+
+def run_and_poll(request) -> dict:
+    async def run():
+        response = await request
+        assert response.status_code == 202
+        return await jobs_api.get_job(json.loads(response.body)["job_id"])
+    return asyncio.run(run())
+
+
+def test_create_keys_job(monkeypatch, job_session):
+    job_session()
+    derived = {"payment_addr": "addr_test1payment", "mnemonic": ["word"] * 24}
+
+    @contextmanager
+    def workspace(_keys):
+        yield SimpleNamespace(node=SimpleNamespace(deriveAllKeys=lambda name, size, save_flag: derived))
+
+    monkeypatch.setattr(keys_api.context, "_keys", SimpleNamespace())
+    monkeypatch.setattr(keys_api, "node_workspace", workspace)
+
+    job = run_and_poll(keys_api.create_keys(KeyCreate(name="wallet", save_flag=False), async_mode=True))
+
+    assert job["status"] == "SUCCESS"
+    assert job["result"]["payment_addr"] == "addr_test1payment"
+    assert job["result"]["mnemonic"] == ["word"] * 24
+
+
+def test_simple_send_job(monkeypatch, job_session):
+    job_session(SimpleNamespace(payment_addr="addr_test1origin", payment_skey={}))
+
+    async def get_protocol_params():
+        return {}
+
+    async def plan_inputs(*args, **kwargs):
+        return {"inputs": [], "ttl": 5000}
+
+    async def send_transaction(_ws, params, _skey, _plan):
+        return {"tx_id": "ab" * 32, "fees": 170000, "submit": "Transaction successfully submitted.",
+            "tx_cborhex": SIGNED}
+
+    async def store_transaction(_db, tx_cborhex=None, **fields):
+        return dbmodels.Transactions(id=1, submission=datetime.utcnow(), processed=False,
+            **txstorage.storage_fields(tx_cborhex), **fields)
+
+    monkeypatch.setattr(transactions_api.context, "_node", SimpleNamespace(CARDANO_NETWORK="testnet"))
+    monkeypatch.setattr(transactions_api, "node_workspace", lambda *args, **kwargs: nullcontext())
+    monkeypatch.setattr(transactions_api, "get_protocol_params", get_protocol_params)
+    monkeypatch.setattr(transactions_api, "plan_inputs", plan_inputs)
+    monkeypatch.setattr(transactions_api, "send_transaction", send_transaction)
+    monkeypatch.setattr(transactions_api, "store_transaction", store_transaction)
+    send_params = SimpleSend(wallet_id=WALLET_ID, address_destin=[{"address": "addr_test1destin", "amount": 2000000}])
+
+    job = run_and_poll(transactions_api.simple_send(send_params, async_mode=True))
+
+    assert job["status"] == "SUCCESS"
+    assert job["result"]["tx_id"] == "ab" * 32
+    assert job["result"]["status"] == "submitted"
+    assert job["result"]["tx_cborhex"] == SIGNED
+
+
+def test_failed_job_keeps_the_endpoint_error(monkeypatch, job_session):
+    job_session()
+    # Celery logs the failure with its traceback, which billiard < 4.1 can't
+    # format on python 3.11 (and the pytest log handler raises it)
+    monkeypatch.setattr(logging.getLogger("celery.app.trace"), "disabled", True)
+    send_params = SimpleSend(wallet_id=WALLET_ID, address_destin=[{"address": "addr_test1destin", "amount": 2000000}])
+
+    job = run_and_poll(transactions_api.simple_send(send_params, async_mode=True))
+
+    assert job["status"] == "FAILURE"
+    assert job["result"] == {"status_code": 404, "detail": "Wallet not found"}
+
+
+def test_unknown_job_is_pending():
+    job = asyncio.run(jobs_api.get_job("00000000-0000-0000-0000-000000000000"))
+    assert job == {"job_id": "00000000-0000-0000-0000-000000000000", "status": "PENDING", "result": None}
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from db.models import dbmodels
+
+ALEMBIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cardanoapi", "alembic")
+
+
+@pytest.fixture
+def empty_database(monkeypatch, tmp_path):
+    """psycopg2 engine on the TEST_DATABASE_URL database with every table
+    dropped, and a config.ini for alembic/env.py in the working directory"""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    url = make_url(url).set(drivername="postgresql+psycopg2")
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        dbmodels.Base.metadata.drop_all(connection)
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        connection.execute(text("DROP TYPE IF EXISTS scriptpurpose"))
+    # env.py builds its URL from config.ini, a unix socket goes through PGHOST
+    if url.query.get("host"):
+        monkeypatch.setenv("PGHOST", url.query["host"])
+    (tmp_path / "config.ini").write_text(
+        f"[postgresql]\nhost={url.host or ''}\nport={url.port or 5432}\nuser={url.username}\n"
+        f"password={url.password or ''}\ndatabase={url.database}\n")
+    monkeypatch.chdir(tmp_path)
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_head_creates_the_models(empty_database):
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC)
+    command.upgrade(config, "head")
+    with empty_database.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), dbmodels.Base.metadata) == []
+    command.downgrade(config, "base")
+    with empty_database.connect() as connection:
+        assert connection.scalar(text("SELECT count(*) FROM pg_tables WHERE schemaname = 'public'"
+            " AND tablename <> 'alembic_version'")) == 0
@@ -0,0 +1,200 @@
+import asyncio
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+
+from core import cbor, multisig, native_scripts, signing, txview
+from db.models import dbmodels
+from routers.api_v1.endpoints import multisig_api
+from routers.api_v1.endpoints.pydantic_schemas import MultisigCreate, MultisigSign
+
+ADDRESS = bytes.fromhex("60" + "11" * 28)
+
+
+def skey(seed: int) -> dict:
+    return {"type": "PaymentSigningKeyShelley_ed25519", "description": "",
+        "cborHex": "5820" + (bytes([seed]) * 32).hex()}
+
+
+KEYS = [skey(seed) for seed in (1, 2, 3)]
+HASHES = [multisig.key_hash(signing.sign(key, b"")[0]) for key in KEYS]
+SCRIPTS = {
+    "all": {"type": "all", "scripts": [{"type": "sig", "keyHash": key_hash} for key_hash in HASHES]},
+    "any": {"type": "any", "scripts": [{"type": "sig", "keyHash": key_hash} for key_hash in HASHES]},
+    "atLeast": {"type": "atLeast", "required": 2,
+        "scripts": [{"type": "sig", "keyHash": key_hash} for key_hash in HASHES]},
+}
+THRESHOLDS = {"all": 3, "any": 1, "atLeast": 2}
+
+
+def draft(fee: int = 170000) -> dict:
+    body = cbor.encode({0: [[b"\x11" * 32, 0]], 1: [[ADDRESS, 2000000]], 2: fee})
+    tx = cbor.head(cbor.ARRAY, 4) + body + cbor.encode({}) + cbor.encode(True) + cbor.encode(None)
+    return {"type": "Unwitnessed Tx BabbageEra", "description": "", "cborHex": tx.hex()}
+
+
+def witness(tx_id: str, key: dict) -> bytes:
+    return cbor.encode(list(signing.sign(key, bytes.fromhex(tx_id))))
+
+
+def witness_file(tx_id: str, key: dict) -> dict:
+    """What cardano-cli transaction witness writes"""
+    vkey, signature = signing.sign(key, bytes.fromhex(tx_id))
+    return {"type": "TxWitness BabbageEra", "description": "", "cborHex": cbor.encode([0, [vkey, signature]]).hex()}
+
+
+def test_check_witnesses():
+    tx_id = txview.tx_id(draft()["cborHex"])
+    message = bytes.fromhex(tx_id)
+    checked = multisig.check_witnesses(message, [witness(tx_id, KEYS[0])], set(HASHES[:2]))
+    assert checked == {HASHES[0]: witness(tx_id, KEYS[0])}
+    # Key not in the script
+    with pytest.raises(ValueError, match="not a signer"):
+        multisig.check_witnesses(message, [witness(tx_id, KEYS[2])], set(HASHES[:2]))
+    # Signature of another transaction
+    other = txview.tx_id(draft(fee=180000)["cborHex"])
+    with pytest.raises(ValueError, match="Invalid signature"):
+        multisig.check_witnesses(message, [witness(other, KEYS[0])], set(HASHES[:2]))
+    assert multisig.check_witnesses(message, [witness(other, KEYS[0])], set(HASHES[:2]), verify=False)
+
+
+@pytest.mark.parametrize("script_type", ["all", "any", "atLeast"])
+def test_needed_signers(script_type):
+    script = SCRIPTS[script_type]
+    threshold = THRESHOLDS[script_type]
+    for count in range(len(HASHES) + 1):
+        assert native_scripts.satisfied(script, set(HASHES[:count])) == (count >= threshold)
+    needed = multisig.needed(script, HASHES)
+    assert len(needed) == threshold
+    assert native_scripts.satisfied(script, set(needed))
+
+
+class FakeNode:
+    CARDANO_NETWORK = "testnet"
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit_transaction(self):
+        return "Transaction successfully submitted.\n"
+
+
+@pytest.fixture
+def node(monkeypatch):
+    """Records the transactions submitted through multisig_api"""
+    fake = FakeNode()
+
+    @contextmanager
+    def node_workspace(_node):
+        yield SimpleNamespace(node=fake, write_json=lambda name, content: fake.submitted.append(content))
+
+    monkeypatch.setattr(multisig_api.context, "_node", fake)
+    monkeypatch.setattr(multisig_api, "node_workspace", node_workspace)
+    return fake
+
+
+async def register(sessions, script: dict, auto_submit: bool = False) -> str:
+    async with sessions() as db:
+        db_script = dbmodels.Scripts(name="multisig", purpose="multisig", content=script,
+            policyID=native_scripts.policy_id(script))
+        db.add(db_script)
+        await db.commit()
+        info = await multisig_api.create_multisig(
+            MultisigCreate(script_id=db_script.id, tx_cborhex=draft(), auto_submit=auto_submit), db)
+    assert info["status"] == multisig.COLLECTING
+    return info["tx_id"]
+
+
+async def sign(sessions, tx_id: str, *keys) -> dict:
+    async with sessions() as db:
+        return await multisig_api.add_multisig_witnesses(tx_id,
+            MultisigSign(witnesses=[witness_file(tx_id, key) for key in keys]), db)
+
+
+@pytest.mark.parametrize("script_type", ["all", "any", "atLeast"])
+def test_missing_signers_count_down(database, node, script_type):
+    async def run():
+        tx_id = await register(database, SCRIPTS[script_type])
+        threshold = THRESHOLDS[script_type]
+        for count in range(1, threshold + 1):
+            info = await sign(database, tx_id, KEYS[count - 1])
+            assert info["added"] == [HASHES[count - 1]]
+            assert len(info["missing"]) == len(HASHES) - count
+            assert info["status"] == (multisig.READY if count == threshold else multisig.COLLECTING)
+        # Assembled with the witnesses the script needs, not submitted
+        assert txview.analyze(info["tx_cborhex"]["cborHex"])["witnesses"]["vkey"] == threshold
+        assert txview.tx_id(info["tx_cborhex"]["cborHex"]) == tx_id
+        assert node.submitted == []
+
+    asyncio.run(run())
+
+
+def test_same_witness_added_once(database, node):
+    async def run():
+        tx_id = await register(database, SCRIPTS["all"])
+        assert (await sign(database, tx_id, KEYS[0]))["added"] == [HASHES[0]]
+        info = await sign(database, tx_id, KEYS[0])
+        assert info["added"] == []
+        assert info["signers"] == [HASHES[0]]
+        async with database() as db:
+            assert await multisig.add_witnesses(db, tx_id, {HASHES[0]: witness(tx_id, KEYS[0])}) == []
+            await db.commit()
+            table = dbmodels.MultisigWitnesses
+            assert await db.scalar(select(func.count()).select_from(table).where(table.tx_id == tx_id)) == 1
+
+    asyncio.run(run())
+
+
+def test_racing_signers_assemble_and_submit_once(database, node, monkeypatch):
+    assemble = multisig.assemble
+
+    async def run():
+        tx_id = await register(database, SCRIPTS["atLeast"], auto_submit=True)
+        # Both requests insert their witness before either assembles. Each
+        # sees only its own uncommitted witness: the row lock makes the
+        # second one wait for the first to commit and see both
+        waiting = []
+        both_inserted = asyncio.Event()
+
+        async def assemble_together(*args):
+            waiting.append(args)
+            if len(waiting) == 2:
+                both_inserted.set()
+            await both_inserted.wait()
+            return await assemble(*args)
+
+        monkeypatch.setattr(multisig, "assemble", assemble_together)
+        results = await asyncio.gather(*(sign(database, tx_id, key) for key in KEYS[:2]))
+        assert sorted(result["added"][0] for result in results) == sorted(HASHES[:2])
+        assert len(node.submitted) == 1
+        async with database() as db:
+            info = await multisig_api.get_multisig(tx_id, db)
+            stored = await db.scalar(select(dbmodels.Transactions).where(dbmodels.Transactions.tx_id == tx_id))
+        assert info["status"] == multisig.SUBMITTED
+        assert node.submitted[0] == info["tx_cborhex"]
+        assert stored.status == "submitted"
+        # A late signer changes nothing
+        monkeypatch.setattr(multisig, "assemble", assemble)
+        late = await sign(database, tx_id, KEYS[2])
+        assert late["added"] == []
+        assert len(node.submitted) == 1
+
+    asyncio.run(run())
+
+
+def test_auto_submit_once_the_threshold_is_met(database, node):
+    async def run():
+        tx_id = await register(database, SCRIPTS["all"], auto_submit=True)
+        await sign(database, tx_id, KEYS[0])
+        assert node.submitted == []
+        info = await sign(database, tx_id, *KEYS[1:])
+        assert info["status"] == multisig.SUBMITTED
+        assert info["submit"] == "Transaction successfully submitted."
+        assert len(node.submitted) == 1
+        analysis = txview.analyze(node.submitted[0]["cborHex"])
+        assert analysis["tx_id"] == tx_id
+        assert analysis["witnesses"]["vkey"] == 3
+
+    asyncio.run(run())
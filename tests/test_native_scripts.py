@@ -0,0 +1,58 @@
+import pytest
+
+from core import native_scripts
+
+# Policy ids of cardano-cli simple script JSON files. cardano-cli is not
+# available where these tests were written: the ids were computed with
+# pycardano (NativeScript.hash()), an implementation independent from
+# core.native_scripts, for the same scripts
+A = "ab" * 28
+B = "cd" * 28
+C = "ef" * 28
+
+
+def sig(key_hash):
+    return {"type": "sig", "keyHash": key_hash}
+
+
+SCRIPTS = [
+    (sig(A), "ed67591f9f6bb0860f89d300936e8ceed1b71cac3f4633e993a3b8ad"),
+    ({"type": "all", "scripts": [sig(A), sig(B)]},
+        "93dd0ceabba6d6216844b39e03b4331e5990044b33f45a93b1d66e49"),
+    ({"type": "any", "scripts": [sig(A), sig(B), sig(C)]},
+        "595d69e71c17ec0fff43cd95b1e772e92993869df666e5203e4fd6de"),
+    ({"type": "atLeast", "required": 2, "scripts": [sig(A), sig(B), sig(C)]},
+        "70ee8f1dddf7991b96b79d530f7592afa72c578b5abe5a68795245f7"),
+    ({"type": "all", "scripts": [{"type": "before", "slot": 1000000}, sig(A)]},
+        "9acb19601e88133c34d57331d983e9312326474815bcd65e8cbd76d0"),
+    ({"type": "all", "scripts": [{"type": "after", "slot": 500}, sig(A)]},
+        "e3bdb45577a3e631239d2ea4baa7ecf3505890e153e73c59c2a42694"),
+    ({"type": "any", "scripts": [
+        {"type": "all", "scripts": [sig(A), {"type": "after", "slot": 100}]},
+        {"type": "atLeast", "required": 1, "scripts": [sig(B), sig(C)]}]},
+        "ab2f2556a5cbf93e63cf457fac3d5c0649745f724987178ac4e6764b"),
+]
+
+
+@pytest.mark.parametrize("script, policy_id", SCRIPTS)
+def test_policy_id(script, policy_id):
+    assert native_scripts.policy_id(script) == policy_id
+
+
+@pytest.mark.parametrize("script", [
+    {"type": "sig"},
+    {"type": "sig", "keyHash": "ab"},
+    {"type": "atLeast", "scripts": [sig(A)]},
+    {"type": "before"},
+    {"type": "unknown"},
+])
+def test_invalid_script(script):
+    with pytest.raises(ValueError):
+        native_scripts.policy_id(script)
+
+
+def test_satisfied():
+    script = {"type": "atLeast", "required": 2, "scripts": [sig(A), sig(B), sig(C)]}
+    assert native_scripts.key_hashes(script) == {A, B, C}
+    assert not native_scripts.satisfied(script, {A})
+    assert native_scripts.satisfied(script, {A, C})
@@ -0,0 +1,130 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Response
+
+from db import pagination
+from db.models import dbmodels
+from routers.api_v1.endpoints import admin_api
+
+COLUMNS = admin_api.TRANSACTION_ORDER
+START = datetime(2024, 3, 1, 12, 0, 0)
+
+
+def test_cursor_round_trip():
+    values = [START, 42]
+    cursor = pagination.encode_cursor(values)
+    assert pagination.decode_cursor(cursor, COLUMNS) == values
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    pagination.encode_cursor([START.isoformat()]),
+    pagination.encode_cursor(["yesterday", 1]),
+    pagination.encode_cursor([START.isoformat(), "one"]),
+    base64.urlsafe_b64encode(json.dumps({"submission": START.isoformat(), "id": 1}).encode()).decode(),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        pagination.decode_cursor(cursor, COLUMNS)
+
+
+async def store(sessions, submissions) -> list:
+    async with sessions() as db:
+        rows = [dbmodels.Transactions(tx_id=f"{index:064x}", submission=submission, network="testnet")
+            for index, submission in enumerate(submissions)]
+        db.add_all(rows)
+        await db.commit()
+    return rows
+
+
+async def pages(sessions, limit: int) -> list:
+    """Every page of the transactions listing, following X-Next-Cursor"""
+    result = []
+    cursor = None
+    while True:
+        response = Response()
+        async with sessions() as db:
+            rows = await admin_api.get_transactions(response, cursor=cursor, limit=limit, id_wallet=None,
+                network=None, processed=None, since=None, until=None, db=db)
+        result.append([row.id for row in rows])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return result
+
+
+def test_pages_are_stable_across_ties(database):
+    async def run():
+        # Three rows share each submission time, so pages end in the middle of a tie
+        submissions = [START + timedelta(seconds=second) for second in range(4) for _ in range(3)]
+        rows = await store(database, submissions)
+        expected = [row.id for row in sorted(rows, key=lambda row: (row.submission, row.id), reverse=True)]
+        for limit in (1, 2, 4, 5):
+            result = await pages(database, limit)
+            # No row skipped or repeated, newest first
+            assert [row_id for page in result for row_id in page] == expected
+            assert all(len(page) == limit for page in result[:-1])
+            assert 0 < len(result[-1]) <= limit
+
+    asyncio.run(run())
+
+
+def test_last_page_has_no_cursor(database):
+    async def run():
+        await store(database, [START, START + timedelta(seconds=1)])
+        # Exactly one page: no cursor to an empty page
+        assert await pages(database, 2) == [[2, 1]]
+        response = Response()
+        async with database() as db:
+            rows = await admin_api.get_transactions(response, cursor=None, limit=1, id_wallet=None,
+                network=None, processed=None, since=None, until=None, db=db)
+        assert [row.id for row in rows] == [2]
+        assert "X-Next-Cursor" in response.headers
+
+    asyncio.run(run())
+
+
+def test_invalid_cursor_is_a_bad_request(database):
+    async def run():
+        await store(database, [START, START, START])
+        response = Response()
+        async with database() as db:
+            await admin_api.get_transactions(response, cursor=None, limit=1, id_wallet=None,
+                network=None, processed=None, since=None, until=None, db=db)
+            cursor = response.headers["X-Next-Cursor"]
+            # Edited by hand: the id no longer parses
+            values = json.loads(base64.urlsafe_b64decode(cursor))
+            tampered = pagination.encode_cursor([values[0], "3 OR 1=1"])
+            for bad in ("garbage", cursor[:-4], tampered):
+                with pytest.raises(HTTPException) as error:
+                    await admin_api.get_transactions(Response(), cursor=bad, limit=1, id_wallet=None,
+                        network=None, processed=None, since=None, until=None, db=db)
+                assert error.value.status_code == 400
+
+    asyncio.run(run())
+
+
+def test_export_streams_every_row(database, monkeypatch):
+    monkeypatch.setattr(pagination, "SessionLocal", database)
+
+    async def run():
+        rows = await store(database, [START + timedelta(seconds=index // 2) for index in range(25)])
+        response = await admin_api.export_transactions(id_wallet=None, network=None, processed=None,
+            since=None, until=None)
+        assert response.media_type == "application/x-ndjson"
+        # Several chunks of the server side cursor
+        stream = pagination.stream_ndjson(admin_api._transactions_query(None, None, None, None, None),
+            COLUMNS, lambda row: str(row.id), chunk_size=10)
+        chunks = [chunk async for chunk in stream]
+        assert len(chunks) == 3
+        body = "".join([chunk async for chunk in response.body_iterator])
+        lines = [json.loads(line) for line in body.splitlines()]
+        expected = sorted(rows, key=lambda row: (row.submission, row.id), reverse=True)
+        assert [line["id"] for line in lines] == [row.id for row in expected]
+        assert [line["tx_id"] for line in lines] == [row.tx_id for row in expected]
+
+    asyncio.run(run())
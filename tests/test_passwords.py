@@ -0,0 +1,23 @@
+from passlib.hash import bcrypt
+
+from core import passwords
+from core.config import settings
+
+
+def test_lower_cost_hash_is_upgraded_on_login():
+    old_hash = bcrypt.using(rounds=4).hash("secret")
+    valid, new_hash = passwords.verify_and_update("secret", old_hash)
+    assert valid
+    assert new_hash is not None and bcrypt.from_string(new_hash).rounds == settings.BCRYPT_ROUNDS
+    assert passwords.verify_and_update("secret", new_hash) == (True, None)
+
+
+def test_wrong_password_is_not_upgraded():
+    old_hash = bcrypt.using(rounds=4).hash("secret")
+    assert passwords.verify_and_update("other", old_hash) == (False, None)
+    assert passwords.verify_and_update("secret", "not a hash") == (False, None)
+
+
+def test_higher_cost_hash_is_upgraded_on_login():
+    old_hash = bcrypt.using(rounds=settings.BCRYPT_ROUNDS + 1).hash("secret")
+    assert passwords.pwd_context.needs_update(old_hash)
@@ -0,0 +1,167 @@
+import asyncio
+
+from core import pending, txplanner
+from core.pending import PendingUtxos
+from routers.api_v1.endpoints import transactions_api
+from routers.api_v1.endpoints.pydantic_schemas import CoinSelection
+
+ADDRESS = "addr_test1vrcvs7eq2rp9wk3ad0mxsq8xj6kr55nyg7pk3w7xzfnxkqs6h4cwd"
+DESTIN = "addr_test1qz2fxv2umyhttkxyxp8x0dlpdt3k6cwng5pxj3jhsydzer3n0d3vllmyqwsx5wktcd8cc3sq835lu7drv2xwl2wywfgs68faae"
+POLICY = "a0" * 28
+TX_ID = "ff" * 32
+PROTOCOL_PARAMS = {
+    "txFeePerByte": 44,
+    "txFeeFixed": 155381,
+    "utxoCostPerByte": 4310,
+    "maxTxSize": 16384,
+}
+
+
+def utxo(index, lovelace, *tokens):
+    return {"hash": f"{index:064x}", "id": "0", "amounts": txplanner.utxo_amounts(lovelace, dict(tokens))}
+
+
+def refs(utxos):
+    return [txplanner.utxo_ref(item) for item in utxos]
+
+
+def submit(pending_utxos, inputs, change):
+    """Reserve `inputs` and commit a transaction paying DESTIN with `change` back to ADDRESS"""
+    reserved = pending_utxos.reserve(ADDRESS, inputs)
+    pending_utxos.commit(reserved, TX_ID, [
+        {"address": DESTIN, "amounts": txplanner.utxo_amounts(2000000)},
+        {"address": ADDRESS, "amounts": change},
+    ], ADDRESS)
+    return reserved
+
+
+def test_available_skips_reserved_and_adds_pending_outputs():
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000), utxo(2, 8000000)]
+    submit(pending_utxos, chain[:1], txplanner.utxo_amounts(2800000))
+    available = pending_utxos.available(ADDRESS, chain)
+    # The output to another address is not ours to spend
+    assert refs(available) == [refs(chain)[1], TX_ID + "#1"]
+    assert pending_utxos.is_pending(available[1])
+    assert not pending_utxos.is_pending(chain[1])
+    assert pending_utxos.available(DESTIN, []) == []
+
+
+def test_pending_change_keeps_its_tokens():
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000, (POLICY + ".746f6b", 10))]
+    submit(pending_utxos, chain, txplanner.utxo_amounts(2800000, {POLICY + ".746f6b": 10}))
+    (change,) = pending_utxos.available(ADDRESS, chain)
+    assert txplanner.utxo_lovelace(change) == 2800000
+    assert change["amounts"][1] == {"token": POLICY + ".746f6b", "amount": "10"}
+    assert not txplanner.is_ada_only(change)
+
+
+def test_reserved_input_cleared_once_the_node_drops_it():
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000), utxo(2, 8000000)]
+    pending_utxos.reserve(ADDRESS, chain[:1])
+    assert refs(pending_utxos.available(ADDRESS, chain)) == refs(chain)[1:]
+    assert pending_utxos.stats()["reserved_inputs"] == 1
+    # The spending transaction made it to a block
+    pending_utxos.available(ADDRESS, chain[1:])
+    assert pending_utxos.stats()["reserved_inputs"] == 0
+
+
+def test_pending_output_dropped_once_on_chain():
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000)]
+    submit(pending_utxos, chain, txplanner.utxo_amounts(2800000))
+    (change,) = pending_utxos.available(ADDRESS, chain)
+    assert pending_utxos.stats() == {"reserved_inputs": 1, "pending_outputs": 1}
+    # Next block: the input is gone and the change is reported by the node
+    available = pending_utxos.available(ADDRESS, [change])
+    assert available == [change]
+    assert pending_utxos.stats() == {"reserved_inputs": 0, "pending_outputs": 0}
+    assert not pending_utxos.is_pending(change)
+
+
+def test_release_frees_the_inputs():
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000), utxo(2, 8000000)]
+    reserved = pending_utxos.reserve(ADDRESS, chain)
+    assert pending_utxos.available(ADDRESS, chain) == []
+    pending_utxos.release(reserved)
+    assert pending_utxos.available(ADDRESS, chain) == chain
+
+
+def test_everything_expires_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pending.time, "monotonic", lambda: now[0])
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000), utxo(2, 8000000)]
+    submit(pending_utxos, chain[:1], txplanner.utxo_amounts(2800000))
+    now[0] += 299
+    assert refs(pending_utxos.available(ADDRESS, chain)) == [refs(chain)[1], TX_ID + "#1"]
+    # Never included: the input is offered again and the change forgotten
+    now[0] += 2
+    assert pending_utxos.available(ADDRESS, chain) == chain
+    assert pending_utxos.stats() == {"reserved_inputs": 0, "pending_outputs": 0}
+
+
+def test_concurrent_sends_pick_different_inputs(monkeypatch):
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(index, 10000000) for index in range(1, 5)]
+
+    async def get_utxos(_address):
+        await asyncio.sleep(0)
+        return list(chain), None
+
+    async def get_tip():
+        return {"slot": 1000, "block": 10}
+
+    monkeypatch.setattr(transactions_api, "pending_utxos", pending_utxos)
+    monkeypatch.setattr(transactions_api, "get_utxos", get_utxos)
+    monkeypatch.setattr(transactions_api, "get_tip", get_tip)
+
+    async def send():
+        return await transactions_api.plan_inputs(ADDRESS, [{"address": DESTIN, "amount": 2000000}], None,
+            1, CoinSelection.largest_first, PROTOCOL_PARAMS, reserve=True)
+
+    async def main():
+        return await asyncio.gather(*(send() for _ in range(3)))
+
+    plans = asyncio.run(main())
+    selected = [ref for plan in plans for ref in refs(plan["inputs"])]
+    assert len(selected) == len(set(selected)) == 3
+    assert sorted(ref for plan in plans for ref in plan["reserved"]) == sorted(selected)
+    assert pending_utxos.stats()["reserved_inputs"] == 3
+
+
+def test_send_transaction_commits_the_change_with_its_tokens(monkeypatch):
+    pending_utxos = PendingUtxos(ttl=300)
+    chain = [utxo(1, 5000000, (POLICY + ".746f6b", 10))]
+
+    class FakeWorkspace:
+        node = type("FakeNode", (), {"submit_transaction": staticmethod(lambda: "Transaction successfully submitted.\n")})
+
+        def build_raw(self, *_args):
+            return 170000
+
+        def read_json(self, _name):
+            return {}
+
+        def write_json(self, _name, _content):
+            pass
+
+    async def sign_envelope(_draft, _skeys):
+        return {}, TX_ID
+
+    monkeypatch.setattr(transactions_api, "pending_utxos", pending_utxos)
+    monkeypatch.setattr(transactions_api, "sign_envelope", sign_envelope)
+    monkeypatch.setattr(transactions_api, "invalidate_addresses", lambda addresses: None)
+    plan = txplanner.plan_transaction(chain, [{"address": DESTIN, "amount": 2000000}], ADDRESS, PROTOCOL_PARAMS)
+    plan["reserved"] = pending_utxos.reserve(ADDRESS, plan["inputs"])
+    params = {"address_origin": ADDRESS, "address_destin": [{"address": DESTIN, "amount": 2000000}],
+        "change_address": ADDRESS, "metadata": None, "witness": 1}
+
+    asyncio.run(transactions_api.send_transaction(FakeWorkspace(), params, {}, plan))
+
+    (change,) = pending_utxos.available(ADDRESS, chain)
+    assert txplanner.utxo_ref(change) == TX_ID + "#1"
+    assert change["amounts"] == txplanner.utxo_amounts(5000000 - 2000000 - 170000, {POLICY + ".746f6b": 10})
@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Date, cast, func, select
+
+from db.models import dbmodels
+from routers.api_v1.endpoints import wallets_api
+from routers.api_v1.endpoints.pydantic_schemas import TotalsPeriod
+from routers.api_v1.endpoints.transactions_api import store_transaction
+
+MIDNIGHT = datetime(2024, 2, 29, 0, 0, 0)
+
+
+def wallet() -> dbmodels.Wallet:
+    return dbmodels.Wallet(id=uuid.uuid4(), name="wallet", base_addr="addr_test1base", payment_addr="addr_test1pay",
+        payment_skey={}, payment_vkey={}, stake_addr="stake_test1", stake_skey={}, stake_vkey={},
+        hash_verification_key="00" * 28)
+
+
+async def grouped(db, id_wallet) -> list:
+    """Daily totals computed from the transactions themselves"""
+    transactions = dbmodels.Transactions
+    day = cast(transactions.submission, Date).label("period")
+    statement = select(day, func.count().label("tx_count"),
+            func.coalesce(func.sum(transactions.fees), 0).label("total_fees")) \
+        .where(transactions.id_wallet == id_wallet).group_by(day).order_by(day.desc())
+    return [dict(row._mapping) for row in await db.execute(statement)]
+
+
+def test_daily_totals_match_the_transactions(database):
+    async def run():
+        wallets = [wallet(), wallet()]
+        async with database() as db:
+            db.add_all(wallets)
+            await db.commit()
+        first, second = (db_wallet.id for db_wallet in wallets)
+        stored = [
+            # Last instant of a day and first of the next
+            (first, MIDNIGHT - timedelta(microseconds=1), 170000),
+            (first, MIDNIGHT, 180000),
+            (first, MIDNIGHT + timedelta(hours=23, minutes=59, seconds=59), None),
+            (first, MIDNIGHT + timedelta(days=2), 200000),
+            (second, MIDNIGHT, 190000),
+            (None, MIDNIGHT, 210000),
+        ]
+        async with database() as db:
+            for index, (id_wallet, submission, fees) in enumerate(stored):
+                await store_transaction(db, tx_id=f"{index:064x}", id_wallet=id_wallet,
+                    submission=submission, fees=fees, network="testnet")
+            # Stored again: refused and not counted twice
+            with pytest.raises(HTTPException) as error:
+                await store_transaction(db, tx_id=f"{1:064x}", id_wallet=first,
+                    submission=MIDNIGHT, fees=180000, network="testnet")
+            assert error.value.status_code == 404
+
+        async with database() as db:
+            for id_wallet in (first, second):
+                totals = await wallets_api.get_wallet_totals(id_wallet, TotalsPeriod.day, None, None, db)
+                assert totals == await grouped(db, id_wallet)
+            assert await wallets_api.get_wallet_totals(first, TotalsPeriod.day, None, None, db) == [
+                {"period": date(2024, 3, 2), "tx_count": 1, "total_fees": 200000},
+                {"period": date(2024, 2, 29), "tx_count": 2, "total_fees": 180000},
+                {"period": date(2024, 2, 28), "tx_count": 1, "total_fees": 170000},
+            ]
+            assert await wallets_api.get_wallet_totals(first, TotalsPeriod.month, None, None, db) == [
+                {"period": date(2024, 3, 1), "tx_count": 1, "total_fees": 200000},
+                {"period": date(2024, 2, 1), "tx_count": 3, "total_fees": 350000},
+            ]
+            # Days bound the totals, until excluded
+            assert await wallets_api.get_wallet_totals(first, TotalsPeriod.day, date(2024, 2, 29),
+                date(2024, 3, 2), db) == [{"period": date(2024, 2, 29), "tx_count": 2, "total_fees": 180000}]
+            # Transactions without a wallet are not counted anywhere
+            assert sum(row.tx_count for row in await db.scalars(select(dbmodels.WalletDailyTotals))) == 5
+
+    asyncio.run(run())
+
+
+def test_totals_of_an_unknown_wallet(database):
+    async def run():
+        async with database() as db:
+            with pytest.raises(HTTPException) as error:
+                await wallets_api.get_wallet_totals(uuid.uuid4(), TotalsPeriod.day, None, None, db)
+        assert error.value.status_code == 404
+
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from core import cache
+from core.cache import TTLCache
+from core.config import settings
+from routers.api_v1.endpoints import security
+
+START = 1700000000.0
+
+
+class Users:
+    """Session answering verify_user_existence, counting the queries"""
+
+    def __init__(self, *usernames):
+        self.users = {username: SimpleNamespace(id=uuid.uuid4(), username=username, id_wallet=None,
+            is_verified=True, created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1))
+            for username in usernames}
+        self.queries = 0
+
+    async def scalar(self, statement):
+        self.queries += 1
+        username, = statement.compile().params.values()
+        return self.users.get(username)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """One clock for the cache expiry, the token exp and its verification"""
+    now = [START]
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return cls.fromtimestamp(now[0], timezone.utc).replace(tzinfo=None)
+
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(security.time, "time", lambda: now[0])
+    monkeypatch.setattr(security, "datetime", Clock)
+    monkeypatch.setattr(jwt, "datetime", Clock)
+    monkeypatch.setattr(settings, "TOKEN_CACHE_TTL", 600.0)
+    monkeypatch.setattr(security, "token_cache", TTLCache(600.0, maxsize=100))
+    return now
+
+
+def current_user(token: str, db: Users):
+    return asyncio.run(security.get_current_user(token, db))
+
+
+def test_cached_token_not_served_past_its_exp(clock):
+    db = Users("alice")
+    token = security.create_access_token({"sub": "alice"}, timedelta(seconds=30))
+    assert current_user(token, db).username == "alice"
+    assert current_user(token, db).username == "alice"
+    assert db.queries == 1
+    # The cache TTL is longer than what is left of the token
+    clock[0] += 31
+    with pytest.raises(HTTPException) as error:
+        current_user(token, db)
+    assert error.value.status_code == 401
+    assert security.token_cache.stats()["size"] == 0
+
+
+def test_invalidate_user_tokens(clock):
+    db = Users("alice", "bob")
+    tokens = [security.create_access_token({"sub": "alice"}, timedelta(minutes=30)),
+        security.create_access_token({"sub": "alice"}, timedelta(minutes=20)),
+        security.create_access_token({"sub": "bob"}, timedelta(minutes=30))]
+    for token in tokens:
+        current_user(token, db)
+    assert security.token_cache.stats()["size"] == 3
+
+    security.invalidate_user_tokens("alice")
+    assert [security.token_cache.get(token) is None for token in tokens] == [True, True, False]
+    db.queries = 0
+    for token in tokens:
+        current_user(token, db)
+    # Only alice's tokens went back to the database
+    assert db.queries == 2
+
+
+def test_token_of_another_key_never_cached(clock):
+    db = Users("alice")
+    forged = jwt.encode({"sub": "alice", "exp": START + 600}, "not-" + settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM)
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            current_user(forged, db)
+        assert error.value.status_code == 401
+    assert db.queries == 0
+    assert security.token_cache.stats()["size"] == 0
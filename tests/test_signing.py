@@ -0,0 +1,87 @@
+import pytest
+
+from core import cbor, signing, txview
+
+# Keys, draft and witnesses made with pycardano, an implementation
+# independent from core.signing: cardano-cli is not available where these
+# tests were written. Ed25519 signatures are deterministic, so the
+# witnesses of the same body and key are what cardano-cli transaction sign
+# writes
+EXTENDED_SKEY = {
+    "type": "PaymentExtendedSigningKeyShelley_ed25519_bip32",
+    "description": "",
+    "cborHex": "5880b813a62becba674d8e29ce907ee3533f622d41e155768d58793cbad373e1a45e47f9d20ab7f78b023a2cf"
+        "363c2217400a8c658dfd1c8057c4f62b6f6746d1c4173fea80d424276ad0978d4fe5310e8bc2d485f5f6bb3bf8761"
+        "2989f112ad5a7ddd75e154da417becec55cdd249327454138f082110297d5e87ab25e15fad150f",
+}
+SKEY = {
+    "type": "PaymentSigningKeyShelley_ed25519",
+    "description": "PaymentSigningKeyShelley_ed25519",
+    "cborHex": "58201d54f01c42aa708d8ebed3617c1e8ff3d54c5bd7ef52acecc2334c2a78a8f8ca",
+}
+BODY = ("a40081825820aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa00018182581d609493315cd92e"
+    "b5d8c4304e67b7e16ae36d61d34502694657811a2c8e1a000f4240021a0002981003191388")
+SCRIPT = "8201818200581c9493315cd92eb5d8c4304e67b7e16ae36d61d34502694657811a2c8e"
+TX_ID = "aa442adb58e1c1ba83b10e81998dda20b270c2ef3cbdfe264eaa313ffbcc26d2"
+EXTENDED_WITNESS = (
+    "73fea80d424276ad0978d4fe5310e8bc2d485f5f6bb3bf87612989f112ad5a7d",
+    "5c851a479ea0b0806d605d9e749f892593032ab57c6564233c540059d80b401978ee223ab5ec05b80e6bc458382d683432"
+    "f0750012b8fb20e8f18eed9ce73e01",
+)
+WITNESS = (
+    "23962daba8e5afd354fcceb6957dcddde2003b6ee1408c90524015c06183a91e",
+    "d18be84715d068883b51e91dcbd1f667f04a952c094247b72765d9d348b8099091b8cc3fab07cf3daed2d7feb5bee2483520"
+    "dcef8f6f984e21a6452842a71e09",
+)
+UNSIGNED = "84" + BODY + "a10181" + SCRIPT + "f5f6"
+# Witness set {0: [extended key witness, key witness], 1: [script]}
+SIGNED = ("84" + BODY + "a20082" + "825820" + EXTENDED_WITNESS[0] + "5840" + EXTENDED_WITNESS[1]
+    + "825820" + WITNESS[0] + "5840" + WITNESS[1] + "0181" + SCRIPT + "f5f6")
+
+
+def unsigned(cbor_hex=UNSIGNED, key_type="Unwitnessed Tx BabbageEra"):
+    return {"type": key_type, "description": "Ledger Cddl Format", "cborHex": cbor_hex}
+
+
+@pytest.mark.parametrize("skey, witness", [(EXTENDED_SKEY, EXTENDED_WITNESS), (SKEY, WITNESS)])
+def test_witness(skey, witness):
+    vkey, signature = signing.sign(skey, bytes.fromhex(TX_ID))
+    assert (vkey.hex(), signature.hex()) == witness
+    assert signing.verify(vkey, bytes.fromhex(TX_ID), signature)
+    assert not signing.verify(vkey, bytes.fromhex(TX_ID)[::-1], signature)
+
+
+def test_signed_transaction():
+    signed = signing.sign_transaction(unsigned(), [EXTENDED_SKEY, SKEY])
+    assert signed["cborHex"] == SIGNED
+    assert signed["type"] == "Witnessed Tx BabbageEra"
+    assert txview.tx_id(signed["cborHex"]) == TX_ID
+
+
+def test_witnesses_added_one_signer_at_a_time():
+    partial = signing.sign_transaction(unsigned(), [EXTENDED_SKEY])
+    assert signing.sign_transaction(partial, [SKEY])["cborHex"] == SIGNED
+
+
+def test_txbody_layout():
+    # cardano-cli 1.35 TxBody: [body, [[0, script]], true, null]
+    draft = "84" + BODY + "81" + "8200" + SCRIPT + "f5f6"
+    signed = signing.sign_transaction(unsigned(draft, "TxBodyBabbage"), [EXTENDED_SKEY, SKEY])
+    assert signed["cborHex"] == SIGNED
+    assert signed["type"] == "Tx BabbageEra"
+
+
+def test_read_witness():
+    envelope = {"type": "TxWitness BabbageEra", "description": "",
+        "cborHex": cbor.encode([0, [bytes.fromhex(part) for part in WITNESS]]).hex()}
+    assert signing.read_witness(envelope) == cbor.encode([bytes.fromhex(part) for part in WITNESS])
+    with pytest.raises(ValueError):
+        signing.read_witness({"cborHex": cbor.encode([1, [b"", b""]]).hex()})
+
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        signing.sign({"type": "StakeSigningKeyShelley_ed25519_bip32_unknown", "cborHex": "00"}, b"")
+    with pytest.raises(ValueError):
+        # Plutus layouts are left to cardano-cli
+        signing.sign_transaction(unsigned("86" + BODY + "808080f5f6", "TxBodyBabbage"), [SKEY])
@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+
+from fastapi import HTTPException, Response
+
+from core import cbor, confirmations
+from core.addresses import encode_address
+from core.cache import TTLCache
+from routers.api_v1.endpoints import blockchain_api, transactions_api
+from routers.api_v1.endpoints.pydantic_schemas import NodeCommandName, SimpleSend
+
+ORIGIN = "addr_test1origin"
+
+
+class FakeSession:
+    async def scalar(self, _statement):
+        return SimpleNamespace(payment_addr=ORIGIN, payment_skey={})
+
+
+def patch_batch(monkeypatch, submits, stored):
+    async def get_protocol_params():
+        return {}
+
+    async def get_utxos(_address):
+        return [], None
+
+    async def validity_end():
+        return 5000
+
+    def pack_outputs(utxos, outputs, *_args):
+        return [{"inputs": [{"hash": f"{index:064x}", "id": 0, "amounts": []}], "outputs": [output]}
+            for index, output in enumerate(outputs)]
+
+    async def send_transaction(_ws, params, _skey, _plan):
+        address = params["address_destin"][0]["address"]
+        return {"tx_id": address, "fees": 170000, "submit": submits[address], "tx_cborhex": None}
+
+    async def store_transaction(_db, tx_cborhex=None, **fields):
+        if fields["tx_id"] in stored:
+            raise HTTPException(status_code=404, detail="Transaction id already exists in database")
+        stored[fields["tx_id"]] = fields["status"]
+
+    monkeypatch.setattr(transactions_api, "get_protocol_params", get_protocol_params)
+    monkeypatch.setattr(transactions_api, "get_utxos", get_utxos)
+    monkeypatch.setattr(transactions_api, "validity_end", validity_end)
+    monkeypatch.setattr(transactions_api.txplanner, "pack_outputs", pack_outputs)
+    monkeypatch.setattr(transactions_api, "send_transaction", send_transaction)
+    monkeypatch.setattr(transactions_api, "store_transaction", store_transaction)
+
+
+def test_batch_reports_failed_submits_and_duplicates(monkeypatch):
+    monkeypatch.setattr(transactions_api.context, "_node", SimpleNamespace(CARDANO_NETWORK="testnet"))
+    monkeypatch.setattr(transactions_api, "node_workspace", lambda *args, **kwargs: nullcontext())
+    submits = {
+        "addr_ok": "Transaction successfully submitted.",
+        "addr_failed": 'Command failed: transaction submit Error: BadInputsUTxO',
+        "addr_stored": "Transaction successfully submitted.",
+    }
+    stored = {"addr_stored": confirmations.SUBMITTED}
+    patch_batch(monkeypatch, submits, stored)
+    send_params = SimpleSend(wallet_id="wallet",
+        address_destin=[{"address": address, "amount": 2000000} for address in submits])
+
+    result = asyncio.run(transactions_api.simple_send_batch(send_params, FakeSession()))
+
+    transactions = {transaction["tx_id"]: transaction for transaction in result["transactions"]}
+    assert transactions["addr_ok"]["success_flag"] is True
+    assert transactions["addr_ok"]["status"] == confirmations.SUBMITTED
+    assert transactions["addr_failed"]["success_flag"] is False
+    assert transactions["addr_failed"]["status"] == confirmations.FAILED
+    assert "BadInputsUTxO" in transactions["addr_failed"]["msg"]
+    assert stored["addr_failed"] == confirmations.FAILED
+    # The duplicate doesn't abort the batch, the other transactions are still reported
+    assert transactions["addr_stored"]["msg"] == "Transaction id already exists in database"
+
+
+def test_submit_invalidates_only_the_addresses_of_the_transaction(monkeypatch):
+    spender, payee, other = (encode_address(bytes.fromhex("60" + byte * 28)) for byte in ("11", "22", "33"))
+    utxos = {address: [{"hash": byte * 32, "id": "0", "amounts": [{"token": "lovelace", "amount": "5000000"}]}]
+        for address, byte in ((spender, "aa"), (payee, "bb"), (other, "cc"))}
+    body = {0: [[bytes.fromhex("aa" * 32), 0]], 1: [[bytes.fromhex("60" + "22" * 28), 2000000]], 2: 170000}
+    tx = cbor.head(cbor.ARRAY, 4) + cbor.encode(body) + cbor.encode({}) + cbor.encode(True) + cbor.encode(None)
+    envelope = {"type": "Witnessed Tx BabbageEra", "description": "", "cborHex": tx.hex()}
+
+    @contextmanager
+    def node_workspace(_node):
+        yield SimpleNamespace(node=SimpleNamespace(submit_transaction=lambda: "Transaction successfully submitted.\n"),
+            write_json=lambda name, content: None)
+
+    monkeypatch.setattr(blockchain_api, "utxo_cache", TTLCache(60))
+    monkeypatch.setattr(blockchain_api.context, "_node", SimpleNamespace(get_transactions=lambda address: utxos[address]))
+    monkeypatch.setattr(transactions_api, "node_workspace", node_workspace)
+
+    async def x_cache(address):
+        response = Response()
+        await blockchain_api.cardano_address(address, NodeCommandName.utxos, response)
+        return response.headers["X-Cache"]
+
+    async def run():
+        assert [await x_cache(address) for address in utxos] == ["MISS"] * 3
+        assert [await x_cache(address) for address in utxos] == ["HIT"] * 3
+        await transactions_api.submit_tx(envelope)
+        # The spent and the paid address are queried again, the other one is still cached
+        return [await x_cache(address) for address in utxos]
+
+    assert asyncio.run(run()) == ["MISS", "MISS", "HIT"]
+
+
+def test_unreadable_submit_invalidates_every_address(monkeypatch):
+    utxo_cache = TTLCache(60)
+    utxo_cache.set("addr_test1a", [])
+    monkeypatch.setattr(blockchain_api, "utxo_cache", utxo_cache)
+    blockchain_api.invalidate_transaction({"cborHex": "00"})
+    assert utxo_cache.stats()["size"] == 0
@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+from core import txplanner
+
+PROTOCOL_PARAMS = {
+    "txFeePerByte": 44,
+    "txFeeFixed": 155381,
+    "utxoCostPerByte": 4310,
+    "maxTxSize": 16384,
+}
+ADDRESS = "addr_test1qz2fxv2umyhttkxyxp8x0dlpdt3k6cwng5pxj3jhsydzer3n0d3vllmyqwsx5wktcd8cc3sq835lu7drv2xwl2wywfgs68faae"
+CHANGE = "addr_test1vrcvs7eq2rp9wk3ad0mxsq8xj6kr55nyg7pk3w7xzfnxkqs6h4cwd"
+POLICY = "a0" * 28
+
+
+def utxo(index, lovelace, *tokens):
+    amounts = [{"token": "lovelace", "amount": str(lovelace)}]
+    amounts += [{"token": token, "amount": str(amount)} for token, amount in tokens]
+    return {"hash": f"{index:064x}", "id": 0, "amounts": amounts}
+
+
+def test_ada_only_utxos_are_spent_first():
+    utxos = [utxo(1, 50000000, (POLICY + ".746f6b", 10)), utxo(2, 5000000)]
+    plan = txplanner.plan_transaction(utxos, [{"address": ADDRESS, "amount": 2000000}], CHANGE, PROTOCOL_PARAMS)
+    assert plan["inputs"] == [utxos[1]]
+    assert plan["change_assets"] == {}
+
+
+def test_utxos_with_tokens_fund_the_transaction():
+    # A wallet that minted: its ADA sits with the tokens sent back as change
+    utxos = [utxo(1, 50000000, (POLICY + ".746f6b", 10), (POLICY + ".", 1)), utxo(2, 1000000)]
+    outputs = [{"address": ADDRESS, "amount": 10000000}]
+    plan = txplanner.plan_transaction(utxos, outputs, CHANGE, PROTOCOL_PARAMS)
+    assert utxos[0] in plan["inputs"]
+    assert plan["change_assets"] == {POLICY + ".746f6b": 10, POLICY + ".": 1}
+    assets = txplanner.change_assets(plan["inputs"])
+    assert plan["tx_size"] == txplanner.estimate_tx_size(len(plan["inputs"]), outputs, CHANGE,
+        change_assets=assets)
+    assert plan["tx_size"] > txplanner.estimate_tx_size(len(plan["inputs"]), outputs, CHANGE)
+    assert plan["change"] >= txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS, assets)
+
+
+def test_change_with_tokens_needs_a_higher_min_utxo():
+    # Enough for an ADA only change, not for one carrying the tokens
+    tokens = [(POLICY + "." + f"{index:02x}" * 16, 1) for index in range(20)]
+    utxos = [utxo(1, 2000000 + 1200000 + 300000, *tokens)]
+    outputs = [{"address": ADDRESS, "amount": 2000000}]
+    assert 1200000 > txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS)
+    assert 1200000 < txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS, txplanner.change_assets(utxos))
+    with pytest.raises(txplanner.InsufficientFunds):
+        txplanner.plan_transaction(utxos, outputs, CHANGE, PROTOCOL_PARAMS)
+
+
+def test_largest_first():
+    utxos = [utxo(1, 1000000), utxo(2, 8000000), utxo(3, 3000000), utxo(4, 5000000)]
+    assert txplanner.largest_first(utxos, 10000000) == [utxos[1], utxos[3]]
+    assert txplanner.largest_first(utxos, 8000000) == [utxos[1]]
+
+
+def test_random_improve():
+    utxos = [utxo(index, 1000000) for index in range(1, 31)]
+    selected = txplanner.random_improve(utxos, 5000000, random.Random(7))
+    total = sum(txplanner.utxo_lovelace(item) for item in selected)
+    # Covers the target, improved towards twice it without going over three times it
+    assert 5000000 <= total <= 15000000
+    assert len(selected) == 10
+    assert len({txplanner.utxo_ref(item) for item in selected}) == len(selected)
+
+
+@pytest.mark.parametrize("select", [txplanner.largest_first, txplanner.random_improve])
+def test_insufficient_funds(select):
+    with pytest.raises(txplanner.InsufficientFunds):
+        select([utxo(1, 1000000), utxo(2, 2000000)], 3000001)
+    with pytest.raises(txplanner.InsufficientFunds):
+        select([], 1)
+
+
+def test_plan_fee_and_change():
+    utxos = [utxo(1, 3000000), utxo(2, 10000000)]
+    outputs = [{"address": ADDRESS, "amount": 2000000}]
+    plan = txplanner.plan_transaction(utxos, outputs, CHANGE, PROTOCOL_PARAMS)
+    size = txplanner.estimate_tx_size(1, outputs, CHANGE)
+    assert plan["inputs"] == [utxos[1]]
+    assert plan["tx_size"] == size
+    assert plan["fee"] == 155381 + 44 * size
+    assert plan["change"] == 10000000 - 2000000 - plan["fee"]
+
+
+def test_plan_adds_inputs_for_the_change():
+    # One input covers the output but leaves a change below min utxo
+    utxos = [utxo(1, 2200000), utxo(2, 2000000)]
+    plan = txplanner.plan_transaction(utxos, [{"address": ADDRESS, "amount": 2000000}], CHANGE, PROTOCOL_PARAMS)
+    assert len(plan["inputs"]) == 2
+    assert plan["change"] >= txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS)
+    with pytest.raises(txplanner.InsufficientFunds):
+        txplanner.plan_transaction(utxos[:1], [{"address": ADDRESS, "amount": 2000000}], CHANGE, PROTOCOL_PARAMS)
+
+
+def test_output_below_min_utxo():
+    with pytest.raises(ValueError):
+        txplanner.plan_transaction([utxo(1, 10000000)], [{"address": ADDRESS, "amount": 100000}], CHANGE,
+            PROTOCOL_PARAMS)
+
+
+def test_pack_outputs_splits_by_tx_size():
+    utxos = [utxo(index, 100000000) for index in range(1, 201)]
+    outputs = [{"address": ADDRESS, "amount": 2000000} for _ in range(500)]
+    plans = txplanner.pack_outputs(utxos, outputs, CHANGE, PROTOCOL_PARAMS)
+    assert len(plans) > 1
+    assert sum(len(plan["outputs"]) for plan in plans) == 500
+    refs = [txplanner.utxo_ref(item) for plan in plans for item in plan["inputs"]]
+    assert len(refs) == len(set(refs))
+    for plan in plans:
+        assert plan["tx_size"] <= PROTOCOL_PARAMS["maxTxSize"]
+        assert plan["change"] >= txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS)
+
+
+def test_pack_outputs_spends_utxos_with_tokens_last():
+    utxos = [utxo(1, 100000000, (POLICY + ".746f6b", 10)), utxo(2, 5000000)]
+    outputs = [{"address": ADDRESS, "amount": 2000000}, {"address": ADDRESS, "amount": 20000000}]
+    plans = txplanner.pack_outputs(utxos, outputs, CHANGE, PROTOCOL_PARAMS)
+    assert len(plans) == 1
+    assert plans[0]["inputs"] == [utxos[1], utxos[0]]
+    assert plans[0]["change_assets"] == {POLICY + ".746f6b": 10}
+    assets = txplanner.change_assets(plans[0]["inputs"])
+    assert plans[0]["tx_size"] == txplanner.estimate_tx_size(2, outputs, CHANGE, change_assets=assets)
+    assert plans[0]["change"] >= txplanner.min_utxo(CHANGE, PROTOCOL_PARAMS, assets)
+    assert plans[0]["fee"] == txplanner.min_fee(plans[0]["tx_size"], PROTOCOL_PARAMS)
@@ -0,0 +1,97 @@
+import pytest
+
+from core import cbor, txview
+
+# Signed Babbage era transaction (one input, one output, TTL 5000, a sig
+# native script and two vkey witnesses) built and signed with pycardano,
+# an implementation independent from core.cbor and core.txview: cardano-cli
+# is not available where these tests were written
+SIGNED = (
+    "84a40081825820aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa00018182581d60"
+    "9493315cd92eb5d8c4304e67b7e16ae36d61d34502694657811a2c8e1a000f4240021a0002981003191388a2"
+    "008282582073fea80d424276ad0978d4fe5310e8bc2d485f5f6bb3bf87612989f112ad5a7d58405c851a479e"
+    "a0b0806d605d9e749f892593032ab57c6564233c540059d80b401978ee223ab5ec05b80e6bc458382d683432"
+    "f0750012b8fb20e8f18eed9ce73e0182582023962daba8e5afd354fcceb6957dcddde2003b6ee1408c905240"
+    "15c06183a91e5840d18be84715d068883b51e91dcbd1f667f04a952c094247b72765d9d348b8099091b8cc3f"
+    "ab07cf3daed2d7feb5bee2483520dcef8f6f984e21a6452842a71e0901818201818200581c9493315cd92eb5"
+    "d8c4304e67b7e16ae36d61d34502694657811a2c8ef5f6"
+)
+TX_ID = "aa442adb58e1c1ba83b10e81998dda20b270c2ef3cbdfe264eaa313ffbcc26d2"
+BODY = SIGNED[2:SIGNED.index("a2008282")]
+
+
+def test_signed_transaction():
+    assert txview.tx_id(SIGNED) == TX_ID
+    assert txview.ttl(SIGNED) == 5000
+    assert txview.inputs_outputs(SIGNED) == (["aa" * 32 + "#0"], 1)
+    analysis = txview.analyze(SIGNED)
+    assert analysis["tx_id"] == TX_ID
+    assert analysis["fee"] == 170000
+    assert analysis["outputs"][0]["lovelace"] == 1000000
+    assert analysis["outputs"][0]["address"].startswith("addr_test1")
+    assert analysis["validity_interval"] == {"invalid_before": None, "invalid_hereafter": 5000}
+    assert analysis["witnesses"] == {"vkey": 2, "native_scripts": 1}
+
+
+def test_body_alone_has_the_same_id():
+    assert txview.tx_id(BODY) == TX_ID
+    assert txview.ttl(BODY) == 5000
+
+
+def test_id_is_over_the_original_body_bytes():
+    # Same body with the inputs as an indefinite length array: re-encoding
+    # would give the canonical bytes and another id
+    body = bytes.fromhex(BODY)
+    inputs = cbor.map_items(body)[0][1]
+    indefinite = b"\x9f" + inputs[1:] + b"\xff"
+    other = body.replace(inputs, indefinite)
+    assert txview.tx_id(other.hex()) != TX_ID
+    assert txview.inputs_outputs(other.hex()) == (["aa" * 32 + "#0"], 1)
+
+
+@pytest.mark.parametrize("cbor_hex", [
+    "",
+    "zz",
+    SIGNED[:-10],
+    SIGNED[:100],
+    SIGNED + "00",
+    BODY + "00",
+    BODY[:-4],
+    # An integer, not a transaction
+    "1a000f4240",
+    # Map head announcing more entries than there are
+    "a5" + BODY[2:],
+])
+def test_malformed_transaction(cbor_hex):
+    with pytest.raises(ValueError):
+        txview.tx_id(cbor_hex)
+    with pytest.raises(ValueError):
+        txview.ttl(cbor_hex)
+
+
+@pytest.mark.parametrize("encoded, value", [
+    # RFC 8949 appendix A
+    ("1a000f4240", 1000000),
+    ("3903e7", -1000),
+    ("5f42010243030405ff", bytes.fromhex("0102030405")),
+    ("7f657374726561646d696e67ff", "streaming"),
+    ("9f018202039f0405ffff", [1, [2, 3], [4, 5]]),
+    ("bf61610161629f0203ffff", {"a": 1, "b": [2, 3]}),
+    ("f93c00", 1.0),
+    ("f5", True),
+    ("f6", None),
+    ("d818456449455446", cbor.Tag(24, b"dIETF")),
+])
+def test_decode_known_vectors(encoded, value):
+    assert cbor.decode(bytes.fromhex(encoded)) == value
+
+
+@pytest.mark.parametrize("encoded", ["", "1a000f42", "5f4201", "9f01", "a16161", "1c", "0000"])
+def test_decode_malformed(encoded):
+    with pytest.raises(ValueError):
+        cbor.decode(bytes.fromhex(encoded))
+
+
+def test_encode_round_trip():
+    value = {0: [[bytes(32), 1]], 1: [[bytes(29), 2000000]], 2: 170000, 3: 2 ** 40, "key": -5}
+    assert cbor.decode(cbor.encode(value)) == value
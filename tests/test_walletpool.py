@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from core import walletpool
+from core.keygen import SECRET_FIELDS, WALLET_FIELDS
+from core.walletpool import WarmWalletPool, pool_keys
+from db.models import dbmodels
+from routers.api_v1.endpoints import keys_api
+from routers.api_v1.endpoints.pydantic_schemas import KeyCreate
+
+
+def test_pool_keys_leave_secrets_out():
+    wallet = {field: field + "-value" for field in WALLET_FIELDS + SECRET_FIELDS}
+    wallet["name"] = "pool"
+    keys = pool_keys(wallet)
+    assert set(keys) == set(WALLET_FIELDS)
+    assert not set(keys) & set(SECRET_FIELDS)
+    assert keys["payment_skey"] == "payment_skey-value"
+
+
+class Derivations:
+    """Stands for the wallet process pool: derived wallets, secrets included"""
+
+    def __init__(self):
+        self.count = itertools.count()
+        self.calls = []
+
+    def wallet(self, name: str) -> dict:
+        number = next(self.count)
+        wallet = {field: f"{field}-{number}" for field in WALLET_FIELDS + SECRET_FIELDS}
+        wallet["name"] = name
+        return wallet
+
+    async def run(self, function, names, size):
+        assert function is walletpool.derive_wallets
+        self.calls.append(len(names))
+        return [self.wallet(name) for name in names]
+
+
+@pytest.fixture
+def derivations(monkeypatch):
+    fake = Derivations()
+    monkeypatch.setattr(walletpool, "wallet_executor", fake)
+    return fake
+
+
+def warm_pool(database, size: int = 5, low_watermark: int = 0) -> WarmWalletPool:
+    return WarmWalletPool(lambda: database.kw["bind"], size=size, low_watermark=low_watermark,
+        mnemonic_size=24, interval=3600, chunk_size=2)
+
+
+async def pooled(database) -> list:
+    async with database() as db:
+        return (await db.scalars(select(dbmodels.WalletPool).order_by(dbmodels.WalletPool.id))).all()
+
+
+def test_refill_tops_the_pool_up(database, derivations):
+    async def run():
+        pool = warm_pool(database, size=5, low_watermark=3)
+        assert await pool.refill() == 5
+        # Derived chunk_size wallets at a time
+        assert derivations.calls == [2, 2, 1]
+        assert await pool.available() == 5
+        # Full: nothing to do
+        assert await pool.refill() == 0
+
+        async with database() as db:
+            for _ in range(2):
+                assert await pool.claim(db, 24) is not None
+            await db.commit()
+        # Still at the low watermark
+        assert await pool.refill() == 0
+        async with database() as db:
+            await pool.claim(db, 24)
+            await db.commit()
+        # Below it: back to the target size
+        assert await pool.refill() == 3
+        assert await pool.available() == 5
+        stats = await pool.stats()
+        assert (stats["hits"], stats["misses"], stats["refilled"]) == (3, 0, 8)
+
+    asyncio.run(run())
+
+
+def test_pooled_wallets_hold_no_secrets(database, derivations):
+    async def run():
+        pool = warm_pool(database, size=3)
+        await pool.refill()
+        for row in await pooled(database):
+            assert row.size == 24
+            assert set(row.keys) == set(WALLET_FIELDS)
+        async with database() as db:
+            keys = await pool.claim(db, 24)
+            await db.commit()
+        assert set(keys) == set(WALLET_FIELDS)
+        assert not any(field in keys for field in ("mnemonic", "root_key", "private_payment_key", "private_stake_key"))
+
+    asyncio.run(run())
+
+
+def test_concurrent_claims_get_different_wallets(database, derivations, monkeypatch):
+    async def run():
+        pool = warm_pool(database, size=3)
+        await pool.refill()
+        monkeypatch.setattr(keys_api, "wallet_pool", pool)
+        claim = pool.claim
+        # Both requests claim before either commits: the first one's row is
+        # locked, the second skips it instead of waiting for it
+        claimed = []
+        both_claimed = asyncio.Event()
+
+        async def claim_together(db, size):
+            keys = await claim(db, size)
+            claimed.append(keys)
+            if len(claimed) == 2:
+                both_claimed.set()
+            await both_claimed.wait()
+            return keys
+
+        monkeypatch.setattr(pool, "claim", claim_together)
+
+        async def generate(name):
+            async with database() as db:
+                return await keys_api.create_keys(KeyCreate(name=name, include_mnemonic=False), db=db)
+
+        first, second = await asyncio.wait_for(asyncio.gather(generate("first"), generate("second")), timeout=10)
+        assert None not in claimed
+        assert first["payment_addr"] != second["payment_addr"]
+        assert "mnemonic" not in first
+        assert await pool.available() == 1
+        async with database() as db:
+            stored = (await db.scalars(select(dbmodels.Wallet.payment_addr))).all()
+        assert sorted(stored) == sorted([first["payment_addr"], second["payment_addr"]])
+
+    asyncio.run(run())
+
+
+def test_empty_pool_derives_inline(database, derivations, monkeypatch):
+    inline = []
+
+    def deriveAllKeys(name, size, save_flag):
+        inline.append(name)
+        return derivations.wallet(name)
+
+    @contextmanager
+    def node_workspace(_keys):
+        yield SimpleNamespace(node=SimpleNamespace(deriveAllKeys=deriveAllKeys), keep=lambda *args: None)
+
+    monkeypatch.setattr(keys_api.context, "_keys", SimpleNamespace(path="/tmp"))
+    monkeypatch.setattr(keys_api, "node_workspace", node_workspace)
+
+    async def run():
+        pool = warm_pool(database, size=3)
+        monkeypatch.setattr(keys_api, "wallet_pool", pool)
+        async with database() as db:
+            created = await keys_api.create_keys(KeyCreate(name="inline", include_mnemonic=False), db=db)
+        assert inline == ["inline"]
+        assert created["payment_addr"] == "payment_addr-0"
+        assert (pool.hits, pool.misses) == (0, 1)
+        # Asking for the mnemonic never uses the pool
+        await pool.refill()
+        async with database() as db:
+            created = await keys_api.create_keys(KeyCreate(name="mnemonic"), db=db)
+        assert inline == ["inline", "mnemonic"]
+        assert created["mnemonic"].startswith("mnemonic-")
+        assert await pool.available() == 3
+
+    asyncio.run(run())
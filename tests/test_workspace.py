@@ -0,0 +1,66 @@
+from core.workspace import Workspace, input_assets
+
+POLICY = "a0" * 28
+ADDRESS = "addr_test1vqdestination"
+CHANGE = "addr_test1vqchange"
+
+
+class FakeNode:
+    """Records the cardano-cli commands instead of running them"""
+    CARDANO_CLI_PATH = "cardano-cli"
+    CARDANO_ERA = "babbage-era"
+    CARDANO_NETWORK = "testnet"
+    CARDANO_NETWORK_MAGIC = 1097911063
+
+    def __init__(self, root):
+        self.TRANSACTION_PATH_FILE = root
+        self.commands = []
+
+    def execute_command(self, command, _input):
+        self.commands.append(command)
+        if "calculate-min-fee" in command:
+            return "170000 Lovelace"
+        with open(command[command.index("--out-file") + 1], "w") as f:
+            f.write("{}")
+        return ""
+
+
+def utxo(hash, lovelace, *tokens):
+    amounts = [{"token": "lovelace", "amount": str(lovelace)}]
+    amounts += [{"token": token, "amount": str(amount)} for token, amount in tokens]
+    return {"hash": hash, "id": 0, "amounts": amounts}
+
+
+def build(tmp_path, inputs):
+    node = FakeNode(str(tmp_path))
+    ws = Workspace(node, root=str(tmp_path), protocol_params={"txFeeFixed": 155381})
+    fee = ws.build_raw(inputs, [{"address": ADDRESS, "amount": 2000000}], CHANGE)
+    builds = [command for command in ws.node.commands if "build-raw" in command]
+    tx_outs = [builds[-1][i + 1] for i, arg in enumerate(builds[-1]) if arg == "--tx-out"]
+    return fee, tx_outs
+
+
+def test_input_assets_adds_up_tokens():
+    inputs = [utxo("aa", 5000000, (POLICY + ".746f6b", 10)), utxo("bb", 3000000, (POLICY + ".746f6b", 5), (POLICY + ".", 1))]
+    assert input_assets(inputs) == {POLICY + ".746f6b": 15, POLICY + ".": 1}
+
+
+def test_ada_only_change(tmp_path):
+    fee, tx_outs = build(tmp_path, [utxo("aa", 5000000)])
+    assert fee == 170000
+    assert tx_outs == [ADDRESS + "+2000000", CHANGE + "+2830000"]
+
+
+def test_tokens_of_the_inputs_go_to_the_change(tmp_path):
+    inputs = [utxo("aa", 5000000, (POLICY + ".746f6b", 10)), utxo("bb", 3000000, (POLICY + ".", 1))]
+    fee, tx_outs = build(tmp_path, inputs)
+    assert tx_outs[0] == ADDRESS + "+2000000"
+    assert tx_outs[1] == f"{CHANGE}+{8000000 - 2000000 - fee}+10 {POLICY}.746f6b+1 {POLICY}"
+
+
+def test_ttl_sets_invalid_hereafter(tmp_path):
+    node = FakeNode(str(tmp_path))
+    ws = Workspace(node, root=str(tmp_path), protocol_params={})
+    ws.build_raw([utxo("aa", 5000000)], [{"address": ADDRESS, "amount": 2000000}], CHANGE, ttl=123456)
+    build = [command for command in ws.node.commands if "build-raw" in command][-1]
+    assert build[build.index("--invalid-hereafter") + 1] == "123456"